@@ -9,6 +9,7 @@ from datetime import timedelta
 import json
 
 from apps.accounts.models import User, Agency, VerificationRequest
+from apps.core import query_cache
 from apps.bookings.models import Booking
 from apps.packages.models import Package
 from apps.guides.models import Guide
@@ -58,15 +59,15 @@ def admin_dashboard(request):
     else:
         base_filter = Q()
     
-    # Overall Statistics
-    total_users = User.objects.count()
-    total_agencies = Agency.objects.count()
-    verified_agencies = Agency.objects.filter(is_verified=True).count()
-    pending_agencies = Agency.objects.filter(is_verified=False).count()
-    total_packages = Package.objects.count()
-    active_packages = Package.objects.filter(is_active=True).count()
-    total_guides = Guide.objects.count()
-    total_bookings = Booking.objects.count()
+    # Overall Statistics, cached until the tables change (see apps.core.query_cache)
+    total_users = query_cache.count(User.objects.all())
+    total_agencies = query_cache.count(Agency.objects.all())
+    verified_agencies = query_cache.count(Agency.objects.filter(is_verified=True))
+    pending_agencies = query_cache.count(Agency.objects.filter(is_verified=False))
+    total_packages = query_cache.count(Package.objects.all())
+    active_packages = query_cache.count(Package.objects.filter(is_active=True))
+    total_guides = query_cache.count(Guide.objects.all())
+    total_bookings = query_cache.count(Booking.objects.all())
     
     # Recent activity (last 30 days)
     recent_users = User.objects.filter(base_filter).count() if start_date else User.objects.filter(
@@ -88,7 +89,7 @@ def admin_dashboard(request):
     )['total'] or 0
     
     # Verification requests
-    pending_verifications = VerificationRequest.objects.filter(status='pending').count()
+    pending_verifications = query_cache.count(VerificationRequest.objects.filter(status='pending'))
     
     # Recent verification requests
     recent_verification_requests = VerificationRequest.objects.filter(
@@ -96,9 +97,9 @@ def admin_dashboard(request):
     ).select_related('agency', 'requested_by').order_by('-created_at')[:10]
     
     # User type distribution
-    user_distribution = User.objects.values('user_type').annotate(
+    user_distribution = query_cache.fetch(User.objects.values('user_type').annotate(
         count=Count('id')
-    ).order_by('user_type')
+    ).order_by('user_type'))
     
     # Monthly data for charts (last 12 months)
     monthly_data = []
@@ -130,10 +131,10 @@ def admin_dashboard(request):
         })
     
     # Top performing agencies
-    top_agencies = Agency.objects.filter(is_verified=True).annotate(
+    top_agencies = query_cache.fetch(Agency.objects.filter(is_verified=True).annotate(
         bookings_count=Count('booking'),
         revenue=Sum('booking__total_amount', filter=Q(booking__status__in=['confirmed', 'completed']))
-    ).order_by('-revenue')[:5]
+    ).order_by('-revenue')[:5])
     
     # Recent bookings
     recent_bookings_list = Booking.objects.select_related(
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:00
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_verificationrequest'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='agency',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='agency_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='agency',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['description'], name='agency_description_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='agency',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['address'], name='agency_address_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
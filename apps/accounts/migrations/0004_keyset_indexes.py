@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agency',
+            index=models.Index(fields=['-rating', '-total_ratings', 'name', '-id'], name='agency_rating_keyset'),
+        ),
+    ]
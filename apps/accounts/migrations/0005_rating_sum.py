@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agency',
+            name='rating_sum',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,6 +1,7 @@
 # apps/accounts/models.py
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
 from django.core.validators import RegexValidator
 
 class User(AbstractUser):
@@ -46,6 +47,12 @@ class Agency(models.Model):
     logo = models.ImageField(upload_to='agencies/', null=True, blank=True)
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
     total_ratings = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0, editable=False)  # Running total, see apps.bookings.ratings
+    stars_5 = models.IntegerField(default=0, editable=False)
+    stars_4 = models.IntegerField(default=0, editable=False)
+    stars_3 = models.IntegerField(default=0, editable=False)
+    stars_2 = models.IntegerField(default=0, editable=False)
+    stars_1 = models.IntegerField(default=0, editable=False)
     established_year = models.IntegerField(null=True, blank=True)
     contact_person = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -53,17 +60,24 @@ class Agency(models.Model):
 
     class Meta:
         verbose_name_plural = "Agencies"
+        indexes = [
+            # Trigram indexes back the fuzzy search in apps.core.fuzzy_search
+            GinIndex(fields=['name'], name='agency_name_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['description'], name='agency_description_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['address'], name='agency_address_trgm', opclasses=['gin_trgm_ops']),
+            # Keyset pagination (apps.core.pagination) walks these sort keys
+            models.Index(fields=['-rating', '-total_ratings', 'name', '-id'], name='agency_rating_keyset'),
+        ]
 
     def __str__(self):
         return self.name
 
     def update_rating(self):
-        from apps.bookings.models import Rating
-        ratings = Rating.objects.filter(agency=self, rating_type='agency')
-        if ratings.exists():
-            self.total_ratings = ratings.count()
-            self.rating = sum(r.rating for r in ratings) / self.total_ratings
-            self.save(update_fields=['rating', 'total_ratings'])
+        """Rebuild the running rating totals from the Rating table (see apps.bookings.ratings)"""
+        from apps.bookings import ratings
+        ratings.recompute('agency', [self.pk])
+        self.refresh_from_db(fields=['rating', 'total_ratings', 'rating_sum', *ratings.STAR_FIELDS.values()])
+        ratings.totals_changed.send(sender=type(self), pk=self.pk)
 
 class VerificationRequest(models.Model):
     STATUS_CHOICES = (
@@ -10,78 +10,64 @@ from django.core.mail import send_mail
 from django.conf import settings
 from .forms import UserRegistrationForm, CustomAuthenticationForm, TouristProfileForm, AgencyProfileForm
 from .models import User, Tourist, Agency, VerificationRequest
+from apps.packages import departures
 from apps.packages.models import Package
 from apps.guides.models import Guide
+from apps.packages.view_counter import record_view
 from apps.bookings.models import Booking
-from django.db.models import Q, Case, When, IntegerField, Value
+from apps.bookings import availability, idempotency
+from apps.bookings.models import Payment
+from apps.core import query_cache, search_cache
+from apps.core.facets import package_facets, guide_facets, range_q
+from apps.core.lookups import array_match
+from apps.core.pagination import KeysetPage, KeysetPaginator
+from apps.core.sql_ranking import package_count_subquery
+from apps.core.fuzzy_search import trigram_search
+from django.db import transaction
+from django.db.models import Q
 from datetime import date, datetime, timedelta
 from django.utils import timezone
-import re
 import json
+import re
 from decimal import Decimal
+from functools import partial
 
 # ============= CUSTOM SEARCH, SORT, AND FILTER ALGORITHMS =============
 
+# Tourist listings render fixed-size keyset pages of cards, loading only the
+# columns the cards show
+TOURIST_PAGE_SIZE = 12
+TOURIST_PACKAGE_CARD_FIELDS = (
+    'title', 'description', 'package_type', 'duration_days', 'price_per_person',
+    'updated_at', 'agency__name', 'agency__rating', 'agency__total_ratings', 'agency__updated_at',
+)
+TOURIST_GUIDE_CARD_FIELDS = (
+    'name', 'profile_picture', 'bio', 'specialties', 'languages', 'experience_years',
+    'places_covered', 'daily_rate', 'rating', 'total_ratings', 'updated_at',
+)
+TOURIST_AGENCY_CARD_FIELDS = (
+    'name', 'logo', 'description', 'contact_person', 'established_year', 'license_number',
+    'rating', 'total_ratings', 'updated_at',
+)
+
 def custom_text_search(queryset, search_term, fields):
     """
     ALGORITHM NAME: Tourist Package Text Search Algorithm
     
     PSEUDO CODE:
-    1. Initialize empty Q object for OR conditions
-    2. Clean search term (remove extra spaces, convert to lowercase)
-    3. Split search term into individual words
-    4. For each word:
-        a. For each searchable field:
-            - Create icontains filter condition
-            - Add to OR chain
-    5. Apply combined OR filter to queryset
-    6. Calculate relevance score based on field matches
-    7. Order by relevance score descending
+    1. Clean search term (remove extra spaces, convert to lowercase)
+    2. For each searchable field:
+        - Match with the pg_trgm word-similarity operator (GIN trigram indexed)
+        - Add to OR chain
+    3. Apply combined OR filter to queryset
+    4. Calculate relevance score as the best weighted field similarity
+       (earlier fields weigh more)
+    5. Order by relevance score descending
     """
     if not search_term or not fields:
         return queryset
     
-    # Clean and prepare search terms
-    search_term = search_term.lower().strip()
-    search_words = [word.strip() for word in search_term.split() if word.strip()]
-    
-    if not search_words:
-        return queryset
-    
-    # Build Q object for OR conditions across all fields and words
-    search_conditions = Q()
-    
-    for word in search_words:
-        word_conditions = Q()
-        for field in fields:
-            word_conditions |= Q(**{f'{field}__icontains': word})
-        search_conditions |= word_conditions
-    
-    # Apply search filter
-    filtered_queryset = queryset.filter(search_conditions)
-    
-    # Custom relevance scoring
-    relevance_cases = []
-    score = 100  # Starting score
-    
-    for field in fields:
-        for word in search_words:
-            # Higher score for exact matches, lower for partial
-            relevance_cases.append(
-                When(**{f'{field}__iexact': word}, then=Value(score))
-            )
-            relevance_cases.append(
-                When(**{f'{field}__icontains': word}, then=Value(score // 2))
-            )
-        score -= 10  # Decrease score for each field (priority order)
-    
-    # Add default case
-    relevance_cases.append(When(pk__isnull=False, then=Value(1)))
-    
-    # Annotate with relevance score and order by it
-    return filtered_queryset.annotate(
-        relevance_score=Case(*relevance_cases, default=Value(0), output_field=IntegerField())
-    ).order_by('-relevance_score')
+    return trigram_search(queryset, search_term, fields, annotation='relevance_score')
 
 def apply_custom_filters(request, queryset):
     """
@@ -108,14 +94,9 @@ def apply_custom_filters(request, queryset):
     # Duration filter (custom range logic)
     duration = request.GET.get('duration')
     if duration:
-        if duration == '1-3':
-            filtered_queryset = filtered_queryset.filter(duration_days__gte=1, duration_days__lte=3)
-        elif duration == '4-7':
-            filtered_queryset = filtered_queryset.filter(duration_days__gte=4, duration_days__lte=7)
-        elif duration == '8-14':
-            filtered_queryset = filtered_queryset.filter(duration_days__gte=8, duration_days__lte=14)
-        elif duration == '15+':
-            filtered_queryset = filtered_queryset.filter(duration_days__gte=15)
+        for value, label, low, high in Package.DURATION_BUCKETS:
+            if duration == value:
+                filtered_queryset = filtered_queryset.filter(range_q('duration_days', low, high))
     
     # Price range filter
     min_price = request.GET.get('min_price')
@@ -172,8 +153,8 @@ def apply_custom_sort(request, queryset, search_query=None):
     elif sort_by == 'relevance' and search_query:
         # If relevance score exists from search, use it
         return queryset.order_by('-relevance_score', '-created_at')
-    elif search_query and hasattr(queryset.first(), 'relevance_score') if queryset.first() else False:
-        # Auto-sort by relevance if search was performed
+    elif search_query and 'relevance_score' in queryset.query.annotations:
+        # Auto-sort by relevance if search was performed (no probe query needed)
         return queryset.order_by('-relevance_score', '-created_at')
     else:
         # Default: newest first
@@ -202,37 +183,29 @@ def apply_custom_guide_filters(request, queryset):
     3. Apply experience range filter with custom logic
     4. Apply language filter (JSON array contains)
     5. Apply daily rate range filter
-    6. Return filtered queryset
+    6. Apply date availability filter (NOT EXISTS overlapping booking)
+    7. Return filtered queryset
     """
     filtered_queryset = queryset
     
-    # Specialization filter
-    specialization = request.GET.get('specialization')
-    if specialization:
-        # Custom JSON array search
-        filtered_queryset = filtered_queryset.extra(
-            where=["specialties::jsonb ? %s"],
-            params=[specialization]
-        )
+    # Specialization filter (any of the selected, GIN-indexed JSON array match)
+    filtered_queryset = filtered_queryset.filter(array_match(
+        'specialties', request.GET.getlist('specialization'),
+        match_all=request.GET.get('specialization_match', 'any') == 'all',
+    ))
     
     # Experience range filter
     experience = request.GET.get('experience')
     if experience:
-        if experience == '1-5':
-            filtered_queryset = filtered_queryset.filter(experience_years__gte=1, experience_years__lte=5)
-        elif experience == '6-10':
-            filtered_queryset = filtered_queryset.filter(experience_years__gte=6, experience_years__lte=10)
-        elif experience == '11+':
-            filtered_queryset = filtered_queryset.filter(experience_years__gte=11)
-    
-    # Language filter
-    language = request.GET.get('language')
-    if language:
-        # Custom JSON array search
-        filtered_queryset = filtered_queryset.extra(
-            where=["languages::jsonb ? %s"],
-            params=[language]
-        )
+        for value, label, low, high in Guide.EXPERIENCE_BANDS:
+            if experience == value:
+                filtered_queryset = filtered_queryset.filter(range_q('experience_years', low, high))
+    
+    # Language filter (all of the selected, GIN-indexed JSON array match)
+    filtered_queryset = filtered_queryset.filter(array_match(
+        'languages', request.GET.getlist('language'),
+        match_all=request.GET.get('language_match', 'all') == 'all',
+    ))
     
     # Daily rate filter
     min_rate = request.GET.get('min_rate')
@@ -252,6 +225,11 @@ def apply_custom_guide_filters(request, queryset):
         except (ValueError, TypeError):
             pass
     
+    # Availability filter: no active booking overlapping the requested dates
+    available_from, available_to = availability.requested_period(request.GET)
+    if available_from:
+        filtered_queryset = filtered_queryset.filter(availability.free_between(available_from, available_to))
+    
     return filtered_queryset
 
 def apply_custom_guide_sort(request, queryset, search_query=None):
@@ -281,7 +259,7 @@ def apply_custom_guide_sort(request, queryset, search_query=None):
         return queryset.order_by('name')
     elif sort_by == 'relevance' and search_query:
         return queryset.order_by('-relevance_score', '-rating')
-    elif search_query and hasattr(queryset.first(), 'relevance_score') if queryset.first() else False:
+    elif search_query and 'relevance_score' in queryset.query.annotations:
         return queryset.order_by('-relevance_score', '-rating')
     else:
         # Default: rating-based
@@ -292,11 +270,15 @@ def get_current_guide_filters(request):
     Helper function to get current guide filter values
     """
     return {
-        'specialization': request.GET.get('specialization', ''),
+        'specialization': request.GET.getlist('specialization'),
+        'specialization_match': request.GET.get('specialization_match', 'any'),
         'experience': request.GET.get('experience', ''),
-        'language': request.GET.get('language', ''),
+        'language': request.GET.getlist('language'),
+        'language_match': request.GET.get('language_match', 'all'),
         'min_rate': request.GET.get('min_rate', ''),
         'max_rate': request.GET.get('max_rate', ''),
+        'available_from': request.GET.get('available_from', ''),
+        'available_to': request.GET.get('available_to', ''),
         'sort': request.GET.get('sort', 'rating'),
     }
 
@@ -382,7 +364,7 @@ def apply_custom_agency_sort(request, queryset, search_query=None):
         return queryset.annotate(package_count=Count('packages')).order_by('-package_count', '-rating')
     elif sort_by == 'relevance' and search_query:
         return queryset.order_by('-relevance_score', '-rating')
-    elif search_query and hasattr(queryset.first(), 'relevance_score') if queryset.first() else False:
+    elif search_query and 'relevance_score' in queryset.query.annotations:
         return queryset.order_by('-relevance_score', '-rating')
     else:
         # Default: rating-based
@@ -565,20 +547,21 @@ def tourist_home_view(request):
     except Tourist.DoesNotExist:
         return redirect('accounts:tourist_profile')
     
-    # Fetch real data
-    packages = Package.objects.filter(is_active=True, agency__is_verified=True)[:6]
-    guides = Guide.objects.filter(is_available=True, agency__is_verified=True)[:6]
-    agencies = Agency.objects.filter(is_verified=True)[:4]
+    # Fetch real data; nothing runs until a cached section of tourist/home.html
+    # expires, and the counts only if a template asks for them
+    packages = Package.objects.filter(is_active=True, agency__is_verified=True)
+    guides = Guide.objects.filter(is_available=True, agency__is_verified=True)
+    agencies = Agency.objects.filter(is_verified=True)
     
     context = {
-        'packages': packages,
-        'guides': guides,
-        'agencies': agencies,
+        'packages': packages[:6],
+        'guides': guides[:6],
+        'agencies': agencies[:4],
         'is_tourist': True,
         'tourist': tourist,
-        'packages_count': Package.objects.filter(is_active=True, agency__is_verified=True).count(),
-        'guides_count': Guide.objects.filter(is_available=True, agency__is_verified=True).count(),
-        'agencies_count': Agency.objects.filter(is_verified=True).count(),
+        'packages_count': partial(query_cache.count, packages),
+        'guides_count': partial(query_cache.count, guides),
+        'agencies_count': partial(query_cache.count, agencies),
     }
     
     return render(request, 'tourist/home.html', context)
@@ -604,11 +587,34 @@ def tourist_packages_view(request):
     # CUSTOM SORT ALGORITHM - "Tourist Adaptive Sort"
     packages = apply_custom_sort(request, packages, search_query)
     
+    # Counts for every filter option, in one query over the filtered set
+    facets = package_facets(packages)
+    
+    def cards(queryset):
+        return queryset.select_related('agency').only(*TOURIST_PACKAGE_CARD_FIELDS).prefetch_related('images')
+    
+    cursor = request.GET.get('cursor')
+    paginator = KeysetPaginator(cards(packages), TOURIST_PAGE_SIZE, count=settings.LISTING_SHOW_TOTALS)
+    if search_query:
+        # Searches are cached as the page's IDs and cursors (see apps.core.search_cache)
+        def compute():
+            return dict(paginator.get_page(cursor).state(), count=paginator.count)
+
+        cached = search_cache.get_or_compute(
+            'accounts.tourist_packages', ['packages', 'agencies'], search_query,
+            dict(get_current_filters(request), cursor=cursor), compute
+        )
+        paginator.count = cached['count']
+        page = KeysetPage.restore(cached, search_cache.hydrate(cards(Package.objects), cached['ids']), paginator)
+    else:
+        page = paginator.get_page(cursor)
+    
     context = {
-        'packages': packages,
+        'packages': page,
         'is_tourist': True,
         'search_query': search_query,
         'current_filters': get_current_filters(request),
+        'facets': facets,
     }
     
     return render(request, 'tourist/packages.html', context)
@@ -634,11 +640,15 @@ def tourist_guides_view(request):
     # CUSTOM SORT for Guides
     guides = apply_custom_guide_sort(request, guides, search_query)
     
+    paginator = KeysetPaginator(guides.only(*TOURIST_GUIDE_CARD_FIELDS), TOURIST_PAGE_SIZE,
+                                count=settings.LISTING_SHOW_TOTALS)
+    
     context = {
-        'guides': guides,
+        'guides': paginator.get_page(request.GET.get('cursor')),
         'is_tourist': True,
         'search_query': search_query,
         'current_filters': get_current_guide_filters(request),
+        'facets': guide_facets(guides),
     }
     
     return render(request, 'tourist/guides.html', context)
@@ -664,8 +674,11 @@ def tourist_agencies_view(request):
     # CUSTOM SORT for Agencies
     agencies = apply_custom_agency_sort(request, agencies, search_query)
     
+    agencies = agencies.only(*TOURIST_AGENCY_CARD_FIELDS).annotate(packages_count=package_count_subquery())
+    paginator = KeysetPaginator(agencies, TOURIST_PAGE_SIZE, count=settings.LISTING_SHOW_TOTALS)
+    
     context = {
-        'agencies': agencies,
+        'agencies': paginator.get_page(request.GET.get('cursor')),
         'is_tourist': True,
         'search_query': search_query,
         'current_filters': get_current_agency_filters(request),
@@ -745,34 +758,21 @@ def package_detail_view(request, package_id):
         return redirect('core:home')
     
     package = get_object_or_404(Package, id=package_id, is_active=True, agency__is_verified=True)
-    package.increment_views()  # Increment view count
-    
-    # Get blocked dates (existing bookings)
-    existing_bookings = Booking.objects.filter(
-        package=package,
-        status__in=['pending', 'confirmed']
-    ).values_list('travel_date', 'end_date')
-    
-    blocked_dates = []
-    for booking in existing_bookings:
-        start_date = booking[0]
-        end_date = booking[1] or start_date
-        current_date = start_date
-        while current_date <= end_date:
-            blocked_dates.append(current_date.isoformat())
-            current_date += timedelta(days=1)
-    
-    # Add past dates to blocked dates
+    record_view(request, package)  # Buffered and deduplicated per visitor
+    
+    # Sold-out departures as merged [start, end] ranges (past dates are
+    # handled by min_date); a package with a schedule only offers its open dates
     today = date.today()
-    for i in range(30):  # Block past 30 days
-        past_date = today - timedelta(days=i+1)
-        blocked_dates.append(past_date.isoformat())
+    sold_out = availability.Availability((day, day) for day in departures.sold_out(package, since=today))
+    open_dates = departures.open_dates(package, since=today)
     
     context = {
         'package': package,
         'is_tourist': True,
-        'blocked_dates_json': json.dumps(blocked_dates),
+        'blocked_ranges_json': sold_out.to_json(),
+        'open_dates_json': json.dumps(open_dates and [day.isoformat() for day in open_dates]),
         'min_date': today.isoformat(),
+        'idempotency_key': idempotency.new_key(),
     }
     
     return render(request, 'tourist/package_detail.html', context)
@@ -786,32 +786,16 @@ def guide_detail_view(request, guide_id):
     
     guide = get_object_or_404(Guide, id=guide_id, is_available=True, agency__is_verified=True)
     
-    # Get blocked dates (existing guide bookings)
-    existing_bookings = Booking.objects.filter(
-        guide=guide,
-        status__in=['pending', 'confirmed']
-    ).values_list('travel_date', 'end_date')
-    
-    blocked_dates = []
-    for booking in existing_bookings:
-        start_date = booking[0]
-        end_date = booking[1] or start_date
-        current_date = start_date
-        while current_date <= end_date:
-            blocked_dates.append(current_date.isoformat())
-            current_date += timedelta(days=1)
-    
-    # Add past dates to blocked dates
+    # Booked days as merged [start, end] ranges (past dates are handled by min_date)
     today = date.today()
-    for i in range(30):  # Block past 30 days
-        past_date = today - timedelta(days=i+1)
-        blocked_dates.append(past_date.isoformat())
+    booked = availability.booked(since=today, guide=guide)
     
     context = {
         'guide': guide,
         'is_tourist': True,
-        'blocked_dates_json': json.dumps(blocked_dates),
+        'blocked_ranges_json': booked.to_json(since=today),
         'min_date': today.isoformat(),
+        'idempotency_key': idempotency.new_key(),
     }
     
     return render(request, 'tourist/guide_detail.html', context)
@@ -845,22 +829,6 @@ def book_package_view(request, package_id):
             messages.error(request, 'Invalid date format.')
             return redirect('accounts:package_detail', package_id=package_id)
         
-        # Check if date is available (proper conflict checking)
-        # Simple overlap detection - if travel_date of existing booking falls within our date range
-        conflicting_booking = Booking.objects.filter(
-            package=package,
-            status__in=['pending', 'confirmed']
-        ).filter(
-            Q(travel_date__range=[start_date, end_date]) |
-            Q(end_date__range=[start_date, end_date]) |
-            Q(travel_date__lte=start_date, end_date__gte=end_date)
-        ).exists()
-        
-        
-        if conflicting_booking:
-            messages.error(request, 'Selected dates are not available. Please choose different dates.')
-            return redirect('accounts:package_detail', package_id=package_id)
-        
         if start_date < date.today():
             messages.error(request, 'Cannot book past dates.')
             return redirect('accounts:package_detail', package_id=package_id)
@@ -873,17 +841,36 @@ def book_package_view(request, package_id):
         # Calculate total amount
         total_amount = package.price_per_person * number_of_people
         
-        # Create booking
-        booking = Booking.objects.create(
-            tourist=tourist,
-            package=package,
-            agency=package.agency,
-            travel_date=start_date,
-            end_date=end_date,
-            number_of_people=number_of_people,
-            total_amount=total_amount,
-            special_requirements=special_requirements,
-        )
+        key = idempotency.submitted_key(request)
+        with transaction.atomic():
+            # A double-click or retried POST continues with the booking it already made
+            earlier = idempotency.replayed_booking(tourist, key)
+            if earlier is not None:
+                return redirect('accounts:payment_view', booking_type='package', booking_id=earlier.id)
+            
+            try:
+                departure = departures.departure_on(package, start_date)
+            except departures.NotScheduled:
+                messages.error(request, 'This package only departs on its scheduled dates. Please choose one of them.')
+                return redirect('accounts:package_detail', package_id=package_id)
+            
+            # Create booking; saving takes the seats on the departure with one
+            # conditional UPDATE and fails when they are gone
+            booking = Booking(
+                tourist=tourist,
+                package=package,
+                departure=departure,
+                agency=package.agency,
+                travel_date=start_date,
+                end_date=end_date,
+                number_of_people=number_of_people,
+                total_amount=total_amount,
+                special_requirements=special_requirements,
+                idempotency_key=key,
+            )
+            if not availability.save_booking(booking):
+                messages.error(request, 'Not enough seats left on this departure. Please choose a different date.')
+                return redirect('accounts:package_detail', package_id=package_id)
         
         # Redirect to payment
         return redirect('accounts:payment_view', booking_type='package', booking_id=booking.id)
@@ -928,36 +915,38 @@ def book_guide_view(request, guide_id):
             messages.error(request, 'End date must be after start date.')
             return redirect('accounts:guide_detail', guide_id=guide_id)
         
-        # Check if dates are available (proper conflict checking)
-        # Check for any overlap between requested dates and existing bookings
-        conflicting_booking = Booking.objects.filter(
-            guide=guide,
-            status__in=['pending', 'confirmed']
-        ).filter(
-            Q(travel_date__range=[start_date, end_date]) |
-            Q(end_date__range=[start_date, end_date]) |
-            Q(travel_date__lte=start_date, end_date__gte=end_date)
-        ).exists()
-        
-        if conflicting_booking:
-            messages.error(request, 'Selected dates are not available.')
-            return redirect('accounts:guide_detail', guide_id=guide_id)
-        
         # Calculate total amount
         duration_days = (end_date - start_date).days + 1
         total_amount = guide.daily_rate * duration_days
         
-        # Create booking
-        booking = Booking.objects.create(
-            tourist=tourist,
-            guide=guide,
-            agency=guide.agency,
-            travel_date=start_date,
-            end_date=end_date,
-            number_of_people=number_of_people,
-            total_amount=total_amount,
-            special_requirements=special_requirements,
-        )
+        key = idempotency.submitted_key(request)
+        with transaction.atomic():
+            # A double-click or retried POST continues with the booking it already made
+            earlier = idempotency.replayed_booking(tourist, key)
+            if earlier is not None:
+                return redirect('accounts:payment_view', booking_type='guide', booking_id=earlier.id)
+            
+            # Check the requested days against the guide's booked ranges
+            if not availability.is_available(start_date, end_date, guide=guide):
+                messages.error(request, 'Selected dates are not available.')
+                return redirect('accounts:guide_detail', guide_id=guide_id)
+            
+            # Create booking; the overlap constraint catches a concurrent booking
+            # of the same dates that got past the check above
+            booking = Booking(
+                tourist=tourist,
+                guide=guide,
+                agency=guide.agency,
+                travel_date=start_date,
+                end_date=end_date,
+                number_of_people=number_of_people,
+                total_amount=total_amount,
+                special_requirements=special_requirements,
+                idempotency_key=key,
+            )
+            if not availability.save_booking(booking):
+                messages.error(request, 'Selected dates are not available.')
+                return redirect('accounts:guide_detail', guide_id=guide_id)
         
         # Redirect to payment
         return redirect('accounts:payment_view', booking_type='guide', booking_id=booking.id)
@@ -991,19 +980,25 @@ def payment_view(request, booking_type, booking_id):
             messages.error(request, 'Invalid payment method selected.')
             return redirect('accounts:payment_view', booking_type=booking_type, booking_id=booking_id)
         
-        # Create or get existing payment record
-        from apps.bookings.models import Payment
-        import uuid
-        
-        payment, created = Payment.objects.get_or_create(
-            booking=booking,
-            defaults={
-                'amount': payment_amount,
-                'transaction_id': str(uuid.uuid4())[:10],
-                'status': 'pending',
-                'service_charge': 0.0
-            }
-        )
+        # Reuse the booking's open payment (at most one per booking) under a
+        # row lock, so double submits never race into two payments
+        with transaction.atomic():
+            list(Booking.objects.select_for_update().filter(pk=booking.pk).values_list('pk', flat=True))
+            if booking.payments.filter(status='completed').exists():
+                messages.info(request, 'This booking is already paid.')
+                return redirect('accounts:tourist_bookings')
+            payment = booking.payments.filter(status='pending').first()
+            if payment is None:
+                payment = Payment.objects.create(
+                    booking=booking,
+                    amount=payment_amount,
+                    status='pending',
+                    service_charge=0.0,
+                )
+            elif payment.amount != payment_amount:
+                # Switched between advance and full payment
+                payment.amount = payment_amount
+                payment.save(update_fields=['amount'])
         
         # Redirect to payment processing
         return redirect('bookings:process_payment', payment_id=payment.transaction_id)
@@ -1,6 +1,7 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.conf import settings
 from django.core.paginator import Paginator
 from django.db.models import Q, Count
 from django.core.mail import send_mail
@@ -10,18 +11,21 @@ from apps.guides.forms import GuideForm
 from apps.packages.forms import PackageForm, PackageImageFormSet
 from apps.guides.models import Guide
 from apps.packages.models import Package, PackageImage
+from apps.core.fuzzy_search import trigram_search
+from apps.core.page_cache import cache_public_page
+from apps.core.pagination import KeysetPaginator
+from apps.core.sql_ranking import guide_count_subquery, package_count_subquery
 
+@cache_public_page('agencies', 'guides', 'packages')
 def agency_list(request):
     agencies = Agency.objects.filter(is_verified=True)
 
     # Search
     search_query = request.GET.get('search', '').strip()
     if search_query:
-        agencies = agencies.filter(
-            Q(name__icontains=search_query)
-            | Q(description__icontains=search_query)
-            | Q(address__icontains=search_query)
-            | Q(license_number__icontains=search_query)
+        agencies = trigram_search(
+            agencies, search_query, ['name', 'address', 'description'],
+            also_match=Q(license_number=search_query),
         )
 
     # Filtering
@@ -53,8 +57,10 @@ def agency_list(request):
         agencies = agencies.filter(is_verified=True)
 
     # Sorting
-    sort_by = request.GET.get('sort', 'rating')
-    if sort_by == 'guides_count':
+    sort_by = request.GET.get('sort', 'relevance' if search_query else 'rating')
+    if sort_by == 'relevance' and search_query:
+        agencies = agencies.order_by('-relevance_score', '-rating')
+    elif sort_by == 'guides_count':
         agencies = agencies.annotate(num_guides=Count('guides')).order_by('-num_guides', '-rating')
     elif sort_by == 'packages_count':
         agencies = agencies.annotate(num_packages=Count('packages')).order_by('-num_packages', '-rating')
@@ -67,10 +73,12 @@ def agency_list(request):
     else:
         agencies = agencies.order_by('-rating', '-total_ratings', 'name')
 
-    # Pagination
-    paginator = Paginator(agencies, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Card counts as subqueries rather than two COUNTs per card
+    agencies = agencies.annotate(guides_count=guide_count_subquery(), packages_count=package_count_subquery())
+
+    # Keyset pagination on the sort keys (see apps.core.pagination)
+    paginator = KeysetPaginator(agencies, 12, count=settings.LISTING_SHOW_TOTALS)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
 
     context = {
         'agencies': page_obj,
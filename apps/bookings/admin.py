@@ -1,4 +1,5 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from .availability import save_booking
 from .models import Booking, Rating,Payment
 
 @admin.register(Booking)
@@ -10,19 +11,36 @@ class BookingAdmin(admin.ModelAdmin):
     date_hierarchy = 'travel_date'
     actions = ['mark_confirmed', 'mark_completed', 'mark_cancelled']
     
+    def set_status(self, request, queryset, status):
+        # One save per booking, so Booking.save moves the departure's seats
+        # and a full departure or a re-booked guide date fails just that row
+        updated = 0
+        failed = []
+        for booking in queryset:
+            booking.status = status
+            if save_booking(booking):
+                updated += 1
+            else:
+                failed.append(str(booking.pk))
+        self.message_user(request, f'{updated} bookings were marked as {status}.')
+        if failed:
+            self.message_user(
+                request,
+                f"Bookings {', '.join(failed)} could not be marked as {status}: their departure is full "
+                f"or the guide is booked on those dates.",
+                messages.WARNING,
+            )
+    
     def mark_confirmed(self, request, queryset):
-        updated = queryset.update(status='confirmed')
-        self.message_user(request, f'{updated} bookings were marked as confirmed.')
+        self.set_status(request, queryset, 'confirmed')
     mark_confirmed.short_description = "Mark selected bookings as confirmed"
     
     def mark_completed(self, request, queryset):
-        updated = queryset.update(status='completed')
-        self.message_user(request, f'{updated} bookings were marked as completed.')
+        self.set_status(request, queryset, 'completed')
     mark_completed.short_description = "Mark selected bookings as completed"
     
     def mark_cancelled(self, request, queryset):
-        updated = queryset.update(status='cancelled')
-        self.message_user(request, f'{updated} bookings were marked as cancelled.')
+        self.set_status(request, queryset, 'cancelled')
     mark_cancelled.short_description = "Mark selected bookings as cancelled"
     
     def get_queryset(self, request):
@@ -0,0 +1,177 @@
+# apps/bookings/availability.py
+"""
+Booked date ranges of a guide.
+
+Active bookings are merged into sorted, disjoint, inclusive ``(start, end)``
+date intervals, so an overlap check is one binary search and the booking
+calendar receives a handful of ``[start, end]`` pairs instead of one string
+per booked day.
+
+The database has the final say: a GiST exclusion constraint on
+``(guide, booked_period())`` rejects a second active booking over the same
+days even when two requests pass the read-side check at once, and
+``save_booking`` turns that violation, or a package departure without enough
+seats left (apps.packages.departures), into a ``False``.
+"""
+import datetime
+import json
+from bisect import bisect_right
+from collections import defaultdict
+
+from django.contrib.postgres.fields import DateRangeField
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, Func, OuterRef, Value
+from django.db.models.functions import Coalesce
+from django.db.backends.postgresql.psycopg_any import DateRange
+
+# Bookings in these states hold their dates
+ACTIVE_STATUSES = ('pending', 'confirmed')
+
+ONE_DAY = datetime.timedelta(days=1)
+
+# Exclusion constraints on Booking (see Booking.Meta.constraints)
+OVERLAP_CONSTRAINTS = ('booking_guide_no_overlap',)
+
+
+class BookedPeriod(Func):
+    """``daterange(travel_date, coalesce(end_date, travel_date), '[]')``"""
+    function = 'daterange'
+    output_field = DateRangeField()
+
+    def __init__(self):
+        super().__init__('travel_date', Coalesce('end_date', 'travel_date'), Value('[]'))
+
+
+def booked_period():
+    # The exclusion constraints index exactly this expression, so queries
+    # filtering on it with && can use their GiST indexes
+    return BookedPeriod()
+
+
+class Availability:
+    def __init__(self, ranges=()):
+        self.intervals = []
+        for start, end in sorted((start, end or start) for start, end in ranges):
+            if self.intervals and start <= self.intervals[-1][1] + ONE_DAY:
+                # Overlapping or back-to-back bookings become one interval
+                if end > self.intervals[-1][1]:
+                    self.intervals[-1] = (self.intervals[-1][0], end)
+            else:
+                self.intervals.append((start, end))
+        self.starts = [start for start, _ in self.intervals]
+
+    def __bool__(self):
+        return bool(self.intervals)
+
+    def __iter__(self):
+        return iter(self.intervals)
+
+    def overlaps(self, start, end=None):
+        """Whether any booked day falls in ``start`` .. ``end`` (inclusive)"""
+        end = end or start
+        # The last interval starting on or before ``end`` is the only candidate
+        position = bisect_right(self.starts, end) - 1
+        return position >= 0 and self.intervals[position][1] >= start
+
+    def is_free(self, start, end=None):
+        return not self.overlaps(start, end)
+
+    def ranges(self, since=None, until=None):
+        """``[[start, end], ...]`` as ISO dates, clipped to ``since`` .. ``until``"""
+        return [
+            [max(start, since).isoformat() if since else start.isoformat(),
+             min(end, until).isoformat() if until else end.isoformat()]
+            for start, end in self.intervals
+            if (since is None or end >= since) and (until is None or start <= until)
+        ]
+
+    def to_json(self, since=None):
+        return json.dumps(self.ranges(since), separators=(',', ':'))
+
+
+def booked(since=None, until=None, **resource):
+    """
+    Availability of one resource (e.g. ``guide=``), loading only
+    the active bookings that reach into ``since`` .. ``until``.
+    """
+    from .models import Booking
+
+    bookings = Booking.objects.filter(status__in=ACTIVE_STATUSES, **resource)
+    if since is not None or until is not None:
+        bookings = bookings.alias(period=booked_period()).filter(
+            period__overlap=DateRange(since, until, '[]')
+        )
+    return Availability(bookings.order_by().values_list('travel_date', 'end_date'))
+
+
+def requested_period(params):
+    """
+    ``(start, end)`` from the ``available_from`` / ``available_to`` query
+    parameters; ``end`` defaults to ``start``, and bad input means no filter.
+    """
+    try:
+        start = datetime.date.fromisoformat(params.get('available_from', ''))
+    except ValueError:
+        return None, None
+    try:
+        end = datetime.date.fromisoformat(params.get('available_to', ''))
+    except ValueError:
+        end = start
+    return start, max(start, end)
+
+
+def booked_many(field, ids, since, until):
+    """``{id: Availability}`` for many guides or packages from one query"""
+    from .models import Booking
+
+    ranges = defaultdict(list)
+    bookings = Booking.objects.filter(status__in=ACTIVE_STATUSES, **{f'{field}__in': ids}).alias(
+        period=booked_period(),
+    ).filter(period__overlap=DateRange(since, until, '[]'))
+    for target_id, start, end in bookings.order_by().values_list(field, 'travel_date', 'end_date'):
+        ranges[target_id].append((start, end))
+    return {target_id: Availability(ranges[target_id]) for target_id in ids}
+
+
+def free_between(start, end=None, field='guide'):
+    """
+    Filter for guides (or packages) with no active booking overlapping
+    ``start`` .. ``end``: a NOT EXISTS anti-join on the indexed
+    ``(guide_id, booked_period())`` path of the exclusion constraint.
+    """
+    from .models import Booking
+
+    clashes = Booking.objects.filter(status__in=ACTIVE_STATUSES, **{field: OuterRef('pk')}).alias(
+        period=booked_period(),
+    ).filter(period__overlap=DateRange(start, end or start, '[]'))
+    return ~Exists(clashes)
+
+
+def is_available(start, end=None, **resource):
+    """Conflict check for a new booking of ``start`` .. ``end``"""
+    return booked(since=start, until=end or start, **resource).is_free(start, end)
+
+
+def is_overlap_violation(error):
+    """Whether an IntegrityError came from one of the overlap exclusion constraints"""
+    diag = getattr(error.__cause__, 'diag', None)
+    return getattr(diag, 'constraint_name', None) in OVERLAP_CONSTRAINTS
+
+
+def save_booking(booking):
+    """
+    Save a booking; False when it overlaps an active booking of the same guide
+    or its package departure is full
+    """
+    from apps.packages.departures import SoldOut
+
+    try:
+        with transaction.atomic():
+            booking.save()
+    except SoldOut:
+        return False
+    except IntegrityError as error:
+        if not is_overlap_violation(error):
+            raise
+        return False
+    return True
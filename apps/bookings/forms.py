@@ -2,9 +2,13 @@
 from django import forms
 from django.utils import timezone
 from datetime import date
+from .idempotency import KEY_PATTERN, new_key
 from .models import Booking, Rating
 
 class BookingForm(forms.ModelForm):
+    # Rendered fresh with every empty form; a resubmission carries the same key
+    idempotency_key = forms.RegexField(KEY_PATTERN, required=False, widget=forms.HiddenInput)
+
     class Meta:
         model = Booking
         fields = ['travel_date', 'end_date', 'number_of_people', 'special_requirements']
@@ -16,6 +20,8 @@ class BookingForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        if not self.is_bound:
+            self.initial.setdefault('idempotency_key', new_key())
         # Set minimum date to today
         today = date.today().isoformat()
         self.fields['travel_date'].widget.attrs.update({
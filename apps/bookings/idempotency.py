@@ -0,0 +1,61 @@
+# apps/bookings/idempotency.py
+"""
+Duplicate-safe booking and payment submissions.
+
+Booking forms carry a random ``idempotency_key`` rendered with the page. A
+submission locks the tourist's row, so one tourist's submissions run one at
+a time, and then looks for a booking already made with that key. A
+double-click or a retried POST therefore lands on the existing booking
+instead of booking twice; a partial unique constraint on
+``(tourist, idempotency_key)`` backs this up.
+
+Payments are keyed by their booking: a booking has at most one pending
+payment (another partial unique constraint), and payment transaction ids are
+full 128-bit random values rather than truncated UUIDs.
+"""
+import re
+import uuid
+
+from django.db import transaction
+
+KEY_FIELD = 'idempotency_key'
+KEY_PATTERN = re.compile(r'[A-Za-z0-9_-]{8,64}')
+
+BASE36 = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+def submitted_key(request):
+    """The submission's key from POST, or '' when it is missing or malformed"""
+    key = request.POST.get(KEY_FIELD, '')
+    return key if KEY_PATTERN.fullmatch(key) else ''
+
+
+def new_transaction_id():
+    """A random 128-bit id in at most 25 lowercase base-36 characters"""
+    value = uuid.uuid4().int
+    digits = []
+    while value:
+        value, digit = divmod(value, 36)
+        digits.append(BASE36[digit])
+    return ''.join(reversed(digits)) or '0'
+
+
+def replayed_booking(tourist, key):
+    """
+    The booking an earlier submission with ``key`` made, or None. Locks the
+    tourist's row until the surrounding transaction ends, so call it in the
+    same ``transaction.atomic()`` block that creates the booking.
+    """
+    from apps.accounts.models import Tourist
+    from .models import Booking
+
+    if not transaction.get_connection().in_atomic_block:
+        raise RuntimeError('replayed_booking() must run inside transaction.atomic()')
+    list(Tourist.objects.select_for_update().filter(pk=tourist.pk).values_list('pk', flat=True))
+    if not key:
+        return None
+    return Booking.objects.filter(tourist=tourist, idempotency_key=key).first()
@@ -0,0 +1,126 @@
+# apps/bookings/lifecycle.py
+"""
+Time-driven booking status changes, run by ``manage.py sweep_bookings``.
+
+* Pending bookings with no completed payment after BOOKING_PENDING_TTL_HOURS
+  are cancelled and their pending payments marked failed, which frees the
+  guide's dates and the departure's seats.
+* Confirmed bookings whose trip has ended become completed, which opens
+  them up for rating.
+
+Both are chunked ``UPDATE ... WHERE id IN (...)`` statements walking a partial
+index, one short transaction per chunk. A Postgres advisory lock lets any
+number of nodes schedule the sweep; only one of them runs it at a time.
+"""
+import datetime
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+# pg_advisory_lock key shared by every node running the sweep
+SWEEP_LOCK_KEY = 0x6E67685F737770  # "ngh_swp"
+
+
+@contextmanager
+def advisory_lock(key):
+    """Yield whether this session got the lock; never waits for it"""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(%s)', [key])
+        acquired = cursor.fetchone()[0]
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [key])
+
+
+def trip_end():
+    return Coalesce('end_date', 'travel_date')
+
+
+def stale_pending(now=None):
+    """Pending bookings past the TTL without a completed payment"""
+    from .models import Booking, Payment
+
+    cutoff = (now or timezone.now()) - datetime.timedelta(hours=settings.BOOKING_PENDING_TTL_HOURS)
+    paid = Payment.objects.filter(booking=OuterRef('pk'), status='completed')
+    return Booking.objects.filter(status='pending', created_at__lt=cutoff).exclude(Exists(paid))
+
+
+def finished_trips(today=None):
+    """Confirmed bookings whose last day is before ``today``"""
+    from .models import Booking
+
+    today = today or timezone.localdate()
+    return Booking.objects.filter(status='confirmed').alias(ends=trip_end()).filter(ends__lt=today)
+
+
+def _in_chunks(bookings, batch_size, apply):
+    """Run ``apply(pks)`` over ``bookings`` one primary-key chunk at a time"""
+    done = 0
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            # Re-run the filter for every chunk so rows changed meanwhile
+            # (e.g. a payment that just completed) are skipped, and lock the
+            # chunk; rows a request is saving right now wait for the next sweep
+            pks = list(
+                bookings.filter(pk__gt=last_pk).order_by('pk').select_for_update(skip_locked=True)
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                return done
+            done += apply(pks)
+        last_pk = pks[-1]
+
+
+def expire_pending(batch_size=500, now=None):
+    """Cancel stale pending bookings; returns how many were cancelled"""
+    from apps.packages import departures
+    from .models import Booking, Payment
+
+    def expire(pks):
+        # Seats the locked chunk holds, per departure; handing back exactly
+        # these composes with reservations other requests make meanwhile
+        held = list(
+            Booking.objects.filter(pk__in=pks, status='pending').exclude(departure=None)
+            .values('departure_id').annotate(seats=Sum('number_of_people')).order_by('departure_id')
+        )
+        cancelled = Booking.objects.filter(pk__in=pks, status='pending').update(
+            status='cancelled', updated_at=timezone.now(),
+        )
+        Payment.objects.filter(booking_id__in=pks, status='pending').update(status='failed')
+        # The UPDATE skipped Booking.save, so give the seats back here
+        for row in held:
+            departures.release(row['departure_id'], row['seats'])
+        return cancelled
+
+    return _in_chunks(stale_pending(now), batch_size, expire)
+
+
+def complete_finished(batch_size=500, today=None):
+    """Mark confirmed bookings whose trip has ended completed; returns how many"""
+    from .models import Booking
+
+    def complete(pks):
+        return Booking.objects.filter(pk__in=pks, status='confirmed').update(
+            status='completed', updated_at=timezone.now(),
+        )
+
+    return _in_chunks(finished_trips(today), batch_size, complete)
+
+
+def sweep(batch_size=500):
+    """
+    Run both passes if no other node is sweeping. Returns
+    ``(expired, completed)``, or None when the lock was taken.
+    """
+    with advisory_lock(SWEEP_LOCK_KEY) as acquired:
+        if not acquired:
+            return None
+        return expire_pending(batch_size), complete_finished(batch_size)
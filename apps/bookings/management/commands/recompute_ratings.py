@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.bookings import ratings
+
+class Command(BaseCommand):
+    help = 'Rebuild the running rating totals of guides, agencies and packages from their ratings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', choices=sorted(ratings.RATED_MODELS), action='append', dest='types',
+                            help='Only recompute this rating type (repeatable; default: all)')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of rows updated per statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for rating_type in options['types'] or sorted(ratings.RATED_MODELS):
+            model = ratings.rated_model(rating_type)
+            totals = model.objects.order_by('pk').values_list(
+                'pk', 'rating_sum', 'total_ratings', *ratings.STAR_FIELDS.values(),
+            )
+
+            checked = repaired = 0
+            last_pk = 0
+            while True:
+                # Walk the primary key so each batch is a short indexed range update
+                before = list(totals.filter(pk__gt=last_pk)[:batch_size])
+                if not before:
+                    break
+                batch = [row[0] for row in before]
+                with transaction.atomic():
+                    ratings.recompute(rating_type, batch)
+                    after = set(totals.filter(pk__in=batch))
+                    drifted = [row[0] for row in before if row not in after]
+                    for pk in drifted:
+                        ratings.totals_changed.send(sender=model, pk=pk)
+                checked += len(batch)
+                repaired += len(drifted)
+                last_pk = batch[-1]
+
+            self.stdout.write(f'{rating_type}: checked {checked}, repaired {repaired}.')
+
+        self.stdout.write(self.style.SUCCESS('Rating totals recomputed.'))
@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.bookings import lifecycle
+
+class Command(BaseCommand):
+    help = 'Cancel unpaid pending bookings past their TTL and complete bookings whose trip has ended'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of bookings updated per statement')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep sweeping every BOOKING_SWEEP_INTERVAL_SECONDS (safe on several nodes)')
+
+    def handle(self, *args, **options):
+        while True:
+            result = lifecycle.sweep(options['batch_size'])
+            if result is None:
+                self.stdout.write('Another node is sweeping bookings; skipped.')
+            else:
+                expired, completed = result
+                self.stdout.write(self.style.SUCCESS(
+                    f'Expired {expired} pending bookings, completed {completed} finished trips.'
+                ))
+            if not options['loop']:
+                break
+            # Don't hold a connection (or a stale one) between sweeps
+            connection.close()
+            time.sleep(settings.BOOKING_SWEEP_INTERVAL_SECONDS)
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:19
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+
+def backfill_rating_totals(apps, schema_editor):
+    Rating = apps.get_model('bookings', 'Rating')
+    average_field = models.DecimalField(max_digits=12, decimal_places=2)
+    for rating_type, model_name in (('guide', 'guides.Guide'), ('agency', 'accounts.Agency'),
+                                    ('package', 'packages.Package')):
+        ratings = Rating.objects.filter(
+            rating_type=rating_type, **{rating_type: models.OuterRef('pk')}
+        ).order_by().values(rating_type)
+        rating_sum = Coalesce(models.Subquery(
+            ratings.annotate(total=models.Sum('rating')).values('total'), output_field=models.IntegerField(),
+        ), 0)
+        rating_count = Coalesce(models.Subquery(
+            ratings.annotate(count=models.Count('pk')).values('count'), output_field=models.IntegerField(),
+        ), 0)
+        apps.get_model(model_name).objects.update(
+            rating_sum=rating_sum,
+            total_ratings=rating_count,
+            rating=Coalesce(Cast(rating_sum, average_field) / NullIf(rating_count, 0),
+                            models.Value(Decimal('0')), output_field=average_field),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_rating_sum'),
+        ('bookings', '0002_payment'),
+        ('guides', '0006_rating_sum'),
+        ('packages', '0006_rating_sum'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rating_totals, migrations.RunPython.noop),
+    ]
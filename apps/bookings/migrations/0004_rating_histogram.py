@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:21
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_star_counts(apps, schema_editor):
+    Rating = apps.get_model('bookings', 'Rating')
+    for rating_type, model_name in (('guide', 'guides.Guide'), ('agency', 'accounts.Agency'),
+                                    ('package', 'packages.Package')):
+        ratings = Rating.objects.filter(
+            rating_type=rating_type, **{rating_type: models.OuterRef('pk')}
+        ).order_by().values(rating_type)
+        apps.get_model(model_name).objects.update(**{
+            f'stars_{stars}': Coalesce(models.Subquery(
+                ratings.filter(rating=stars).annotate(count=models.Count('pk')).values('count'),
+                output_field=models.IntegerField(),
+            ), 0)
+            for stars in range(1, 6)
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_rating_histogram'),
+        ('bookings', '0003_backfill_rating_totals'),
+        ('guides', '0007_rating_histogram'),
+        ('packages', '0007_rating_histogram'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['guide', '-created_at', '-id'], name='rating_guide_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['agency', '-created_at', '-id'], name='rating_agency_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['package', '-created_at', '-id'], name='rating_package_recent'),
+        ),
+        migrations.RunPython(backfill_star_counts, migrations.RunPython.noop),
+    ]
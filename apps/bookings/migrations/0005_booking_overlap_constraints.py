@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:24
+
+import apps.bookings.availability
+import django.contrib.postgres.constraints
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_rating_histogram'),
+        ('bookings', '0004_rating_histogram'),
+        ('guides', '0007_rating_histogram'),
+        ('packages', '0007_rating_histogram'),
+    ]
+
+    operations = [
+        # Lets the GiST constraints compare guide_id / package_id with =
+        BtreeGistExtension(),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('guide__isnull', False), ('status__in', ('pending', 'confirmed'))), expressions=[('guide', '='), (apps.bookings.availability.BookedPeriod(), '&&')], name='booking_guide_no_overlap'),
+        ),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('package__isnull', False), ('status__in', ('pending', 'confirmed'))), expressions=[('package', '='), (apps.bookings.availability.BookedPeriod(), '&&')], name='booking_package_no_overlap'),
+        ),
+    ]
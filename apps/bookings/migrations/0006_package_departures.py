@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_departures(apps, schema_editor):
+    # Existing package bookings join a departure on their travel date; one
+    # that was booked past max_people gets as many seats as it already sold
+    Booking = apps.get_model('bookings', 'Booking')
+    Departure = apps.get_model('packages', 'Departure')
+    seats = (
+        Booking.objects.exclude(status='cancelled').filter(package__isnull=False)
+        .values('package_id', 'package__max_people', 'travel_date')
+        .annotate(taken=models.Sum('number_of_people')).order_by()
+    )
+    for row in seats:
+        departure, _ = Departure.objects.get_or_create(
+            package_id=row['package_id'], start_date=row['travel_date'],
+            defaults={'seats_total': max(row['package__max_people'], row['taken']), 'seats_taken': row['taken']},
+        )
+        Booking.objects.exclude(status='cancelled').filter(
+            package_id=row['package_id'], travel_date=row['travel_date'],
+        ).update(departure=departure)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_booking_overlap_constraints'),
+        ('packages', '0008_departure'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='booking',
+            name='booking_package_no_overlap',
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='departure',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bookings', to='packages.departure'),
+        ),
+        migrations.RunPython(backfill_departures, migrations.RunPython.noop),
+    ]
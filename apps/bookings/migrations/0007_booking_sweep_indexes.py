@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:29
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_rating_histogram'),
+        ('bookings', '0006_package_departures'),
+        ('guides', '0007_rating_histogram'),
+        ('packages', '0008_departure'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['created_at'], name='booking_pending_created'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('end_date', 'travel_date'), condition=models.Q(('status', 'confirmed')), name='booking_confirmed_trip_end'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:31
+
+import apps.bookings.idempotency
+from django.db import migrations, models
+
+
+def fail_duplicate_pending_payments(apps, schema_editor):
+    # Keep the newest pending payment of each booking; older ones were never
+    # going to be paid
+    Payment = apps.get_model('bookings', 'Payment')
+    newer = Payment.objects.filter(booking=models.OuterRef('booking'), status='pending', pk__gt=models.OuterRef('pk'))
+    Payment.objects.filter(status='pending').filter(models.Exists(newer)).update(status='failed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_rating_histogram'),
+        ('bookings', '0007_booking_sweep_indexes'),
+        ('guides', '0007_rating_histogram'),
+        ('packages', '0008_departure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='transaction_id',
+            field=models.CharField(default=apps.bookings.idempotency.new_transaction_id, max_length=100, unique=True),
+        ),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(condition=models.Q(('idempotency_key', ''), _negated=True), fields=('tourist', 'idempotency_key'), name='booking_tourist_idempotency_key'),
+        ),
+        migrations.RunPython(fail_duplicate_pending_payments, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('booking',), name='payment_one_pending_per_booking'),
+        ),
+    ]
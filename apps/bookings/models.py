@@ -1,8 +1,18 @@
-from django.db import models
+from django.db import models, transaction
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import RangeOperators
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models.functions import Coalesce
 from apps.accounts.models import Tourist, Agency
 from apps.guides.models import Guide
-from apps.packages.models import Package
+from apps.packages import departures
+from apps.packages.models import Departure, Package
+from . import ratings
+from .idempotency import new_transaction_id
+from .availability import ACTIVE_STATUSES, booked_period
+
+# Booking fields that decide which departure seats a booking holds
+SEAT_FIELDS = {'departure_id', 'status', 'number_of_people'}
 
 class Booking(models.Model):
     STATUS_CHOICES = (
@@ -16,6 +26,8 @@ class Booking(models.Model):
     package = models.ForeignKey(Package, on_delete=models.CASCADE, null=True, blank=True)
     guide = models.ForeignKey(Guide, on_delete=models.CASCADE, null=True, blank=True)
     agency = models.ForeignKey(Agency, on_delete=models.CASCADE)
+    # Package bookings take number_of_people seats here (apps.packages.departures)
+    departure = models.ForeignKey(Departure, on_delete=models.SET_NULL, null=True, blank=True, related_name='bookings')
     
     booking_date = models.DateTimeField(auto_now_add=True)
     travel_date = models.DateField()
@@ -26,11 +38,33 @@ class Booking(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     special_requirements = models.TextField(blank=True)
     notes = models.TextField(blank=True)
+    # Key of the form submission that made this booking (apps.bookings.idempotency)
+    idempotency_key = models.CharField(max_length=64, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tourist', 'idempotency_key'], condition=~models.Q(idempotency_key=''),
+                name='booking_tourist_idempotency_key',
+            ),
+            # No two active bookings of one guide share a day
+            # (apps.bookings.availability); needs the btree_gist extension.
+            # Packages share departures and are limited by seats instead.
+            ExclusionConstraint(
+                name='booking_guide_no_overlap',
+                expressions=[('guide', RangeOperators.EQUAL), (booked_period(), RangeOperators.OVERLAPS)],
+                condition=models.Q(status__in=ACTIVE_STATUSES, guide__isnull=False),
+            ),
+        ]
+        indexes = [
+            # Small partial indexes the lifecycle sweep (apps.bookings.lifecycle) walks
+            models.Index(fields=['created_at'], condition=models.Q(status='pending'), name='booking_pending_created'),
+            models.Index(Coalesce('end_date', 'travel_date'), condition=models.Q(status='confirmed'),
+                         name='booking_confirmed_trip_end'),
+        ]
 
     def __str__(self):
         return f"Booking #{self.id} - {self.tourist.full_name}"
@@ -39,6 +73,37 @@ class Booking(models.Model):
     def remaining_amount(self):
         return self.total_amount - self.advance_amount
 
+    def seats_held(self):
+        """``(departure id, seats)`` this booking takes, or None"""
+        if self.departure_id and self.status != 'cancelled':
+            return (self.departure_id, self.number_of_people)
+        return None
+
+    def stored_seats_held(self):
+        """
+        The seats the stored row holds, read under a row lock so concurrent
+        writers (another request, the lifecycle sweep) move them one at a time.
+        Call inside a transaction.
+        """
+        stored = Booking.objects.select_for_update().only(*SEAT_FIELDS).filter(pk=self.pk).first()
+        return stored.seats_held() if stored else None
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None if self._state.adding else self.stored_seats_held()
+            current = self.seats_held()
+            if previous != current:
+                # Move the seats before writing the row, so a full departure
+                # rolls back the whole save
+                if previous:
+                    departures.release(*previous)
+                if current and not departures.reserve(*current):
+                    raise departures.SoldOut(f'Departure {current[0]} has fewer than {current[1]} seats left')
+            super().save(*args, **kwargs)
+
+# Rating fields that decide which running total a rating counts towards
+TARGET_FIELDS = {'rating_type', 'guide_id', 'agency_id', 'package_id', 'rating'}
+
 class Rating(models.Model):
     RATING_TYPES = (
         ('guide', 'Guide'),
@@ -63,17 +128,52 @@ class Rating(models.Model):
             ['tourist', 'agency'],
             ['tourist', 'package'],
         ]
+        indexes = [
+            # Newest-first review pages per target (apps.bookings.ratings.reviews)
+            models.Index(fields=['guide', '-created_at', '-id'], name='rating_guide_recent'),
+            models.Index(fields=['agency', '-created_at', '-id'], name='rating_agency_recent'),
+            models.Index(fields=['package', '-created_at', '-id'], name='rating_package_recent'),
+        ]
 
     def __str__(self):
         return f"{self.rating}★ - {self.get_rating_type_display()}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if TARGET_FIELDS.issubset(instance.__dict__):
+            instance._counted = instance.counted_towards()
+        return instance
+
+    def counted_towards(self):
+        """``(rating_type, target id, stars)`` this rating adds to, or None"""
+        if self.rating_type not in ratings.RATED_MODELS:
+            return None
+        target_id = getattr(self, f'{self.rating_type}_id')
+        return (self.rating_type, target_id, self.rating) if target_id else None
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Update related model ratings
-        if self.rating_type == 'guide' and self.guide:
-            self.guide.update_rating()
-        elif self.rating_type == 'agency' and self.agency:
-            self.agency.update_rating()
+        with transaction.atomic():
+            if self._state.adding:
+                previous = None
+            elif hasattr(self, '_counted'):
+                previous = self._counted
+            else:
+                # Loaded with deferred fields; read what the stored row counted for
+                stored = Rating.objects.only(*TARGET_FIELDS).get(pk=self.pk)
+                previous = stored.counted_towards()
+            super().save(*args, **kwargs)
+            # Move the running totals on the rated object (apps.bookings.ratings)
+            current = self.counted_towards()
+            if previous and current and previous[:2] == current[:2]:
+                # Same target, new stars: one UPDATE moves both counters
+                ratings.adjust(current[0], current[1], added=current[2], removed=previous[2])
+            elif previous != current:
+                if previous:
+                    ratings.adjust(previous[0], previous[1], removed=previous[2])
+                if current:
+                    ratings.adjust(current[0], current[1], added=current[2])
+            self._counted = current
 
  
 class Payment(models.Model):
@@ -87,5 +187,13 @@ class Payment(models.Model):
     product_code = models.CharField(max_length=100, default='EPAYTEST')
     payment_date = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=status_choices, default='pending')
-    transaction_id = models.CharField(max_length=100, unique=True)
+    transaction_id = models.CharField(max_length=100, unique=True, default=new_transaction_id)
     service_charge = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
+
+    class Meta:
+        constraints = [
+            # A retried payment submission reuses the booking's open payment
+            models.UniqueConstraint(
+                fields=['booking'], condition=models.Q(status='pending'), name='payment_one_pending_per_booking',
+            ),
+        ]
@@ -0,0 +1,123 @@
+# apps/bookings/ratings.py
+"""
+Running rating aggregates for guides, agencies and packages.
+
+Each rated model stores ``rating_sum``, ``total_ratings`` and one counter per
+star value (``stars_1`` .. ``stars_5``) next to the ``rating`` average. Saving
+or deleting a Rating adjusts them with one
+``UPDATE ... SET rating_sum = rating_sum + d, stars_4 = stars_4 + 1`` on the
+target row, inside the same transaction as the rating write, so concurrent
+reviews never race and nothing is re-read; detail pages render the star
+histogram straight from the row. ``recompute`` rebuilds them from the Rating
+table for ``manage.py recompute_ratings``.
+"""
+from collections import Counter
+from decimal import Decimal
+
+from django.apps import apps
+from django.db.models import Count, DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.dispatch import Signal
+
+# rating_type -> the rated model, which also names the Rating foreign key
+RATED_MODELS = {
+    'guide': 'guides.Guide',
+    'agency': 'accounts.Agency',
+    'package': 'packages.Package',
+}
+
+# Star value -> the column counting ratings with that many stars
+STAR_FIELDS = {stars: f'stars_{stars}' for stars in range(1, 6)}
+
+# Sent after a target's aggregate columns change, with ``pk``; the columns are
+# written with UPDATE, so post_save doesn't fire for them
+totals_changed = Signal()
+
+AVERAGE_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+
+def rated_model(rating_type):
+    return apps.get_model(RATED_MODELS[rating_type])
+
+
+def average(total, count):
+    """Average of two integer expressions, 0 when there are no ratings"""
+    return Coalesce(
+        Cast(total, AVERAGE_FIELD) / NullIf(count, Value(0)),
+        Value(Decimal('0')), output_field=AVERAGE_FIELD,
+    )
+
+
+def adjust(rating_type, target_id, added=None, removed=None):
+    """
+    Count a rating of ``added`` stars into one target's totals and/or take one
+    of ``removed`` stars out. Every SET reads the pre-update row.
+    """
+    if target_id is None or added == removed:
+        return
+    model = rated_model(rating_type)
+    stars = Counter()
+    if added:
+        stars[added] += 1
+    if removed:
+        stars[removed] -= 1
+    new_sum = F('rating_sum') + sum(value * delta for value, delta in stars.items())
+    new_count = F('total_ratings') + sum(stars.values())
+    model.objects.filter(pk=target_id).update(
+        rating_sum=new_sum,
+        total_ratings=new_count,
+        rating=average(new_sum, new_count),
+        **{STAR_FIELDS[value]: F(STAR_FIELDS[value]) + delta for value, delta in stars.items()},
+    )
+    totals_changed.send(sender=model, pk=target_id)
+
+
+def histogram(target):
+    """Rows for a star breakdown, 5 stars first, read from the target's counters"""
+    total = target.total_ratings
+    return [
+        {
+            'stars': value,
+            'count': getattr(target, STAR_FIELDS[value]),
+            'percent': round(100 * getattr(target, STAR_FIELDS[value]) / total) if total else 0,
+        }
+        for value in sorted(STAR_FIELDS, reverse=True)
+    ]
+
+
+def reviews(rating_type, target_id):
+    """A target's ratings, newest first, with the tourist joined in"""
+    from .models import Rating
+
+    return Rating.objects.filter(
+        rating_type=rating_type, **{f'{rating_type}_id': target_id},
+    ).select_related('tourist').only(
+        'rating', 'review', 'created_at', 'tourist__full_name',
+    ).order_by('-created_at')
+
+
+def recompute(rating_type, pks=None):
+    """Rebuild the totals of ``pks`` (default: every row) from the Rating table"""
+    from .models import Rating
+
+    model = rated_model(rating_type)
+    ratings = Rating.objects.filter(rating_type=rating_type, **{rating_type: OuterRef('pk')}).order_by()
+
+    def count(queryset):
+        return Coalesce(Subquery(
+            queryset.values(rating_type).annotate(count=Count('pk')).values('count'),
+            output_field=IntegerField(),
+        ), 0)
+
+    rating_sum = Coalesce(Subquery(
+        ratings.values(rating_type).annotate(total=Sum('rating')).values('total'),
+        output_field=IntegerField(),
+    ), 0)
+    rating_count = count(ratings)
+    targets = model.objects.all() if pks is None else model.objects.filter(pk__in=pks)
+    return targets.update(
+        rating_sum=rating_sum,
+        total_ratings=rating_count,
+        rating=average(rating_sum, rating_count),
+        **{field: count(ratings.filter(rating=value)) for value, field in STAR_FIELDS.items()},
+    )
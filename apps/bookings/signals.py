@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+from apps.packages import departures
+from . import ratings
+from .models import Booking, Rating
+
+@receiver(post_delete, sender=Rating)
+def uncount_deleted_rating(sender, instance, **kwargs):
+    """Take a deleted rating (including cascades and queryset deletes) out of its target's totals"""
+    counted = instance._counted if hasattr(instance, '_counted') else instance.counted_towards()
+    if counted:
+        rating_type, target_id, stars = counted
+        ratings.adjust(rating_type, target_id, removed=stars)
+
+@receiver(pre_delete, sender=Booking)
+def lock_deleted_booking(sender, instance, **kwargs):
+    """Read the seats a booking holds from its locked row; deletes run in a transaction"""
+    instance._held = instance.stored_seats_held()
+
+@receiver(post_delete, sender=Booking)
+def release_deleted_booking(sender, instance, **kwargs):
+    """Give a deleted booking's seats back to its departure"""
+    held = instance._held if hasattr(instance, '_held') else instance.seats_held()
+    if held:
+        departures.release(*held)
@@ -3,14 +3,49 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
+from django.http import Http404
 from .models import Booking, Rating,Payment
 from .forms import BookingForm, RatingForm
+from apps.packages import departures
 from apps.packages.models import Package
 from apps.guides.models import Guide
 from apps.accounts.models import Agency
-import uuid
+from datetime import timedelta
+from . import availability, idempotency
 from .esewa_helper import SimpleEsewaPayment as EsewaPayment
 
+def continue_booking(booking):
+    """Where a repeated submission of ``booking``'s form goes: its open payment, else the booking"""
+    payment = booking.payments.filter(status='pending').first()
+    if payment is not None:
+        return redirect('bookings:process_payment', payment_id=payment.transaction_id)
+    return redirect('bookings:booking_detail', booking_id=booking.id)
+
+def dates_taken(form):
+    form.add_error(None, 'Selected dates are not available. Please choose different dates.')
+
+def seats_taken(form):
+    form.add_error(None, 'Not enough seats left on this departure. Please choose a different date.')
+
+def not_scheduled(form):
+    form.add_error('travel_date', 'This package only departs on its scheduled dates. Please choose one of them.')
+
+def package_form_context(form, package):
+    return {
+        'form': form,
+        'package': package,
+        # None when the package has no schedule and any date can be booked
+        'open_dates': departures.open_dates(package),
+    }
+
+def dates_available(form, start, end, **resource):
+    """Conflict check against the resource's booked ranges; adds a form error on a clash"""
+    if availability.is_available(start, end, **resource):
+        return True
+    dates_taken(form)
+    return False
+
 @login_required
 def book_package(request, package_id):
     if request.user.user_type != 'tourist':
@@ -22,12 +57,34 @@ def book_package(request, package_id):
     if request.method == 'POST':
         form = BookingForm(request.POST)
         if form.is_valid():
-            booking = form.save(commit=False)
-            booking.tourist = request.user.tourist
-            booking.package = package
-            booking.agency = package.agency
-            booking.total_amount = package.price_per_person * booking.number_of_people
-            booking.save()
+            key = form.cleaned_data['idempotency_key']
+            with transaction.atomic():
+                # A double-click or retried POST continues with the booking it already made
+                earlier = idempotency.replayed_booking(request.user.tourist, key)
+                if earlier is not None:
+                    return continue_booking(earlier)
+                booking = form.save(commit=False)
+                booking.tourist = request.user.tourist
+                booking.package = package
+                try:
+                    booking.departure = departures.departure_on(package, booking.travel_date)
+                except departures.NotScheduled:
+                    not_scheduled(form)
+                    return render(request, 'bookings/book_package.html', package_form_context(form, package))
+                booking.agency = package.agency
+                booking.total_amount = package.price_per_person * booking.number_of_people
+                booking.idempotency_key = key
+                if not availability.save_booking(booking):
+                    seats_taken(form)
+                    return render(request, 'bookings/book_package.html', package_form_context(form, package))
+                
+                # create payment object 
+                payment = Payment.objects.create(
+                    booking=booking,
+                    amount=booking.total_amount,
+                    status='pending',
+                    service_charge=0.0
+                )
             
             # Send confirmation email (optional)
             try:
@@ -41,25 +98,12 @@ def book_package(request, package_id):
             except:
                 pass
              
-            # create payment object 
-            id = str(uuid.uuid4())[:10]
-            payment = Payment.objects.create(
-                booking=booking,
-                amount=booking.total_amount,
-                transaction_id=id,
-                status='pending',
-                service_charge=0.0
-            )
             messages.success(request, 'Booking submitted successfully! Proceed to payment.')
-            return redirect('bookings:process_payment', payment_id=id)
+            return redirect('bookings:process_payment', payment_id=payment.transaction_id)
     else:
         form = BookingForm()
     
-    context = {
-        'form': form,
-        'package': package,
-    }
-    return render(request, 'bookings/book_package.html', context)
+    return render(request, 'bookings/book_package.html', package_form_context(form, package))
 
 @login_required
 def book_guide(request, guide_id):
@@ -72,27 +116,39 @@ def book_guide(request, guide_id):
     if request.method == 'POST':
         form = BookingForm(request.POST)
         if form.is_valid():
-            booking = form.save(commit=False)
-            booking.tourist = request.user.tourist
-            booking.guide = guide
-            booking.agency = guide.agency
-            
-            # Calculate duration and total amount
-            duration = (booking.end_date - booking.travel_date).days + 1
-            booking.total_amount = guide.daily_rate * duration
-            booking.save()
-            
-            # create payment object 
-            id = str(uuid.uuid4())[:10]
-            payment = Payment.objects.create(
-                booking=booking,
-                amount=booking.total_amount,
-                transaction_id=id,
-                status='pending',
-                service_charge=0.0
-            )
+            key = form.cleaned_data['idempotency_key']
+            with transaction.atomic():
+                # A double-click or retried POST continues with the booking it already made
+                earlier = idempotency.replayed_booking(request.user.tourist, key)
+                if earlier is not None:
+                    return continue_booking(earlier)
+                if not dates_available(
+                    form, form.cleaned_data['travel_date'], form.cleaned_data['end_date'], guide=guide,
+                ):
+                    return render(request, 'bookings/book_guide.html', {'form': form, 'guide': guide})
+                booking = form.save(commit=False)
+                booking.tourist = request.user.tourist
+                booking.guide = guide
+                booking.agency = guide.agency
+                booking.idempotency_key = key
+                
+                # Calculate duration and total amount
+                duration = (booking.end_date - booking.travel_date).days + 1
+                booking.total_amount = guide.daily_rate * duration
+                if not availability.save_booking(booking):
+                    # Another booking of these dates committed since the check
+                    dates_taken(form)
+                    return render(request, 'bookings/book_guide.html', {'form': form, 'guide': guide})
+                
+                # create payment object 
+                payment = Payment.objects.create(
+                    booking=booking,
+                    amount=booking.total_amount,
+                    status='pending',
+                    service_charge=0.0
+                )
             messages.success(request, 'Guide booking submitted successfully! Proceed to payment.')
-            return redirect('bookings:process_payment', payment_id=id)
+            return redirect('bookings:process_payment', payment_id=payment.transaction_id)
     else:
         form = BookingForm()
     
@@ -195,7 +251,23 @@ def process_payment(request, payment_id):
 
 @login_required
 def payment_success(request, transaction_id):
-    payment = get_object_or_404(Payment, transaction_id=transaction_id, status='pending')
+    with transaction.atomic():
+        # Lock the payment and its booking so repeated callbacks apply once
+        payment = get_object_or_404(
+            Payment.objects.select_for_update().select_related('booking'), transaction_id=transaction_id,
+        )
+        if payment.status == 'completed':
+            messages.success(request, 'Payment completed successfully!')
+            return redirect('bookings:booking_detail', booking_id=payment.booking.id)
+        # A booking the sweeper expired has its pending payment marked failed;
+        # a tourist who paid anyway is still verified and reinstated if possible
+        expired = payment.status == 'failed' and payment.booking.status == 'cancelled'
+        if payment.status != 'pending' and not expired:
+            raise Http404('No pending payment with this transaction id.')
+        response = complete_payment(request, payment, transaction_id)
+    return response
+
+def complete_payment(request, payment, transaction_id):
     epayment = EsewaPayment(
         amount=payment.amount,
         tax_amount=0,
@@ -208,9 +280,12 @@ def payment_success(request, transaction_id):
     epayment.create_signature(transaction_uuid=transaction_id)
     if epayment.is_completed(True):
         payment.status = 'completed'
-        payment.booking.status = 'confirmed'
-        payment.booking.save()
         payment.save()
+        payment.booking.status = 'confirmed'
+        if not availability.save_booking(payment.booking):
+            # Expired by the sweeper and its dates or seats went to someone else
+            messages.error(request, 'Payment received, but the booking could not be reinstated. Please contact support.')
+            return redirect('bookings:booking_detail', booking_id=payment.booking.id)
     else:
         messages.error(request, 'Payment verification failed. Please contact support.')
         return redirect('bookings:payment_failure', transaction_id=payment.transaction_id)
@@ -221,11 +296,18 @@ def payment_success(request, transaction_id):
 
 
 def payment_failure(request, transaction_id):
-    payment = get_object_or_404(Payment, transaction_id=transaction_id, status='pending')
-    payment.status = 'failed'
-    payment.booking.status = 'cancelled'  # Set to cancelled instead of failed
-    payment.booking.save()
-    payment.save()
+    with transaction.atomic():
+        payment = get_object_or_404(
+            Payment.objects.select_for_update().select_related('booking'), transaction_id=transaction_id,
+        )
+        if payment.status == 'pending':
+            payment.status = 'failed'
+            payment.save()
+            if payment.booking.status == 'pending':
+                payment.booking.status = 'cancelled'  # Set to cancelled instead of failed
+                payment.booking.save()
+        elif payment.status != 'failed':
+            raise Http404('No pending payment with this transaction id.')
     
     messages.error(request, 'Payment failed. Please try again.')
     return redirect('bookings:booking_detail', booking_id=payment.booking.id)
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.core'
+
+    def ready(self):
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+        from . import lookups, query_cache, signals  # noqa: F401
+
+        connection_created.connect(query_cache.install, dispatch_uid='query_cache_install')
+        for connection in connections.all(initialized_only=True):
+            query_cache.install(connection=connection)
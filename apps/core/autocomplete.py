@@ -0,0 +1,310 @@
+# apps/core/autocomplete.py
+"""
+In-memory typeahead for the search box.
+
+Each suggestion kind (packages, guides, agencies, places) keeps a sorted
+array of ``(key, item_id)`` pairs, where every word-start suffix of the
+normalized label is a key, so "camp" finds "Everest Base Camp Trek". A
+lookup is a bisect to the first key with the prefix and a scan of the
+matching run, ranked by a popularity weight (views for packages, ratings
+for guides and agencies, number of guides covering a place).
+
+The arrays are never mutated in place: writers build a new snapshot under a
+lock and swap it in with a single assignment, so request threads read
+whatever snapshot they grabbed without locking and without touching the DB.
+"""
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+
+from django.conf import settings
+from django.urls import reverse
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('packages', 'guides', 'agencies', 'places')
+MIN_PREFIX_LENGTH = 2
+DEFAULT_LIMIT = 5
+MAX_LIMIT = 10
+
+
+def normalize(text):
+    return ' '.join((text or '').lower().split())
+
+
+def suffix_keys(label):
+    """Every word-start suffix of the normalized label"""
+    words = normalize(label).split(' ')
+    return {' '.join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+def split_places(places_covered):
+    """Normalized place key -> display label, keyed like the Place gazetteer"""
+    from apps.guides.models import Place
+    return Place.split(places_covered)
+
+
+class Snapshot:
+    """Immutable view of every suggestion; replaced wholesale on each update"""
+
+    def __init__(self, keys, items, guide_places, place_counts, place_labels):
+        self.keys = keys                  # kind -> sorted [(key, item_id)]
+        self.items = items                # kind -> {item_id: (label, url, weight)}
+        self.guide_places = guide_places  # guide pk -> {place key: label}
+        self.place_counts = place_counts  # place key -> number of guides
+        self.place_labels = place_labels  # place key -> display label
+
+    @classmethod
+    def empty(cls):
+        return cls({kind: [] for kind in KINDS}, {kind: {} for kind in KINDS}, {}, Counter(), {})
+
+    def lookup(self, kind, prefix, limit):
+        keys = self.keys[kind]
+        items = self.items[kind]
+        seen = set()
+        position = bisect_left(keys, (prefix,))
+        while position < len(keys) and keys[position][0].startswith(prefix):
+            seen.add(keys[position][1])
+            position += 1
+        best = heapq.nlargest(limit, seen, key=lambda item_id: (items[item_id][2], items[item_id][0]))
+        return [{'label': items[item_id][0], 'url': items[item_id][1]} for item_id in best]
+
+
+class Autocomplete:
+    def __init__(self):
+        self.snapshot = Snapshot.empty()
+        self.built_at = 0.0
+        self._write_lock = threading.Lock()
+
+    def suggest(self, prefix, limit=DEFAULT_LIMIT):
+        prefix = normalize(prefix)
+        if len(prefix) < MIN_PREFIX_LENGTH:
+            return {kind: [] for kind in KINDS}
+        snapshot = self.snapshot
+        return {kind: snapshot.lookup(kind, prefix, limit) for kind in KINDS}
+
+    # Writers -----------------------------------------------------------------
+
+    def replace(self, snapshot):
+        with self._write_lock:
+            self.snapshot = snapshot
+            self.built_at = time.time()
+
+    def apply(self, changes, guide_changes=()):
+        """
+        Copy-on-write update. ``changes`` is an iterable of
+        ``(kind, item_id, label, url, weight)``, with ``label=None`` for a
+        removal; ``guide_changes`` maps guide pks to their new place dict
+        (or None when the guide stops being listed).
+        """
+        with self._write_lock:
+            current = self.snapshot
+            keys = {kind: current.keys[kind] for kind in KINDS}
+            items = {kind: current.items[kind] for kind in KINDS}
+            copied = set()
+
+            def writable(kind):
+                if kind not in copied:
+                    keys[kind] = list(keys[kind])
+                    items[kind] = dict(items[kind])
+                    copied.add(kind)
+
+            def put(kind, item_id, label, url, weight):
+                writable(kind)
+                old = items[kind].pop(item_id, None)
+                if old is not None:
+                    for key in suffix_keys(old[0]):
+                        position = bisect_left(keys[kind], (key, item_id))
+                        if position < len(keys[kind]) and keys[kind][position] == (key, item_id):
+                            del keys[kind][position]
+                if label is not None:
+                    items[kind][item_id] = (label, url, weight)
+                    for key in suffix_keys(label):
+                        insort(keys[kind], (key, item_id))
+
+            for kind, item_id, label, url, weight in changes:
+                put(kind, item_id, label, url, weight)
+
+            guide_places = current.guide_places
+            place_counts = current.place_counts
+            place_labels = current.place_labels
+            if guide_changes:
+                guide_places = dict(guide_places)
+                place_counts = Counter(place_counts)
+                place_labels = dict(place_labels)
+                touched = set()
+                for guide_id, places in dict(guide_changes).items():
+                    for place in guide_places.pop(guide_id, {}):
+                        place_counts[place] -= 1
+                        touched.add(place)
+                    if places:
+                        guide_places[guide_id] = places
+                        for place, label in places.items():
+                            place_counts[place] += 1
+                            place_labels.setdefault(place, label)
+                            touched.add(place)
+                for place in touched:
+                    count = place_counts[place]
+                    if count <= 0:
+                        del place_counts[place]
+                        put('places', place, None, None, 0)
+                        place_labels.pop(place, None)
+                    else:
+                        put('places', place, place_labels[place], place_url(place_labels[place]), count)
+
+            self.snapshot = Snapshot(keys, items, guide_places, place_counts, place_labels)
+
+
+# Suggestion sources ------------------------------------------------------------
+
+def place_url(label):
+    from urllib.parse import urlencode
+    return f"{reverse('guides:guide_list')}?{urlencode({'place': label})}"
+
+
+def package_entry(package):
+    weight = package.views_count + (100 if package.featured else 0)
+    return 'packages', package.pk, package.title, reverse('core:package_detail', args=[package.slug]), weight
+
+
+def guide_entry(guide):
+    weight = float(guide.rating or 0) * (guide.total_ratings + 1)
+    return 'guides', guide.pk, guide.name, reverse('core:guide_detail', args=[guide.pk]), weight
+
+
+def agency_entry(agency):
+    weight = float(agency.rating or 0) * (agency.total_ratings + 1)
+    return 'agencies', agency.pk, agency.name, reverse('core:agency_detail', args=[agency.pk]), weight
+
+
+def listed_packages():
+    from apps.packages.models import Package
+    return Package.objects.filter(is_active=True, agency__is_verified=True).only(
+        'title', 'slug', 'views_count', 'featured',
+    )
+
+
+def listed_guides():
+    from apps.guides.models import Guide
+    return Guide.objects.filter(is_available=True, agency__is_verified=True).only(
+        'name', 'rating', 'total_ratings', 'places_covered',
+    )
+
+
+def listed_agencies():
+    from apps.accounts.models import Agency
+    return Agency.objects.filter(is_verified=True).only('name', 'rating', 'total_ratings')
+
+
+def build_snapshot():
+    """Build every array from the database in one pass per model"""
+    items = {kind: {} for kind in KINDS}
+    keys = {kind: [] for kind in KINDS}
+    guide_places = {}
+    place_counts = Counter()
+    place_labels = {}
+
+    entries = [package_entry(package) for package in listed_packages().iterator(chunk_size=500)]
+    for guide in listed_guides().iterator(chunk_size=500):
+        entries.append(guide_entry(guide))
+        places = split_places(guide.places_covered)
+        guide_places[guide.pk] = places
+        for place, label in places.items():
+            place_counts[place] += 1
+            place_labels.setdefault(place, label)
+    entries.extend(agency_entry(agency) for agency in listed_agencies().iterator(chunk_size=500))
+    entries.extend(
+        ('places', place, place_labels[place], place_url(place_labels[place]), count)
+        for place, count in place_counts.items()
+    )
+
+    for kind, item_id, label, url, weight in entries:
+        items[kind][item_id] = (label, url, weight)
+        keys[kind].extend((key, item_id) for key in suffix_keys(label))
+    for kind in KINDS:
+        keys[kind].sort()
+    return Snapshot(keys, items, guide_places, place_counts, place_labels)
+
+
+# Process-wide instance ---------------------------------------------------------
+
+_autocomplete = None
+_autocomplete_lock = threading.Lock()
+_refreshing = threading.Lock()
+
+
+def get_autocomplete():
+    """
+    Return the process-wide autocomplete, building it on first use. Signals
+    keep it current for writes made in this process; writes from other
+    workers are picked up by a periodic rebuild in a background thread, so
+    requests never wait on the database.
+    """
+    global _autocomplete
+    if _autocomplete is None:
+        with _autocomplete_lock:
+            if _autocomplete is None:
+                autocomplete = Autocomplete()
+                autocomplete.replace(build_snapshot())
+                _autocomplete = autocomplete
+    elif time.time() - _autocomplete.built_at > settings.SEARCH_INDEX_REFRESH_SECONDS:
+        if _refreshing.acquire(blocking=False):
+            threading.Thread(target=_refresh, daemon=True).start()
+    return _autocomplete
+
+
+def _refresh():
+    from django.db import connection
+    try:
+        _autocomplete.replace(build_snapshot())
+    except Exception:
+        logger.exception('Could not rebuild autocomplete')
+        # Back off for a full interval instead of retrying on every request
+        _autocomplete.built_at = time.time()
+    finally:
+        connection.close()
+        _refreshing.release()
+
+
+def autocomplete_loaded():
+    return _autocomplete is not None
+
+
+def refresh_package(pk):
+    package = listed_packages().filter(pk=pk).first()
+    if package is None:
+        _autocomplete.apply([('packages', pk, None, None, 0)])
+    else:
+        _autocomplete.apply([package_entry(package)])
+
+
+def refresh_guide(pk):
+    guide = listed_guides().filter(pk=pk).first()
+    if guide is None:
+        _autocomplete.apply([('guides', pk, None, None, 0)], {pk: None})
+    else:
+        _autocomplete.apply([guide_entry(guide)], {pk: split_places(guide.places_covered)})
+
+
+def refresh_agency(pk, cascade=False):
+    """Refresh an agency suggestion; ``cascade`` also refreshes its packages and guides"""
+    from apps.packages.models import Package
+    from apps.guides.models import Guide
+    agency = listed_agencies().filter(pk=pk).first()
+    changes = [agency_entry(agency) if agency else ('agencies', pk, None, None, 0)]
+    guide_changes = {}
+    if cascade:
+        # Verification decides whether the agency's packages and guides are listed
+        listed = {package.pk: package for package in listed_packages().filter(agency_id=pk)}
+        for package_id in Package.objects.filter(agency_id=pk).values_list('pk', flat=True):
+            package = listed.get(package_id)
+            changes.append(package_entry(package) if package else ('packages', package_id, None, None, 0))
+        listed = {guide.pk: guide for guide in listed_guides().filter(agency_id=pk)}
+        for guide_id in Guide.objects.filter(agency_id=pk).values_list('pk', flat=True):
+            guide = listed.get(guide_id)
+            changes.append(guide_entry(guide) if guide else ('guides', guide_id, None, None, 0))
+            guide_changes[guide_id] = split_places(guide.places_covered) if guide else None
+    _autocomplete.apply(changes, guide_changes)
@@ -0,0 +1,307 @@
+# apps/core/cache_backends.py
+"""
+Two-tier cache backend: a bounded per-process LRU in front of a shared cache.
+
+Reads are served from the worker's own memory when possible and fall through
+to the shared backend (the ``SHARED`` cache alias: Redis, or the
+``LockingFileBasedCache`` below for single-host deployments) otherwise;
+writes go to both. Local copies live at most ``LOCAL_TIMEOUT`` seconds, which
+bounds how long another worker's write or invalidation can go unseen here.
+Counters (``incr``/``decr``) and ``add`` always go to the shared tier, and
+both shared backends make them atomic, so they stay correct across processes.
+
+Tests can point the ``shared`` alias at a LocMemCache stand-in.
+
+Per-namespace counters (the namespace is the key up to its first ``:``, or
+the first three dotted parts of Django's own keys such as template fragments) are
+kept in process and merged into the shared tier every ``STATS_FLUSH_SECONDS``;
+``apps.core.caching.stats`` reads them back.
+"""
+import fcntl
+import os
+import pickle
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+
+STATS_KEY = 'cache_stats:{}:{}'
+# Every namespace that has reported counters, so they can be listed
+NAMESPACES_KEY = 'cache_stats:namespaces'
+OUTCOMES = ('local_hits', 'shared_hits', 'misses', 'evictions')
+
+
+def namespace_of(key):
+    key = str(key)
+    if ':' in key:
+        return key.split(':', 1)[0]
+    # Django's own keys, e.g. template.cache.<fragment>.<hash>
+    return '.'.join(key.split('.')[:3])
+
+
+class LocalTier:
+    """LRU entries and counters of one process, shared by its threads"""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.stats_flushed_at = time.monotonic()
+        self.reported = set()
+
+
+# Django builds a backend instance per thread; they all use the process's tier
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class TwoTierCache(BaseCache):
+    _missing = object()
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._max_entries = options.get('LOCAL_MAX_ENTRIES', 1000)
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 10)
+        self._stats_flush_seconds = options.get('STATS_FLUSH_SECONDS', 60)
+        with _tiers_lock:
+            self._tier = _tiers.setdefault(location or self._shared_alias, LocalTier())
+        self._local = self._tier.entries
+        self._lock = self._tier.lock
+        self._stats = self._tier.stats
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    # Local tier
+
+    def _local_key(self, key, version):
+        return self.make_and_validate_key(key, version=version)
+
+    def _local_get(self, key, version):
+        local_key = self._local_key(key, version)
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is None:
+                return False, None
+            expires_at, pickled, _ = entry
+            if expires_at <= time.monotonic():
+                del self._local[local_key]
+                return False, None
+            self._local.move_to_end(local_key)
+        return True, pickle.loads(pickled)
+
+    def _local_set(self, key, value, timeout, version):
+        timeout = self.get_backend_timeout(timeout)
+        lifetime = self._local_timeout if timeout is None else min(timeout, self._local_timeout)
+        if lifetime <= 0:
+            self._local_delete(key, version)
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        local_key = self._local_key(key, version)
+        evicted = []
+        with self._lock:
+            self._local[local_key] = (time.monotonic() + lifetime, pickled, namespace_of(key))
+            self._local.move_to_end(local_key)
+            while len(self._local) > self._max_entries:
+                evicted.append(self._local.popitem(last=False)[1][2])
+        for namespace in evicted:
+            self._count_namespace(namespace, 'evictions')
+
+    def _local_delete(self, key, version):
+        with self._lock:
+            self._local.pop(self._local_key(key, version), None)
+
+    # Stats
+
+    def _count(self, key, outcome):
+        self._count_namespace(namespace_of(key), outcome)
+
+    def _count_namespace(self, namespace, outcome):
+        with self._lock:
+            self._stats[(namespace, outcome)] += 1
+            due = time.monotonic() - self._tier.stats_flushed_at >= self._stats_flush_seconds
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """Merge this process's counters into the shared tier"""
+        with self._lock:
+            counts = dict(self._stats)
+            self._stats.clear()
+            self._tier.stats_flushed_at = time.monotonic()
+        new = {namespace for namespace, _ in counts} - self._tier.reported
+        if new:
+            self.shared.set(NAMESPACES_KEY, new | self.shared.get(NAMESPACES_KEY, set()), timeout=None)
+            self._tier.reported |= new
+        for (namespace, outcome), count in counts.items():
+            key = STATS_KEY.format(namespace, outcome)
+            self.shared.add(key, 0, timeout=None)
+            try:
+                self.shared.incr(key, count)
+            except ValueError:
+                self.shared.set(key, count, timeout=None)
+
+    def local_stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        found, value = self._local_get(key, version)
+        if found:
+            self._count(key, 'local_hits')
+            return value
+        value = self.shared.get(key, self._missing, version=version)
+        if value is self._missing:
+            self._count(key, 'misses')
+            return default
+        self._count(key, 'shared_hits')
+        self._local_set(key, value, DEFAULT_TIMEOUT, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remote = []
+        for key in keys:
+            hit, value = self._local_get(key, version)
+            if hit:
+                self._count(key, 'local_hits')
+                found[key] = value
+            else:
+                remote.append(key)
+        if remote:
+            values = self.shared.get_many(remote, version=version)
+            for key in remote:
+                if key in values:
+                    self._count(key, 'shared_hits')
+                    self._local_set(key, values[key], DEFAULT_TIMEOUT, version)
+                    found[key] = values[key]
+                else:
+                    self._count(key, 'misses')
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._local_set(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._local_set(key, value, timeout, version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # The shared tier decides, so add() still works as a cross-process lock
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._local_set(key, value, timeout, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local_delete(key, version)
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local_delete(key, version)
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._local_delete(key, version)
+        self.shared.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        found, _ = self._local_get(key, version)
+        return found or self.shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local_delete(key, version)
+        return self.shared.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._local_delete(key, version)
+        return self.shared.decr(key, delta, version=version)
+
+    def incr_version(self, key, delta=1, version=None):
+        self._local_delete(key, version)
+        return self.shared.incr_version(key, delta, version=version)
+
+    def clear(self):
+        self.clear_local()
+        self.shared.clear()
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+
+# Last cull per cache directory, shared by the process's backend instances
+_culled_at = {}
+
+
+class LockingFileBasedCache(FileBasedCache):
+    """
+    FileBasedCache whose ``add`` and ``incr`` hold an fcntl lock (one of
+    ``LOCK_STRIPES`` lock files, picked by key), so every process on the host
+    sees them as atomic; Django's own read and then write the entry. Culling
+    lists every file, so it runs at most every ``CULL_INTERVAL`` seconds per
+    process instead of on each write.
+    """
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        options = params.get('OPTIONS', {})
+        self._lock_stripes = options.get('LOCK_STRIPES', 64)
+        self._cull_interval = options.get('CULL_INTERVAL', 60)
+        self._lock_dir = os.path.join(self._dir, 'locks')
+
+    @contextmanager
+    def _locked(self, fname):
+        os.makedirs(self._lock_dir, mode=0o700, exist_ok=True)
+        stripe = int(os.path.basename(fname)[:8], 16) % self._lock_stripes
+        with open(os.path.join(self._lock_dir, f'{stripe}.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked(self._key_to_file(key, version)):
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        fname = self._key_to_file(key, version)
+        with self._locked(fname):
+            try:
+                with open(fname, 'rb') as f:
+                    expires = pickle.load(f)
+                    value = pickle.loads(zlib.decompress(f.read()))
+            except (FileNotFoundError, EOFError):
+                expires, value = 0, None
+            if expires is not None and expires < time.time():
+                raise ValueError("Key '%s' not found." % key)
+            value += delta
+            # Keep the entry's expiry; Django's incr resets it to the default
+            self.set(key, value, None if expires is None else max(expires - time.time(), 0.001), version)
+        return value
+
+    def _cull(self):
+        now = time.monotonic()
+        if now - _culled_at.get(self._dir, float('-inf')) < self._cull_interval:
+            return
+        _culled_at[self._dir] = now
+        super()._cull()
@@ -0,0 +1,107 @@
+# apps/core/caching.py
+"""
+Namespaced entries on the default (two-tier) cache.
+
+Keys are ``<namespace>:<generation>:<key>``. ``invalidate(namespace)`` moves
+the namespace to a new generation, which orphans every entry written under
+the old one in a single write; the orphans age out through their TTL and the
+local LRU. Views use ``get_or_set``, model signals call ``invalidate``, and
+templates pass ``{% cache_generation "namespace" as generation %}`` (see
+core_filters) as a vary-on argument of Django's ``{% cache %}`` tag.
+"""
+import time
+
+from django.core.cache import cache, caches
+
+from .cache_backends import NAMESPACES_KEY, OUTCOMES, STATS_KEY, TwoTierCache
+
+GENERATION_KEY = 'cache_generation:{}'
+
+
+def _new_generation():
+    # Time-based so a generation lost to eviction never comes back as an old value
+    return int(time.time() * 1000)
+
+
+def shared_tier():
+    """The cache every worker reads directly: the default's shared tier"""
+    backend = caches['default']
+    return backend.shared if isinstance(backend, TwoTierCache) else backend
+
+
+def generation(namespace, store=None):
+    store = cache if store is None else store
+    key = GENERATION_KEY.format(namespace)
+    value = store.get(key)
+    if value is None:
+        store.add(key, _new_generation(), timeout=None)
+        value = store.get(key)
+    return value
+
+
+def generations(namespaces, store=None):
+    """``generation()`` of each namespace, in one round trip once they all exist"""
+    store = cache if store is None else store
+    keys = [GENERATION_KEY.format(namespace) for namespace in namespaces]
+    values = store.get_many(keys)
+    return [
+        values[key] if key in values else generation(namespace, store)
+        for namespace, key in zip(namespaces, keys)
+    ]
+
+
+def make_key(namespace, key):
+    return f'{namespace}:{generation(namespace)}:{key}'
+
+
+def get(namespace, key, default=None):
+    return cache.get(make_key(namespace, key), default)
+
+
+def store(namespace, key, value, timeout=None):
+    cache.set(make_key(namespace, key), value, timeout)
+
+
+def get_or_set(namespace, key, compute, timeout=None):
+    """The cached value of ``key`` in ``namespace``, calling ``compute()`` on a miss"""
+    full_key = make_key(namespace, key)
+    value = cache.get(full_key)
+    if value is None:
+        value = compute()
+        cache.set(full_key, value, timeout)
+    return value
+
+
+def invalidate(namespace, store=None):
+    """Drop every entry of ``namespace`` on every worker (within LOCAL_TIMEOUT)"""
+    store = cache if store is None else store
+    key = GENERATION_KEY.format(namespace)
+    try:
+        store.incr(key)
+    except ValueError:
+        store.set(key, _new_generation(), timeout=None)
+
+
+def known_namespaces():
+    return sorted(shared_tier().get(NAMESPACES_KEY) or ())
+
+
+def stats(namespaces):
+    """Per-namespace hit/miss/eviction counters summed over every worker"""
+    backend = caches['default']
+    if isinstance(backend, TwoTierCache):
+        backend.flush_stats()
+    shared = shared_tier()
+    keys = [STATS_KEY.format(namespace, outcome) for namespace in namespaces for outcome in OUTCOMES]
+    values = shared.get_many(keys)
+    report = {}
+    for namespace in namespaces:
+        counters = {outcome: values.get(STATS_KEY.format(namespace, outcome), 0) for outcome in OUTCOMES}
+        lookups = counters['local_hits'] + counters['shared_hits'] + counters['misses']
+        counters['hit_rate'] = (counters['local_hits'] + counters['shared_hits']) / lookups if lookups else 0.0
+        report[namespace] = counters
+    return report
+
+
+def reset_stats(namespaces):
+    shared_tier().delete_many([STATS_KEY.format(namespace, outcome) for namespace in namespaces for outcome in OUTCOMES])
@@ -0,0 +1,69 @@
+# apps/core/facets.py
+"""
+Faceted counts for the package and guide listings.
+
+Every option of every facet becomes one ``COUNT(*) FILTER (WHERE ...)``
+aggregate, so all counts for the currently filtered queryset come back from
+a single query instead of one COUNT per option. Results come from
+apps.core.query_cache until the tables behind them change.
+"""
+from django.db.models import Count, Q
+
+from . import query_cache
+
+
+def range_q(field, low, high, high_inclusive=True):
+    condition = Q()
+    if low is not None:
+        condition &= Q(**{f'{field}__gte': low})
+    if high is not None:
+        condition &= Q(**{f'{field}__lte' if high_inclusive else f'{field}__lt': high})
+    return condition
+
+
+def facet_counts(queryset, facets):
+    """
+    ``facets`` maps a facet name to a list of ``(value, label, condition)``.
+    Returns the same names mapped to ``[{'value', 'label', 'count'}, ...]``.
+    """
+    aggregates = {}
+    for name, options in facets.items():
+        for position, (value, label, condition) in enumerate(options):
+            aggregates[f'facet_{name}_{position}'] = Count('pk', filter=condition)
+    totals = query_cache.aggregate(queryset.order_by(), **aggregates) if aggregates else {}
+
+    return {
+        name: [
+            {'value': value, 'label': label, 'count': totals[f'facet_{name}_{position}']}
+            for position, (value, label, condition) in enumerate(options)
+        ]
+        for name, options in facets.items()
+    }
+
+
+def package_facets(queryset):
+    from apps.packages.models import Package
+    return facet_counts(queryset, {
+        'package_type': [(value, label, Q(package_type=value)) for value, label in Package.PACKAGE_TYPES],
+        'difficulty': [(value, label, Q(difficulty_level=value)) for value, label in Package.DIFFICULTY_LEVELS],
+        'duration': [
+            (value, label, range_q('duration_days', low, high))
+            for value, label, low, high in Package.DURATION_BUCKETS
+        ],
+        'price': [
+            (value, label, range_q('price_per_person', low, high, high_inclusive=False))
+            for value, label, low, high in Package.PRICE_BUCKETS
+        ],
+    })
+
+
+def guide_facets(queryset):
+    from apps.guides.models import Guide
+    return facet_counts(queryset, {
+        'specialization': [(value, label, Q(specialties__contains=[value])) for value, label in Guide.SPECIALTIES],
+        'language': [(value, label, Q(languages__contains=[value])) for value, label in Guide.LANGUAGES],
+        'experience': [
+            (value, label, range_q('experience_years', low, high))
+            for value, label, low, high in Guide.EXPERIENCE_BANDS
+        ],
+    })
@@ -0,0 +1,68 @@
+# apps/core/fuzzy_search.py
+"""
+Trigram (pg_trgm) search backend shared by the public and tourist listing pages.
+
+Every searched column carries a GIN ``gin_trgm_ops`` index, and matching uses
+the word-similarity operator (``%>``) so Postgres can answer the filter with a
+bitmap index scan instead of a leading-wildcard LIKE over the whole table.
+"""
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Q, Value, FloatField
+from django.db.models.functions import Greatest
+
+# Each field after the first counts a little less towards relevance,
+# mirroring the priority order the old icontains scoring used.
+FIELD_WEIGHT_STEP = 0.1
+
+
+def normalize_search_term(search_term):
+    """Lowercase and collapse whitespace so equivalent queries match the same way"""
+    return ' '.join((search_term or '').lower().split())
+
+
+def _field_match(model, field, term):
+    """
+    Build an index-friendly match for one field.
+
+    Related fields (``agency__name``) are matched through a semi-join on the
+    related table, so the trigram index there is used and the outer OR does
+    not turn into a join over every row.
+    """
+    if '__' not in field:
+        return Q(**{f'{field}__trigram_word_similar': term})
+
+    relation, related_field = field.split('__', 1)
+    related_model = model._meta.get_field(relation).related_model
+    matches = related_model._default_manager.filter(
+        **{f'{related_field}__trigram_word_similar': term}
+    ).values('pk')
+    return Q(**{f'{relation}__in': matches})
+
+
+def trigram_search(queryset, search_term, fields, also_match=None, annotation='relevance_score'):
+    """
+    Filter ``queryset`` to rows whose ``fields`` fuzzily match ``search_term``
+    and annotate a similarity-based relevance score (0-1, higher is better).
+
+    ``also_match`` is an optional extra Q OR-ed into the filter (e.g. an exact
+    lookup on a unique column). The queryset is returned ordered by relevance.
+    """
+    term = normalize_search_term(search_term)
+    if not term or not fields:
+        return queryset
+
+    conditions = Q()
+    for field in fields:
+        conditions |= _field_match(queryset.model, field, term)
+    if also_match is not None:
+        conditions |= also_match
+
+    similarities = []
+    for position, field in enumerate(fields):
+        weight = max(1.0 - position * FIELD_WEIGHT_STEP, FIELD_WEIGHT_STEP)
+        similarities.append(
+            TrigramWordSimilarity(term, field) * Value(weight, output_field=FloatField())
+        )
+    score = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+
+    return queryset.filter(conditions).annotate(**{annotation: score}).order_by(f'-{annotation}')
@@ -0,0 +1,36 @@
+# apps/core/lookups.py
+"""
+Lookups for JSON array columns (Guide.languages, Guide.specialties).
+
+Both work with a ``jsonb_path_ops`` GIN index: ``contains`` (``@>``) for
+"has every value" and ``contains_any`` (``@?`` with a jsonpath OR) for
+"has at least one", so either kind of multi-select is one index lookup.
+"""
+import json
+
+from django.core.exceptions import EmptyResultSet
+from django.db.models import JSONField, Lookup, Q
+
+
+@JSONField.register_lookup
+class JSONContainsAny(Lookup):
+    lookup_name = 'contains_any'
+    prepare_rhs = False
+
+    def as_sql(self, compiler, connection):
+        values = list(self.rhs)
+        if not values:
+            raise EmptyResultSet
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        path = '$[*] ? ({})'.format(' || '.join(f'@ == {json.dumps(value)}' for value in values))
+        return f'{lhs} @? %s::jsonpath', (*lhs_params, path)
+
+
+def array_match(field, values, match_all=True):
+    """Q for a JSON array column holding all (or any) of ``values``"""
+    values = [value for value in values if value]
+    if not values:
+        return Q()
+    if match_all:
+        return Q(**{f'{field}__contains': values})
+    return Q(**{f'{field}__contains_any': values})
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from apps.core.search_index import build_index, snapshot_path
+
+class Command(BaseCommand):
+    help = 'Rebuild the in-process search index from the database and write its snapshot'
+
+    def handle(self, *args, **options):
+        index = build_index()
+        path = snapshot_path()
+        index.dump(path)
+        counts = ', '.join(f'{len(entity.docs)} {name}' for name, entity in index.entities.items())
+        self.stdout.write(self.style.SUCCESS(f'Indexed {counts}; snapshot written to {path}'))
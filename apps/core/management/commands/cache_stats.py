@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from apps.core import caching
+
+class Command(BaseCommand):
+    help = 'Report per-namespace hit/miss/eviction counters of the two-tier cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('namespaces', nargs='*',
+                            help='Namespaces to report (default: every namespace seen)')
+        parser.add_argument('--reset', action='store_true',
+                            help='Zero the counters after reporting them')
+
+    def handle(self, *args, **options):
+        namespaces = options['namespaces'] or caching.known_namespaces()
+        for namespace, counters in caching.stats(namespaces).items():
+            self.stdout.write(
+                f"{namespace}: {counters['local_hits']} local hits, {counters['shared_hits']} shared hits, "
+                f"{counters['misses']} misses, {counters['evictions']} evictions "
+                f"({counters['hit_rate']:.1%} hit rate)"
+            )
+        if options['reset']:
+            caching.reset_stats(namespaces)
+            self.stdout.write(self.style.SUCCESS('Counters reset.'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from apps.core.search_cache import NAMESPACES, get_stats, reset_stats
+
+class Command(BaseCommand):
+    help = 'Report hit/miss counters for the search result cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Zero the counters after reporting them')
+
+    def handle(self, *args, **options):
+        stats = get_stats(NAMESPACES)
+        for namespace, counters in stats.items():
+            self.stdout.write(
+                f"{namespace}: {counters['hits']} hits, {counters['misses']} misses "
+                f"({counters['hit_rate']:.1%} hit rate)"
+            )
+        if options['reset']:
+            reset_stats(NAMESPACES)
+            self.stdout.write(self.style.SUCCESS('Counters reset.'))
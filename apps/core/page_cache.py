@@ -0,0 +1,111 @@
+# apps/core/page_cache.py
+"""
+Full-page cache for anonymous visitors of the public detail and listing pages.
+
+A page is stored per URL (path and query string) under the current
+generations of the cache namespaces it shows (see apps.core.caching), so the
+post-commit signals that already drop search results and home sections make
+the next request render a fresh copy. Entries keep the ETag of the response
+they came from, and conditional GETs get their 304 straight from the entry.
+There is no Last-Modified: the pages show reviews and rating totals that
+change without touching any updated_at, so only the content hash is safe.
+
+The navbar is the hole in the page: base.html marks it, and every cached
+response gets core/navbar.html rendered for the current request. Logged-in
+users, requests with pending messages and responses that set cookies or use
+a CSRF token always go through the view.
+"""
+import hashlib
+import re
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_vary_headers, set_response_etag
+
+from . import caching
+
+NAMESPACE = 'pages'
+NAVBAR = re.compile(rb'<!--navbar-->.*?<!--/navbar-->', re.S)
+STORED_HEADERS = ('Content-Type', 'ETag')
+
+
+def with_meta(response, **meta):
+    """Keep ``meta`` with the cached page; it is passed to the view's ``on_hit`` callback"""
+    response.page_cache_meta = meta
+    return response
+
+
+def _anonymous(request):
+    # Without a session cookie nobody is logged in; don't load the session to find out
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return True
+    return not request.user.is_authenticated
+
+
+def _cacheable_request(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and _anonymous(request)
+        and not len(messages.get_messages(request))
+    )
+
+
+def _cacheable_response(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    )
+
+
+def _page_key(request, namespaces):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return ':'.join([path, *(str(caching.generation(namespace)) for namespace in namespaces)])
+
+
+def _with_navbar(request, content):
+    navbar = f"<!--navbar-->{render_to_string('core/navbar.html', request=request)}<!--/navbar-->"
+    return NAVBAR.sub(lambda match: navbar.encode(), content, count=1)
+
+
+def _conditional(request, response):
+    patch_vary_headers(response, ('Cookie',))
+    return get_conditional_response(request, etag=response.get('ETag'), response=response)
+
+
+def cache_public_page(*namespaces, on_hit=None):
+    """
+    Serve anonymous GETs of a view from the page cache. ``namespaces`` are the
+    cache namespaces whose invalidation changes the page; ``on_hit(request,
+    meta)`` runs for every response served from the cache, with the meta the
+    view passed to ``with_meta``.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable_request(request):
+                return view(request, *args, **kwargs)
+            key = _page_key(request, namespaces)
+            entry = caching.get(NAMESPACE, key)
+            if entry is None:
+                response = view(request, *args, **kwargs)
+                if request.method == 'GET' and _cacheable_response(request, response):
+                    set_response_etag(response)
+                    caching.store(NAMESPACE, key, {
+                        'content': response.content,
+                        'headers': {name: response[name] for name in STORED_HEADERS if response.has_header(name)},
+                        'meta': getattr(response, 'page_cache_meta', {}),
+                    }, settings.PAGE_CACHE_TIMEOUT)
+                return _conditional(request, response)
+            if on_hit is not None:
+                on_hit(request, entry['meta'])
+            response = HttpResponse(_with_navbar(request, entry['content']))
+            for name, value in entry['headers'].items():
+                response[name] = value
+            return _conditional(request, response)
+        return wrapper
+    return decorator
@@ -0,0 +1,220 @@
+# apps/core/pagination.py
+"""
+Keyset (cursor) pagination for the public listings.
+
+Instead of ``OFFSET n`` and a ``COUNT(*)`` per page, each page remembers the
+sort-key values of its first and last rows and the next page asks for rows
+strictly after them, so page 500 costs the same index range scan as page 1.
+The queryset's own ``order_by`` is used as the key, with ``pk`` appended as
+the tie-breaker; NULLs always sort last so nullable keys stay comparable.
+
+Cursors are signed, so the tokens in the URL are opaque to clients.
+"""
+import datetime
+from decimal import Decimal
+
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Q
+from django.db.models.constants import LOOKUP_SEP
+from django.utils.functional import cached_property
+
+CURSOR_SALT = 'apps.core.pagination'
+
+
+def _encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return ['dt', value.isoformat()]
+    if isinstance(value, datetime.date):
+        return ['d', value.isoformat()]
+    if isinstance(value, Decimal):
+        return ['dec', str(value)]
+    return ['v', value]
+
+
+def _decode_value(tagged):
+    kind, value = tagged
+    if kind == 'dt':
+        return datetime.datetime.fromisoformat(value)
+    if kind == 'd':
+        return datetime.date.fromisoformat(value)
+    if kind == 'dec':
+        return Decimal(value)
+    return value
+
+
+def encode_cursor(values, direction):
+    return signing.dumps({'v': [_encode_value(value) for value in values], 'd': direction},
+                         salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token):
+    """Return ``(values, direction)``, or ``(None, 'next')`` for a missing or tampered token"""
+    if not token:
+        return None, 'next'
+    try:
+        payload = signing.loads(token, salt=CURSOR_SALT)
+        return [_decode_value(value) for value in payload['v']], payload['d']
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None, 'next'
+
+
+class KeysetPage:
+    def __init__(self, object_list, paginator, has_next, has_previous, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def state(self):
+        """Everything but the objects, for caching a page as its IDs"""
+        return {
+            'ids': [obj.pk for obj in self.object_list],
+            'has_next': self._has_next,
+            'has_previous': self._has_previous,
+            'next_cursor': self.next_cursor,
+            'previous_cursor': self.previous_cursor,
+        }
+
+    @classmethod
+    def restore(cls, state, object_list, paginator):
+        return cls(object_list, paginator, state['has_next'], state['has_previous'],
+                   state['next_cursor'], state['previous_cursor'])
+
+
+class KeysetPaginator:
+    """
+    Paginate an ordered queryset by its sort keys. ``count=True`` adds the
+    total (one extra COUNT query, only run if a template reads it).
+    """
+
+    def __init__(self, queryset, per_page, count=False):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.show_count = count
+        self.keys = self._sort_keys(queryset)
+
+    def _sort_keys(self, queryset):
+        keys = []
+        for item in queryset.query.order_by or queryset.model._meta.ordering:
+            if not isinstance(item, str) or item == '?':
+                raise ValueError('Keyset pagination needs plain field or annotation orderings')
+            descending = item.startswith('-')
+            name = item.lstrip('-')
+            if name == 'pk' or name == queryset.model._meta.pk.name:
+                keys.append(('pk', descending, False))
+                return keys
+            keys.append((name, descending, self._nullable(queryset, name)))
+        keys.append(('pk', keys[0][1] if keys else False, False))
+        return keys
+
+    def _nullable(self, queryset, name):
+        if name in queryset.query.annotations:
+            # Scores and counts are never NULL
+            return False
+        model = queryset.model
+        field = None
+        for part in name.split(LOOKUP_SEP):
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                return True
+            model = field.related_model or model
+        return field is None or field.null
+
+    @cached_property
+    def count(self):
+        return self.queryset.order_by().count() if self.show_count else None
+
+    def _ordered(self, reverse):
+        ordering = []
+        for name, descending, nullable in self.keys:
+            # NULLs last in the page order (a backwards walk flips that too);
+            # NOT NULL keys keep the plain ordering so btree indexes match it
+            nulls = {}
+            if nullable:
+                nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+            if descending != reverse:
+                ordering.append(F(name).desc(**nulls))
+            else:
+                ordering.append(F(name).asc(**nulls))
+        annotations = {f'keyset_{position}': F(name) for position, (name, _, _) in enumerate(self.keys)}
+        return self.queryset.annotate(**annotations).order_by(*ordering)
+
+    def _beyond(self, values, reverse):
+        """Rows strictly after ``values`` in page order (before them when ``reverse``)"""
+        condition = Q()
+        equal = Q()
+        for (name, descending, nullable), value in zip(self.keys, values):
+            forward = descending == reverse  # True: later rows have larger values
+            if value is None:
+                # Only NULLs come after a NULL (NULLs sort last)
+                step = Q(pk__in=[]) if not reverse else Q(**{f'{name}__isnull': False})
+                same = Q(**{f'{name}__isnull': True})
+            else:
+                step = Q(**{f'{name}__gt' if forward else f'{name}__lt': value})
+                if nullable and not reverse:
+                    step |= Q(**{f'{name}__isnull': True})
+                same = Q(**{name: value})
+            condition |= equal & step
+            equal &= same
+
+        # Redundant bound on the leading key, which Postgres can use as an
+        # index condition to start the scan at the cursor instead of filtering
+        name, descending, nullable = self.keys[0]
+        if values[0] is not None and not nullable:
+            forward = descending == reverse
+            condition &= Q(**{f'{name}__gte' if forward else f'{name}__lte': values[0]})
+        return condition
+
+    def get_page(self, cursor=None):
+        values, direction = decode_cursor(cursor)
+        if values is not None and len(values) != len(self.keys):
+            # Token from a different sort order
+            values, direction = None, 'next'
+        reverse = direction == 'prev'
+
+        queryset = self._ordered(reverse)
+        if values is not None:
+            queryset = queryset.filter(self._beyond(values, reverse))
+        rows = list(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            has_next, has_previous = True, more
+        else:
+            has_next, has_previous = more, values is not None
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_next:
+                next_cursor = encode_cursor(self._values(rows[-1]), 'next')
+            if has_previous:
+                previous_cursor = encode_cursor(self._values(rows[0]), 'prev')
+        return KeysetPage(rows, self, has_next, has_previous, next_cursor, previous_cursor)
+
+    def _values(self, obj):
+        return [getattr(obj, f'keyset_{position}') for position in range(len(self.keys))]
@@ -0,0 +1,207 @@
+# apps/core/query_cache.py
+"""
+Opt-in result cache for hot, user-independent ORM reads.
+
+``fetch(queryset)``, ``count(queryset)`` and ``aggregate(queryset, **kwargs)``
+key their result on the query's compiled SQL and parameters, plus the current
+version of every table that SQL reads. The tables are the quoted identifiers
+that name an installed model's table, so joins and subqueries count too. Only
+the tables of TRACKED_MODELS are versioned; a query that reads any other
+model's table always goes to the database.
+
+Every database connection gets an execute wrapper (installed from
+CoreConfig.ready) that bumps a tracked table's version once an INSERT, UPDATE
+or DELETE against it commits, once per table per transaction. Saves, deletes,
+bulk_create and ``queryset.update()`` from admin actions all invalidate the
+same way. UPDATEs that only set UNTRACKED_COLUMNS don't bump.
+
+Each process keeps the versions it read for QUERY_CACHE_VERSION_TTL seconds
+and then re-reads them from the shared tier in one round trip. A process
+sees its own bumps at once; another worker can serve a result for up to
+QUERY_CACHE_VERSION_TTL seconds after a write to one of its tables commits.
+
+Reads inside a transaction, and querysets with prefetch_related or
+select_for_update, always go to the database.
+"""
+import functools
+import hashlib
+import re
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import transaction
+
+from . import caching
+
+NAMESPACE = 'queries'
+TABLE_NAMESPACE = 'table:{}'
+
+# Models whose tables cached reads may depend on
+TRACKED_MODELS = (
+    'accounts.User',
+    'accounts.Agency',
+    'accounts.VerificationRequest',
+    'bookings.Booking',
+    'guides.Guide',
+    'packages.Package',
+)
+# Columns no cached read uses; logins and the package view counter (with its
+# trending scores) rewrite them all the time
+UNTRACKED_COLUMNS = {
+    'accounts.User': ('last_login',),
+    'packages.Package': ('views_count', 'trending_score'),
+}
+
+QUOTED_NAME = re.compile(r'"([^"]+)"')
+WRITE = re.compile(r'\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+"?([^\s"(]+)', re.IGNORECASE)
+ASSIGNED_COLUMN = re.compile(r'(?:\bSET|,)\s*"([^"]+)"\s*=', re.IGNORECASE)
+
+_missing = object()
+
+# table -> (version, monotonic time it was read) for this process
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def model_tables():
+    return frozenset(model._meta.db_table for model in apps.get_models(include_auto_created=True))
+
+
+@functools.lru_cache(maxsize=None)
+def tracked_tables():
+    return frozenset(apps.get_model(label)._meta.db_table for label in TRACKED_MODELS)
+
+
+@functools.lru_cache(maxsize=None)
+def untracked_columns():
+    columns = {}
+    for label, names in UNTRACKED_COLUMNS.items():
+        opts = apps.get_model(label)._meta
+        columns[opts.db_table] = frozenset(opts.get_field(name).column for name in names)
+    return columns
+
+
+@functools.lru_cache(maxsize=4096)
+def tables_read(sql):
+    """The model tables a SELECT reads, in a stable order"""
+    return tuple(sorted(set(QUOTED_NAME.findall(sql)) & model_tables()))
+
+
+def table_versions(tables):
+    """Versions of ``tables``, re-read from the shared tier once they are QUERY_CACHE_VERSION_TTL old"""
+    now = time.monotonic()
+    with _versions_lock:
+        known = {table: _versions.get(table) for table in tables}
+    stale = [
+        table for table, entry in known.items()
+        if entry is None or now - entry[1] >= settings.QUERY_CACHE_VERSION_TTL
+    ]
+    if stale:
+        fresh = caching.generations([TABLE_NAMESPACE.format(table) for table in stale], caching.shared_tier())
+        with _versions_lock:
+            for table, version in zip(stale, fresh):
+                known[table] = _versions[table] = (version, now)
+    return [known[table][0] for table in tables]
+
+
+def bump_table(table):
+    caching.invalidate(TABLE_NAMESPACE.format(table), caching.shared_tier())
+    with _versions_lock:
+        # Re-read on this process's next lookup
+        _versions.pop(table, None)
+
+
+def _cached(kind, keyed, run, timeout):
+    """``run()``'s result, cached under the compiled SQL of ``keyed``"""
+    if (
+        keyed._prefetch_related_lookups
+        or keyed.query.select_for_update
+        or transaction.get_connection(keyed.db).in_atomic_block
+    ):
+        return run()
+    try:
+        sql, params = keyed.query.get_compiler(keyed.db).as_sql()
+    except EmptyResultSet:
+        return run()
+    tables = tables_read(sql)
+    if not tracked_tables().issuperset(tables):
+        return run()
+    digest = hashlib.md5(repr((kind, keyed.db, sql, params)).encode()).hexdigest()
+    key = ':'.join([digest, *map(str, table_versions(tables))])
+    result = caching.get(NAMESPACE, key, _missing)
+    if result is _missing:
+        result = run()
+        caching.store(NAMESPACE, key, result, settings.QUERY_CACHE_TIMEOUT if timeout is None else timeout)
+    return result
+
+
+def fetch(queryset, timeout=None):
+    """``list(queryset)``, from the cache while the tables it reads are unchanged"""
+    return _cached('rows', queryset, lambda: list(queryset), timeout)
+
+
+def count(queryset, timeout=None):
+    return _cached('count', queryset, queryset.count, timeout)
+
+
+def aggregate(queryset, timeout=None, **aggregates):
+    # Keyed on the query with the aggregates annotated, so tables they join count
+    keyed = queryset.annotate(**{f'query_cache_{name}': value for name, value in aggregates.items()})
+    return _cached('aggregate', keyed, lambda: queryset.aggregate(**aggregates), timeout)
+
+
+# Invalidation
+
+class PendingBumps:
+    """on_commit callback bumping every tracked table a transaction wrote to"""
+
+    def __init__(self):
+        self.tables = set()
+
+    def __call__(self):
+        for table in sorted(self.tables):
+            bump_table(table)
+
+
+def written_table(sql):
+    """The tracked table a write statement changes, or None"""
+    match = WRITE.match(sql) if isinstance(sql, str) else None
+    if not match or match.group(1) not in tracked_tables():
+        return None
+    table = match.group(1)
+    untracked = untracked_columns().get(table)
+    if untracked and sql.lstrip()[:6].upper() == 'UPDATE':
+        assigned = set(ASSIGNED_COLUMN.findall(sql.split(' WHERE ', 1)[0]))
+        if assigned and assigned <= untracked:
+            return None
+    return table
+
+
+def bump_written_tables(execute, sql, params, many, context):
+    """Execute wrapper: bump the version of the table a write statement targets once it commits"""
+    result = execute(sql, params, many, context)
+    table = written_table(sql)
+    if table is None:
+        return result
+    connection = context['connection']
+    if not connection.in_atomic_block:
+        # Autocommit has already committed it; manual transactions have no commit hook
+        bump_table(table)
+        return result
+    # Rollbacks drop the callback along with the tables it collected
+    pending = next((func for _, func, _ in connection.run_on_commit if isinstance(func, PendingBumps)), None)
+    if pending is None:
+        pending = PendingBumps()
+        connection.on_commit(pending, robust=True)
+    pending.tables.add(table)
+    return result
+
+
+def install(sender=None, connection=None, **kwargs):
+    """connection_created receiver; wrappers outlive reconnects, so add it once"""
+    if bump_written_tables not in connection.execute_wrappers:
+        connection.execute_wrappers.append(bump_written_tables)
@@ -0,0 +1,147 @@
+# apps/core/search_cache.py
+"""
+Result cache for the search and listing views.
+
+Entries hold only ordered primary-key lists (plus a total where the view
+paginates), keyed on the normalized query and filters. Each key also embeds
+the current version of every entity type the result depends on; saving or
+deleting a Package, Guide or Agency bumps that type's version (see
+apps.core.signals), which orphans the stale entries instead of deleting them.
+
+Hit/miss counters are kept in process and merged into the cache every
+STATS_FLUSH_SECONDS, so a search never waits on a shared counter.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+ENTITY_TYPES = ('packages', 'guides', 'agencies')
+
+VERSION_KEY = 'search:version:{}'
+STATS_KEY = 'search:stats:{}:{}'
+STATS_FLUSH_SECONDS = 60
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+_stats_flushed_at = time.monotonic()
+
+
+def normalize_query(query):
+    return ' '.join((query or '').lower().split())
+
+
+def _new_version():
+    # Time-based so a version lost to eviction never comes back as an old value
+    return int(time.time() * 1000)
+
+
+def get_versions(entities):
+    keys = [VERSION_KEY.format(entity) for entity in entities]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(entity):
+    key = VERSION_KEY.format(entity)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), timeout=None)
+
+
+def make_key(namespace, depends_on, query, filters):
+    payload = json.dumps({
+        'q': normalize_query(query),
+        'f': filters,
+        'v': get_versions(depends_on),
+    }, sort_keys=True, default=str)
+    return f'search:{namespace}:{hashlib.sha1(payload.encode()).hexdigest()}'
+
+
+def _record(namespace, outcome):
+    with _stats_lock:
+        _stats[(namespace, outcome)] += 1
+        due = time.monotonic() - _stats_flushed_at >= STATS_FLUSH_SECONDS
+    if due:
+        flush_stats()
+
+
+def flush_stats():
+    """Merge this process's hit/miss counts into the shared counters"""
+    global _stats_flushed_at
+    with _stats_lock:
+        counts = dict(_stats)
+        _stats.clear()
+        _stats_flushed_at = time.monotonic()
+    for (namespace, outcome), count in counts.items():
+        key = STATS_KEY.format(namespace, outcome)
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, count)
+        except ValueError:
+            pass
+
+
+def get_or_compute(namespace, depends_on, query, filters, compute):
+    """
+    Return the cached value for this query/filter combination, calling
+    ``compute()`` (which must return something small: an ID list, or a dict
+    of IDs and a count) on a miss.
+    """
+    key = make_key(namespace, depends_on, query, filters)
+    value = cache.get(key)
+    if value is not None:
+        _record(namespace, 'hits')
+        return value
+    _record(namespace, 'misses')
+    value = compute()
+    cache.set(key, value, settings.SEARCH_CACHE_TIMEOUT)
+    return value
+
+
+def hydrate(queryset, ids):
+    """Load ``ids`` with one in_bulk query and return the objects in order"""
+    objects = queryset.in_bulk(ids)
+    return [objects[pk] for pk in ids if pk in objects]
+
+
+def get_stats(namespaces):
+    flush_stats()
+    keys = [STATS_KEY.format(namespace, outcome) for namespace in namespaces for outcome in ('hits', 'misses')]
+    values = cache.get_many(keys)
+    stats = {}
+    for namespace in namespaces:
+        hits = values.get(STATS_KEY.format(namespace, 'hits'), 0)
+        misses = values.get(STATS_KEY.format(namespace, 'misses'), 0)
+        lookups = hits + misses
+        stats[namespace] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+        }
+    return stats
+
+
+def reset_stats(namespaces):
+    cache.delete_many([
+        STATS_KEY.format(namespace, outcome) for namespace in namespaces for outcome in ('hits', 'misses')
+    ])
+
+
+# Namespaces used by the views, so stats can be reported without scanning the cache
+NAMESPACES = (
+    'core.search.packages',
+    'core.search.guides',
+    'core.search.agencies',
+    'packages.package_list',
+    'accounts.tourist_packages',
+)
@@ -0,0 +1,557 @@
+# apps/core/search_index.py
+"""
+In-process inverted index used by core.views.search.
+
+Packages, guides and agencies are tokenized once into per-field postings and
+scored with BM25, weighted by the same per-field token/phrase weights the old
+substring scorer used. The index is loaded from a disk snapshot (or built from
+the database) on first use, kept current by the model signals in
+apps.core.signals, and only the final result IDs are hydrated from the DB.
+
+Other workers' writes are picked up by ``catch_up`` from ``updated_at``,
+looking back SEARCH_INDEX_CATCH_UP_MARGIN_SECONDS further than the last run
+so rows committed late still show up. View counts and rating totals change
+with F() updates that leave ``updated_at`` alone; writers of those call
+``boosts_changed`` and catch-up reloads the boost columns of that entity type.
+"""
+import atexit
+import logging
+import math
+import os
+import pickle
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from . import caching
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+# BM25 tuning; the usual defaults work well for short catalogue text
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Prefix matches ("trek" -> "trekking") count for less than exact terms
+PREFIX_MATCH_FACTOR = 0.5
+
+TOKEN_RE = re.compile(r'\w+')
+
+# (phrase weight, token weight) per indexed field, as used by the old scorer.
+# Fields with zero weights only make a document matchable.
+ENTITY_FIELDS = {
+    'packages': {
+        'title': (10, 3),
+        'description': (6, 2),
+        'best_season': (3, 1),
+        'agency_name': (4, 2),
+        'package_type': (0, 1),
+    },
+    'guides': {
+        'name': (8, 3),
+        'bio': (5, 2),
+        'places_covered': (4, 2),
+        'agency_name': (3, 1),
+        'certifications': (0, 1),
+    },
+    'agencies': {
+        'name': (7, 3),
+        'description': (4, 2),
+        'address': (0, 1),
+    },
+}
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def package_boost(meta):
+    boost = 5 if meta['featured'] else 0
+    return boost + min(max(meta['views_count'] // 50, 0), 20)
+
+
+def guide_boost(meta):
+    return int(meta['rating'] * 2) + min(max(meta['total_ratings'] // 10, 0), 15)
+
+
+def agency_boost(meta):
+    return (int(meta['rating']) * 2
+            + min(max(meta['total_ratings'] // 10, 0), 15)
+            + min(meta['package_count'], 10))
+
+
+METADATA_BOOSTS = {
+    'packages': package_boost,
+    'guides': guide_boost,
+    'agencies': agency_boost,
+}
+
+# Metadata the boosts read that is written without touching updated_at
+BOOST_COLUMNS = {
+    'packages': ('views_count',),
+    'guides': ('rating', 'total_ratings'),
+    'agencies': ('rating', 'total_ratings'),
+}
+BOOSTS_NAMESPACE = 'search_boosts:{}'
+
+
+class EntityIndex:
+    """Postings and per-document field positions for one entity type"""
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.docs = {}                      # doc_id -> {field: {term: [positions]}}
+        self.lengths = {}                   # doc_id -> {field: token count}
+        self.meta = {}                      # doc_id -> metadata used for filters/boosts
+        self.postings = defaultdict(set)    # term -> doc_ids
+        self.total_lengths = defaultdict(int)
+        self._vocabulary = None             # sorted terms, rebuilt lazily for prefix lookups
+
+    def add(self, doc_id, texts, meta):
+        self.remove(doc_id)
+        field_terms = {}
+        field_lengths = {}
+        for field in self.fields:
+            positions = defaultdict(list)
+            tokens = tokenize(texts.get(field))
+            for position, token in enumerate(tokens):
+                positions[token].append(position)
+                self.postings[token].add(doc_id)
+            field_terms[field] = dict(positions)
+            field_lengths[field] = len(tokens)
+            self.total_lengths[field] += len(tokens)
+        self.docs[doc_id] = field_terms
+        self.lengths[doc_id] = field_lengths
+        self.meta[doc_id] = meta
+        self._vocabulary = None
+
+    def remove(self, doc_id):
+        field_terms = self.docs.pop(doc_id, None)
+        if field_terms is None:
+            return
+        for field, terms in field_terms.items():
+            for term in terms:
+                doc_ids = self.postings.get(term)
+                if doc_ids is not None:
+                    doc_ids.discard(doc_id)
+                    if not doc_ids:
+                        del self.postings[term]
+            self.total_lengths[field] -= self.lengths[doc_id][field]
+        del self.lengths[doc_id]
+        del self.meta[doc_id]
+        self._vocabulary = None
+
+    def expand(self, token):
+        """Return [(term, factor)] for a query token: the exact term plus prefix matches"""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+        expansions = []
+        i = bisect_left(vocabulary, token)
+        while i < len(vocabulary) and vocabulary[i].startswith(token):
+            term = vocabulary[i]
+            expansions.append((term, 1.0 if term == token else PREFIX_MATCH_FACTOR))
+            i += 1
+        return expansions
+
+    def idf(self, term):
+        n = len(self.docs)
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def has_phrase(self, doc_id, field, tokens):
+        terms = self.docs[doc_id][field]
+        starts = terms.get(tokens[0])
+        if not starts:
+            return False
+        for start in starts:
+            if all(start + offset in terms.get(token, ()) for offset, token in enumerate(tokens[1:], 1)):
+                return True
+        return False
+
+    def score(self, doc_id, expanded, tokens):
+        score = 0.0
+        n_docs = len(self.docs) or 1
+        for field, (phrase_weight, token_weight) in self.fields.items():
+            terms = self.docs[doc_id][field]
+            length = self.lengths[doc_id][field]
+            avg_length = (self.total_lengths[field] / n_docs) or 1
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+            for term, factor, idf in expanded:
+                tf = len(terms.get(term, ()))
+                if tf:
+                    score += token_weight * factor * idf * tf * (BM25_K1 + 1) / (tf + norm)
+            if phrase_weight and self.has_phrase(doc_id, field, tokens):
+                score += phrase_weight
+        return score
+
+
+class SearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.entities = {name: EntityIndex(fields) for name, fields in ENTITY_FIELDS.items()}
+        self.built_at = None
+        # entity -> boosts_changed generation the metadata is current with
+        self.boost_generations = {}
+        self.dirty = False
+
+    def add(self, entity, doc_id, texts, meta):
+        with self._lock:
+            self.entities[entity].add(doc_id, texts, meta)
+            self.dirty = True
+
+    def remove(self, entity, doc_id):
+        with self._lock:
+            self.entities[entity].remove(doc_id)
+            self.dirty = True
+
+    def update_meta(self, entity, doc_id, **values):
+        with self._lock:
+            meta = self.entities[entity].meta.get(doc_id)
+            if meta is not None:
+                meta.update(values)
+                self.dirty = True
+
+    def search(self, entity, query, limit=30, where=None, min_values=None, max_values=None):
+        """
+        Return up to ``limit`` document IDs ranked by BM25 text score plus the
+        entity's metadata boosts. ``where`` holds metadata equality filters and
+        ``min_values``/``max_values`` inclusive numeric bounds. Every query
+        token must match (exactly or as a prefix) in at least one field.
+        """
+        where = where or {}
+        min_values = min_values or {}
+        max_values = max_values or {}
+        tokens = tokenize(query)
+        boost = METADATA_BOOSTS[entity]
+
+        with self._lock:
+            index = self.entities[entity]
+            expanded = []
+            candidates = None
+            for token in dict.fromkeys(tokens):
+                expansions = index.expand(token)
+                matches = set()
+                for term, factor in expansions:
+                    matches |= index.postings[term]
+                    expanded.append((term, factor, index.idf(term)))
+                candidates = matches if candidates is None else candidates & matches
+                if not candidates:
+                    return []
+            if candidates is None:
+                candidates = index.docs.keys()
+
+            ranked = []
+            for doc_id in candidates:
+                meta = index.meta[doc_id]
+                if any(meta.get(key) != value for key, value in where.items()):
+                    continue
+                if any(meta.get(key) is None or meta[key] < value for key, value in min_values.items()):
+                    continue
+                if any(meta.get(key) is None or meta[key] > value for key, value in max_values.items()):
+                    continue
+                score = boost(meta)
+                if tokens:
+                    score += index.score(doc_id, expanded, tokens)
+                ranked.append((score, meta.get('created', 0), doc_id))
+
+        ranked.sort(reverse=True)
+        return [doc_id for _, _, doc_id in ranked[:limit]]
+
+    # Snapshots -----------------------------------------------------------
+
+    def dump(self, path):
+        with self._lock:
+            payload = {
+                'version': SNAPSHOT_VERSION,
+                'built_at': self.built_at,
+                'boost_generations': self.boost_generations,
+                'entities': {
+                    name: {
+                        'docs': index.docs,
+                        'lengths': index.lengths,
+                        'meta': index.meta,
+                        'postings': dict(index.postings),
+                        'total_lengths': dict(index.total_lengths),
+                    }
+                    for name, index in self.entities.items()
+                },
+            }
+            data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+            self.dirty = False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as fh:
+            fh.write(data)
+        # Atomic swap so other workers never read a half-written snapshot
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as fh:
+            payload = pickle.load(fh)
+        if payload.get('version') != SNAPSHOT_VERSION:
+            raise ValueError('Search index snapshot has an incompatible version')
+        index = cls()
+        index.built_at = payload['built_at']
+        index.boost_generations = payload.get('boost_generations', {})
+        for name, data in payload['entities'].items():
+            entity = index.entities[name]
+            entity.docs = data['docs']
+            entity.lengths = data['lengths']
+            entity.meta = data['meta']
+            entity.postings = defaultdict(set, data['postings'])
+            entity.total_lengths = defaultdict(int, data['total_lengths'])
+        return index
+
+
+# Documents -----------------------------------------------------------------
+
+def package_document(package):
+    texts = {
+        'title': package.title,
+        'description': package.description,
+        'best_season': package.best_season,
+        'agency_name': package.agency.name,
+        'package_type': package.package_type,
+    }
+    meta = {
+        'agency_id': package.agency_id,
+        'is_active': package.is_active,
+        'agency_verified': package.agency.is_verified,
+        'package_type': package.package_type,
+        'price': float(package.price_per_person),
+        'featured': package.featured,
+        'views_count': package.views_count,
+        'created': package.created_at.timestamp() if package.created_at else 0,
+    }
+    return texts, meta
+
+
+def guide_document(guide):
+    texts = {
+        'name': guide.name,
+        'bio': guide.bio,
+        'places_covered': guide.places_covered,
+        'agency_name': guide.agency.name,
+        'certifications': guide.certifications,
+    }
+    meta = {
+        'is_available': guide.is_available,
+        'agency_verified': guide.agency.is_verified,
+        'rating': float(guide.rating or 0),
+        'total_ratings': guide.total_ratings,
+        'created': guide.created_at.timestamp() if guide.created_at else 0,
+    }
+    return texts, meta
+
+
+def agency_document(agency, package_count):
+    texts = {
+        'name': agency.name,
+        'description': agency.description,
+        'address': agency.address,
+    }
+    meta = {
+        'is_verified': agency.is_verified,
+        'rating': float(agency.rating or 0),
+        'total_ratings': agency.total_ratings,
+        'package_count': package_count,
+        'created': agency.created_at.timestamp() if agency.created_at else 0,
+    }
+    return texts, meta
+
+
+# Process-wide index ----------------------------------------------------------
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def snapshot_path():
+    return str(settings.SEARCH_INDEX_SNAPSHOT)
+
+
+def build_index():
+    """Build a fresh index from the database"""
+    from apps.packages.models import Package
+    from apps.guides.models import Guide
+    from apps.accounts.models import Agency
+
+    index = SearchIndex()
+    index.built_at = time.time()
+    index.boost_generations = boost_generations()
+    for package in Package.objects.select_related('agency').iterator(chunk_size=500):
+        index.add('packages', package.pk, *package_document(package))
+    for guide in Guide.objects.select_related('agency').iterator(chunk_size=500):
+        index.add('guides', guide.pk, *guide_document(guide))
+    for agency in Agency.objects.annotate(package_count=Count('packages')).iterator(chunk_size=500):
+        index.add('agencies', agency.pk, *agency_document(agency, agency.package_count))
+    return index
+
+
+def boosts_changed(entity):
+    """Tell every worker to reload the boost columns of ``entity`` on its next catch-up"""
+    caching.invalidate(BOOSTS_NAMESPACE.format(entity))
+
+
+def boost_generations():
+    return dict(zip(ENTITY_FIELDS, caching.generations([BOOSTS_NAMESPACE.format(entity) for entity in ENTITY_FIELDS])))
+
+
+def refresh_boosts(index, generations):
+    """Reload the boost columns of entity types whose generation moved"""
+    from apps.packages.models import Package
+    from apps.guides.models import Guide
+    from apps.accounts.models import Agency
+
+    models = {'packages': Package, 'guides': Guide, 'agencies': Agency}
+    for entity, generation in generations.items():
+        if index.boost_generations.get(entity) == generation:
+            continue
+        columns = BOOST_COLUMNS[entity]
+        for pk, *values in models[entity].objects.values_list('pk', *columns).iterator(chunk_size=2000):
+            meta = dict(zip(columns, values))
+            if 'rating' in meta:
+                meta['rating'] = float(meta['rating'] or 0)
+            index.update_meta(entity, pk, **meta)
+        index.boost_generations[entity] = generation
+
+
+def catch_up(index):
+    """Apply changes made since the index was built or last caught up (by other workers or while down)"""
+    from datetime import datetime, timezone as dt_timezone
+    from apps.packages.models import Package
+    from apps.guides.models import Guide
+    from apps.accounts.models import Agency
+
+    # Rows saved before the last run but committed after it have an older
+    # updated_at; re-applying rows already indexed is harmless
+    since = datetime.fromtimestamp(
+        index.built_at - settings.SEARCH_INDEX_CATCH_UP_MARGIN_SECONDS, tz=dt_timezone.utc,
+    )
+    index.built_at = time.time()
+    # Read before the rows, so a bump during the catch-up is seen next time
+    generations = boost_generations()
+
+    changed_agencies = set(Agency.objects.filter(updated_at__gte=since).values_list('pk', flat=True))
+    touched_agencies = set(changed_agencies)
+
+    for entity, model in (('packages', Package), ('guides', Guide), ('agencies', Agency)):
+        live_ids = set(model.objects.values_list('pk', flat=True))
+        entity_index = index.entities[entity]
+        for doc_id in set(entity_index.docs) - live_ids:
+            if entity == 'packages':
+                touched_agencies.add(entity_index.meta[doc_id]['agency_id'])
+            index.remove(entity, doc_id)
+
+    packages = Package.objects.select_related('agency').filter(
+        Q(updated_at__gte=since) | Q(agency__in=changed_agencies)
+    )
+    for package in packages:
+        index.add('packages', package.pk, *package_document(package))
+        touched_agencies.add(package.agency_id)
+    guides = Guide.objects.select_related('agency').filter(
+        Q(updated_at__gte=since) | Q(agency__in=changed_agencies)
+    )
+    for guide in guides:
+        index.add('guides', guide.pk, *guide_document(guide))
+    # Package counts only move for agencies whose packages changed
+    for agency in Agency.objects.filter(pk__in=touched_agencies).annotate(package_count=Count('packages')):
+        index.add('agencies', agency.pk, *agency_document(agency, agency.package_count))
+    refresh_boosts(index, generations)
+
+
+def get_search_index():
+    """
+    Return the process-wide index, warming it from the snapshot or the DB on
+    first use. Signals keep it current for writes made in this process; writes
+    from other workers are picked up by a periodic catch-up.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = _load_or_build()
+    elif time.time() - _index.built_at > settings.SEARCH_INDEX_REFRESH_SECONDS:
+        # Only one thread catches up; the others keep serving the current index
+        if _index_lock.acquire(blocking=False):
+            try:
+                catch_up(_index)
+            finally:
+                _index_lock.release()
+    return _index
+
+
+def _load_or_build():
+    path = snapshot_path()
+    index = None
+    if os.path.exists(path):
+        try:
+            index = SearchIndex.load(path)
+            catch_up(index)
+        except Exception:
+            logger.exception('Could not load search index snapshot, rebuilding')
+            index = None
+    if index is None:
+        index = build_index()
+    try:
+        index.dump(path)
+    except OSError:
+        logger.warning('Could not write search index snapshot to %s', path)
+    return index
+
+
+def index_loaded():
+    return _index is not None
+
+
+def reindex_package(pk):
+    from apps.packages.models import Package
+    package = Package.objects.select_related('agency').filter(pk=pk).first()
+    if package is None:
+        _index.remove('packages', pk)
+    else:
+        _index.add('packages', pk, *package_document(package))
+
+
+def reindex_guide(pk):
+    from apps.guides.models import Guide
+    guide = Guide.objects.select_related('agency').filter(pk=pk).first()
+    if guide is None:
+        _index.remove('guides', pk)
+    else:
+        _index.add('guides', pk, *guide_document(guide))
+
+
+def reindex_agency(pk, cascade=False):
+    """Refresh an agency document; ``cascade`` also refreshes its packages and guides"""
+    from apps.packages.models import Package
+    from apps.guides.models import Guide
+    from apps.accounts.models import Agency
+    agency = Agency.objects.filter(pk=pk).annotate(package_count=Count('packages')).first()
+    if agency is None:
+        _index.remove('agencies', pk)
+        return
+    _index.add('agencies', pk, *agency_document(agency, agency.package_count))
+    if cascade:
+        for package in Package.objects.select_related('agency').filter(agency_id=pk):
+            _index.add('packages', package.pk, *package_document(package))
+        for guide in Guide.objects.select_related('agency').filter(agency_id=pk):
+            _index.add('guides', guide.pk, *guide_document(guide))
+
+
+@atexit.register
+def _save_snapshot():
+    if _index is not None and _index.dirty:
+        try:
+            _index.dump(snapshot_path())
+        except OSError:
+            pass
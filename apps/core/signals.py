@@ -0,0 +1,145 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.accounts.models import Agency
+from apps.bookings import ratings
+from apps.guides.models import Guide
+from apps.packages.models import Package
+from . import autocomplete, caching, search_cache, search_index
+
+# The search index only needs maintaining in processes that have loaded it;
+# anything else warms up from the snapshot and catches up on first use.
+
+@receiver(post_save, sender=Package)
+def index_saved_package(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw or not search_index.index_loaded():
+        return
+    if update_fields and set(update_fields) == {'views_count'}:
+        # View tracking only moves the popularity boost
+        search_index.get_search_index().update_meta('packages', instance.pk, views_count=instance.views_count)
+        return
+    pk, agency_id = instance.pk, instance.agency_id
+    transaction.on_commit(lambda: search_index.reindex_package(pk))
+    if created:
+        transaction.on_commit(lambda: search_index.reindex_agency(agency_id))
+
+@receiver(post_delete, sender=Package)
+def unindex_deleted_package(sender, instance, **kwargs):
+    if not search_index.index_loaded():
+        return
+    pk, agency_id = instance.pk, instance.agency_id
+    transaction.on_commit(lambda: search_index.reindex_package(pk))
+    transaction.on_commit(lambda: search_index.reindex_agency(agency_id))
+
+@receiver(post_save, sender=Guide)
+@receiver(post_delete, sender=Guide)
+def index_guide(sender, instance, raw=False, **kwargs):
+    if raw or not search_index.index_loaded():
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: search_index.reindex_guide(pk))
+
+@receiver(post_save, sender=Agency)
+def index_saved_agency(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not search_index.index_loaded():
+        return
+    # Name and verification status are copied into package and guide documents
+    cascade = not update_fields or bool({'name', 'is_verified'} & set(update_fields))
+    pk = instance.pk
+    transaction.on_commit(lambda: search_index.reindex_agency(pk, cascade=cascade))
+
+@receiver(post_delete, sender=Agency)
+def unindex_deleted_agency(sender, instance, **kwargs):
+    if not search_index.index_loaded():
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: search_index.reindex_agency(pk))
+
+
+# Result cache invalidation: bump the entity type's version once the write
+# is committed, so no request can re-cache pre-commit results under it. The
+# cache namespace of the same name versions the listing sections of the home
+# pages; their cards are keyed on each object's updated_at and re-render alone.
+
+def _bump_after_commit(entity):
+    def bump():
+        search_cache.bump_version(entity)
+        caching.invalidate(entity)
+    transaction.on_commit(bump)
+
+@receiver(post_save, sender=Package)
+@receiver(post_delete, sender=Package)
+def invalidate_package_results(sender, instance, raw=False, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {'views_count'}:
+        # Popularity drift is tolerated until the entries expire
+        return
+    _bump_after_commit('packages')
+
+@receiver(post_save, sender=Guide)
+@receiver(post_delete, sender=Guide)
+def invalidate_guide_results(sender, instance, raw=False, **kwargs):
+    _bump_after_commit('guides')
+
+@receiver(post_save, sender=Agency)
+@receiver(post_delete, sender=Agency)
+def invalidate_agency_results(sender, instance, raw=False, **kwargs):
+    _bump_after_commit('agencies')
+
+
+# Typeahead suggestions, maintained the same way as the search index
+
+@receiver(post_save, sender=Package)
+@receiver(post_delete, sender=Package)
+def refresh_package_suggestion(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not autocomplete.autocomplete_loaded():
+        return
+    if update_fields and set(update_fields) == {'views_count'}:
+        # Weights catch up on the next periodic rebuild
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.refresh_package(pk))
+
+@receiver(post_save, sender=Guide)
+@receiver(post_delete, sender=Guide)
+def refresh_guide_suggestion(sender, instance, raw=False, **kwargs):
+    if raw or not autocomplete.autocomplete_loaded():
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.refresh_guide(pk))
+
+@receiver(post_save, sender=Agency)
+@receiver(post_delete, sender=Agency)
+def refresh_agency_suggestion(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not autocomplete.autocomplete_loaded():
+        return
+    cascade = kwargs.get('signal') is post_save and (not update_fields or 'is_verified' in update_fields)
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.refresh_agency(pk, cascade=cascade))
+
+
+# Rating totals are written with UPDATE (apps.bookings.ratings), so they get
+# their own signal instead of post_save
+
+@receiver(ratings.totals_changed, sender=Guide)
+def guide_rating_changed(sender, pk, **kwargs):
+    _bump_after_commit('guides')
+    transaction.on_commit(lambda: search_index.boosts_changed('guides'))
+    if search_index.index_loaded():
+        transaction.on_commit(lambda: search_index.reindex_guide(pk))
+    if autocomplete.autocomplete_loaded():
+        transaction.on_commit(lambda: autocomplete.refresh_guide(pk))
+
+@receiver(ratings.totals_changed, sender=Agency)
+def agency_rating_changed(sender, pk, **kwargs):
+    _bump_after_commit('agencies')
+    transaction.on_commit(lambda: search_index.boosts_changed('agencies'))
+    # Package listings sort by agency rating
+    _bump_after_commit('packages')
+    if search_index.index_loaded():
+        transaction.on_commit(lambda: search_index.reindex_agency(pk))
+    if autocomplete.autocomplete_loaded():
+        transaction.on_commit(lambda: autocomplete.refresh_agency(pk))
+
+@receiver(ratings.totals_changed, sender=Package)
+def package_rating_changed(sender, pk, **kwargs):
+    _bump_after_commit('packages')
@@ -0,0 +1,138 @@
+# apps/core/sql_ranking.py
+"""
+SQL ranking mode for core.views.search (SEARCH_RANKING = 'sql').
+
+Computes the same phrase/token, featured, views and rating boosts as the
+in-memory index, but as annotations, so each entity type comes back as a
+single ``ORDER BY score LIMIT 30`` query. Agency package counts come from a
+correlated subquery instead of one COUNT per agency.
+"""
+from django.db.models import Case, When, Value, IntegerField, Q, F, OuterRef, Subquery, Count
+from django.db.models.functions import Coalesce, Floor, Greatest, Least
+
+RESULT_LIMIT = 30
+
+# Columns the search result cards render; everything else stays in the DB
+PACKAGE_CARD_FIELDS = (
+    'title', 'slug', 'description', 'package_type', 'duration_days', 'price_per_person',
+    'created_at', 'agency__name',
+)
+GUIDE_CARD_FIELDS = (
+    'name', 'bio', 'rating', 'total_ratings', 'experience_years', 'daily_rate', 'agency__name',
+)
+AGENCY_CARD_FIELDS = ('name', 'description', 'rating', 'total_ratings')
+
+
+def _matches(field, text, weight):
+    return Case(When(**{f'{field}__icontains': text}, then=Value(weight)), default=Value(0),
+                output_field=IntegerField())
+
+
+def text_score(query, tokens, weights):
+    """
+    Sum of per-field phrase and token boosts: ``weights`` maps a field to
+    ``(phrase_weight, token_weight)``.
+    """
+    score = Value(0, output_field=IntegerField())
+    if not query:
+        return score
+    for field, (phrase_weight, token_weight) in weights.items():
+        score = score + _matches(field, query, phrase_weight)
+        for token in tokens:
+            score = score + _matches(field, token, token_weight)
+    return score
+
+
+def text_filter(query, fields):
+    if not query:
+        return Q()
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f'{field}__icontains': query})
+    return condition
+
+
+def package_count_subquery():
+    from apps.packages.models import Package
+    counts = (Package.objects.filter(agency=OuterRef('pk'))
+              .order_by().values('agency').annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def guide_count_subquery():
+    from apps.guides.models import Guide
+    counts = (Guide.objects.filter(agency=OuterRef('pk'))
+              .order_by().values('agency').annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def rank_packages(query, package_type=None, min_price=None, max_price=None):
+    from apps.packages.models import Package
+    tokens = query.lower().split()
+
+    packages = Package.objects.filter(is_active=True, agency__is_verified=True)
+    if package_type:
+        packages = packages.filter(package_type=package_type)
+    if min_price is not None:
+        packages = packages.filter(price_per_person__gte=min_price)
+    if max_price is not None:
+        packages = packages.filter(price_per_person__lte=max_price)
+    packages = packages.filter(text_filter(query, [
+        'title', 'description', 'best_season', 'package_type', 'agency__name',
+    ]))
+
+    score = text_score(query, tokens, {
+        'title': (10, 3),
+        'description': (6, 2),
+        'best_season': (3, 1),
+        'agency__name': (4, 2),
+    })
+    score = score + Case(When(featured=True, then=Value(5)), default=Value(0), output_field=IntegerField())
+    score = score + Least(Greatest(F('views_count') / 50, 0), 20)
+
+    return (packages.select_related('agency').only(*PACKAGE_CARD_FIELDS)
+            .annotate(search_score=score)
+            .order_by('-search_score', '-created_at')[:RESULT_LIMIT])
+
+
+def rank_guides(query):
+    from apps.guides.models import Guide
+    tokens = query.lower().split()
+
+    guides = Guide.objects.filter(is_available=True, agency__is_verified=True).filter(text_filter(query, [
+        'name', 'bio', 'places_covered', 'certifications', 'agency__name',
+    ]))
+
+    score = text_score(query, tokens, {
+        'name': (8, 3),
+        'bio': (5, 2),
+        'places_covered': (4, 2),
+        'agency__name': (3, 1),
+    })
+    score = score + Floor(F('rating') * 2) + Least(Greatest(F('total_ratings') / 10, 0), 15)
+
+    return (guides.select_related('agency').only(*GUIDE_CARD_FIELDS)
+            .annotate(search_score=score)
+            .order_by('-search_score', '-rating'))[:RESULT_LIMIT]
+
+
+def rank_agencies(query):
+    from apps.accounts.models import Agency
+    tokens = query.lower().split()
+
+    agencies = Agency.objects.filter(is_verified=True).filter(text_filter(query, [
+        'name', 'description', 'address',
+    ]))
+
+    score = text_score(query, tokens, {
+        'name': (7, 3),
+        'description': (4, 2),
+    })
+    score = (score + Floor(F('rating')) * 2
+             + Least(Greatest(F('total_ratings') / 10, 0), 15)
+             + Least(F('package_count'), 10))
+
+    return (agencies.only(*AGENCY_CARD_FIELDS)
+            .annotate(package_count=package_count_subquery(), guide_count=guide_count_subquery())
+            .annotate(search_score=score)
+            .order_by('-search_score', '-rating'))[:RESULT_LIMIT]
@@ -1,5 +1,7 @@
 from django import template
 
+from apps.core import caching
+
 register = template.Library()
 
 @register.filter
@@ -20,4 +22,13 @@ def strip(value):
     """
     if not value:
         return ""
-    return str(value).strip()
\ No newline at end of file
+    return str(value).strip()
+
+@register.simple_tag
+def cache_generation(namespace):
+    """
+    Current generation of a cache namespace (see apps.core.caching), to vary
+    a fragment on so invalidating the namespace re-renders it
+    Usage: {% cache_generation "home" as generation %}{% cache 600 home_featured generation %}
+    """
+    return caching.generation(namespace)
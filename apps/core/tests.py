@@ -1,3 +1,80 @@
-from django.test import TestCase
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from django.db.models.sql.subqueries import UpdateQuery
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from apps.accounts.models import Agency, User
+from apps.packages.models import Departure, Package
+
+from . import query_cache
+
+
+def select_sql(queryset):
+    return queryset.query.get_compiler(queryset.db).as_sql()[0]
+
+
+def update_sql(queryset, **values):
+    query = queryset.query.chain(UpdateQuery)
+    query.add_update_fields(
+        (queryset.model._meta.get_field(name), None, value) for name, value in values.items()
+    )
+    return query.get_compiler(queryset.db).as_sql()[0]
+
+
+class TablesReadTests(SimpleTestCase):
+    def test_single_table(self):
+        self.assertEqual(query_cache.tables_read(select_sql(Package.objects.filter(is_active=True))),
+                         ('packages_package',))
+
+    def test_joins_and_subqueries(self):
+        queryset = Package.objects.filter(
+            agency__is_verified=True, pk__in=Departure.objects.values('package'),
+        )
+        self.assertEqual(query_cache.tables_read(select_sql(queryset)),
+                         ('accounts_agency', 'packages_departure', 'packages_package'))
+
+    def test_ignores_column_names_and_aliases(self):
+        queryset = User.objects.values('user_type').annotate(count=Count('id'))
+        self.assertEqual(query_cache.tables_read(select_sql(queryset)), ('accounts_user',))
+
+
+class WrittenTableTests(SimpleTestCase):
+    def test_insert_and_delete(self):
+        self.assertEqual(
+            query_cache.written_table('INSERT INTO "packages_package" ("title") VALUES (%s) RETURNING "id"'),
+            'packages_package',
+        )
+        self.assertEqual(
+            query_cache.written_table('DELETE FROM "accounts_agency" WHERE "accounts_agency"."id" IN (%s)'),
+            'accounts_agency',
+        )
+
+    def test_untracked_table(self):
+        self.assertIsNone(query_cache.written_table(
+            'UPDATE "django_session" SET "expire_date" = %s WHERE "django_session"."session_key" = %s'
+        ))
+        self.assertIsNone(query_cache.written_table(update_sql(Departure.objects.filter(pk=1), seats_taken=2)))
+
+    def test_reads_are_not_writes(self):
+        self.assertIsNone(query_cache.written_table(select_sql(Package.objects.all())))
+        self.assertIsNone(query_cache.written_table(None))
+
+    def test_update_of_tracked_column(self):
+        self.assertEqual(query_cache.written_table(update_sql(Agency.objects.filter(pk=1), is_verified=True)),
+                         'accounts_agency')
+
+    def test_update_of_untracked_columns_only(self):
+        self.assertIsNone(query_cache.written_table(update_sql(User.objects.filter(pk=1), last_login=None)))
+        # The view counter's flush: a CASE whose WHEN compares the id column
+        increment = Case(When(pk=1, then=Value(3)), default=Value(0), output_field=IntegerField())
+        self.assertIsNone(query_cache.written_table(
+            update_sql(Package.objects.filter(pk__in=[1]), views_count=F('views_count') + increment)
+        ))
+
+    def test_update_mixing_tracked_and_untracked_columns(self):
+        sql = update_sql(Package.objects.filter(pk=1), views_count=0, is_active=False)
+        self.assertEqual(query_cache.written_table(sql), 'packages_package')
+
+    def test_where_clause_columns_are_not_assignments(self):
+        sql = update_sql(User.objects.filter(is_active=True, user_type='tourist'), last_login=None)
+        self.assertIn(' WHERE ', sql)
+        self.assertIsNone(query_cache.written_table(sql))
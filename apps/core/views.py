@@ -1,8 +1,18 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
+from django.conf import settings
 from django.db.models import Q
+from django.http import Http404, JsonResponse
 from django.core.paginator import Paginator
+from django.urls import reverse
+from apps.bookings import ratings
 from .forms import SearchForm, ContactForm, NewsletterForm
+from .search_index import get_search_index
+from . import page_cache, search_cache, sql_ranking
+from .autocomplete import get_autocomplete, DEFAULT_LIMIT, MAX_LIMIT
+from .pagination import KeysetPaginator
+
+REVIEWS_PAGE_SIZE = 5
 
 def home(request):
     # Import models to get actual data
@@ -11,14 +21,26 @@ def home(request):
     from apps.accounts.models import Agency
     
     # Get featured content
-    featured_packages = Package.objects.filter(is_active=True, featured=True, agency__is_verified=True)[:6]
-    top_agencies = Agency.objects.filter(is_verified=True)[:6]
+    # Querysets stay lazy: the template only runs them when its cached
+    # fragments have expired (see the {% cache %} blocks in core/home.html)
+    featured_packages = Package.objects.filter(
+        is_active=True, featured=True, agency__is_verified=True,
+    ).select_related('agency')[:6]
+    # Top of the package_trending_keyset index; scores decay without rescans
+    trending_packages = Package.objects.filter(
+        is_active=True, agency__is_verified=True, trending_score__gt=0,
+    ).select_related('agency').order_by('-trending_score', '-id')[:6]
+    top_agencies = Agency.objects.filter(is_verified=True).annotate(
+        guides_count=sql_ranking.guide_count_subquery(),
+        packages_count=sql_ranking.package_count_subquery(),
+    )[:6]
     top_guides = Guide.objects.filter(is_available=True, agency__is_verified=True)[:6]
     
     # Get tourist-specific context if user is logged in as tourist
     context = {
         'is_tourist': request.user.is_authenticated and request.user.user_type == 'tourist',
         'featured_packages': featured_packages,
+        'trending_packages': trending_packages,
         'top_agencies': top_agencies,
         'top_guides': top_guides,
     }
@@ -53,100 +75,67 @@ def search(request):
         min_price = form.cleaned_data.get('min_price')
         max_price = form.cleaned_data.get('max_price')
 
-        # Tokenize query for simple term-weighted search
-        tokens = [t for t in query.lower().split() if t]
-
-        def score_text(text: str, weights: dict) -> int:
-            if not query:
-                return 0
-            text_l = (text or '').lower()
-            score = 0
-            # Exact phrase boost
-            if query and query in text_l:
-                score += weights.get('phrase', 5)
-            # Token matches
-            for tok in tokens:
-                if tok in text_l:
-                    score += weights.get('token', 2)
-            return score
-
-        # Build base filters
-        package_q = Q(is_active=True, agency__is_verified=True)
-        if package_type_filter:
-            package_q &= Q(package_type=package_type_filter)
-        if min_price is not None:
-            package_q &= Q(price_per_person__gte=min_price)
-        if max_price is not None:
-            package_q &= Q(price_per_person__lte=max_price)
+        packages_qs = Package.objects.select_related('agency').only(*sql_ranking.PACKAGE_CARD_FIELDS)
+        guides_qs = Guide.objects.select_related('agency').only(*sql_ranking.GUIDE_CARD_FIELDS)
+        agencies_qs = Agency.objects.only(*sql_ranking.AGENCY_CARD_FIELDS).annotate(
+            package_count=sql_ranking.package_count_subquery(),
+            guide_count=sql_ranking.guide_count_subquery(),
+        )
+        use_sql = settings.SEARCH_RANKING == 'sql'
+        limit = sql_ranking.RESULT_LIMIT
+
+        def ranked(entity, depends_on, filters, rank, queryset):
+            # Only the ranked IDs are cached; a hit costs one in_bulk query
+            fresh = []
+
+            def compute():
+                fresh.extend(rank())
+                return [obj.pk for obj in fresh]
+
+            filters = dict(filters, ranking=settings.SEARCH_RANKING)
+            ids = search_cache.get_or_compute(f'core.search.{entity}', depends_on, query, filters, compute)
+            return fresh or search_cache.hydrate(queryset, ids)
 
         if search_type in ('all', 'packages'):
-            pkg_text_q = Q()
-            if query:
-                pkg_text_q |= Q(title__icontains=query)
-                pkg_text_q |= Q(description__icontains=query)
-                pkg_text_q |= Q(best_season__icontains=query)
-                pkg_text_q |= Q(package_type__icontains=query)
-                pkg_text_q |= Q(agency__name__icontains=query)
-            packages_qs = Package.objects.filter(package_q & (pkg_text_q if query else package_q)).select_related('agency')[:100]
-            ranked_packages = []
-            for p in packages_qs:
-                s = 0
-                s += score_text(p.title, {'phrase': 10, 'token': 3})
-                s += score_text(p.description, {'phrase': 6, 'token': 2})
-                s += score_text(p.best_season, {'phrase': 3, 'token': 1})
-                s += score_text(p.agency.name, {'phrase': 4, 'token': 2})
-                # Metadata boosts
-                if p.featured:
-                    s += 5
-                s += min(max(p.views_count // 50, 0), 20)
-                ranked_packages.append((s, p))
-            ranked_packages.sort(key=lambda x: x[0], reverse=True)
-            results['packages'] = [p for _, p in ranked_packages[:30]]
+            def rank_packages():
+                if use_sql:
+                    # Boosts computed as annotations: one ranked, limited query
+                    return list(sql_ranking.rank_packages(query, package_type_filter, min_price, max_price))
+                # Rank against the in-memory BM25 index, then load just the winners
+                where = {'is_active': True, 'agency_verified': True}
+                if package_type_filter:
+                    where['package_type'] = package_type_filter
+                ids = get_search_index().search(
+                    'packages', query, limit=limit, where=where,
+                    min_values={'price': float(min_price)} if min_price is not None else None,
+                    max_values={'price': float(max_price)} if max_price is not None else None,
+                )
+                return search_cache.hydrate(packages_qs, ids)
+
+            results['packages'] = ranked(
+                'packages', ['packages', 'agencies'],
+                {'package_type': package_type_filter, 'min_price': min_price, 'max_price': max_price},
+                rank_packages, packages_qs,
+            )
 
         if search_type in ('all', 'guides'):
-            guide_q = Q(is_available=True, agency__is_verified=True)
-            guide_text_q = Q()
-            if query:
-                guide_text_q |= Q(name__icontains=query)
-                guide_text_q |= Q(bio__icontains=query)
-                guide_text_q |= Q(places_covered__icontains=query)
-                guide_text_q |= Q(certifications__icontains=query)
-                guide_text_q |= Q(agency__name__icontains=query)
-            guides_qs = Guide.objects.filter(guide_q & (guide_text_q if query else guide_q)).select_related('agency')[:100]
-            ranked_guides = []
-            for g in guides_qs:
-                s = 0
-                s += score_text(g.name, {'phrase': 8, 'token': 3})
-                s += score_text(g.bio, {'phrase': 5, 'token': 2})
-                s += score_text(g.places_covered, {'phrase': 4, 'token': 2})
-                s += score_text(g.agency.name, {'phrase': 3, 'token': 1})
-                # Metadata boosts
-                s += int(float(g.rating or 0) * 2)
-                s += min(max(g.total_ratings // 10, 0), 15)
-                ranked_guides.append((s, g))
-            ranked_guides.sort(key=lambda x: x[0], reverse=True)
-            results['guides'] = [g for _, g in ranked_guides[:30]]
+            def rank_guides():
+                if use_sql:
+                    return list(sql_ranking.rank_guides(query))
+                ids = get_search_index().search('guides', query, limit=limit,
+                                                where={'is_available': True, 'agency_verified': True})
+                return search_cache.hydrate(guides_qs, ids)
+
+            results['guides'] = ranked('guides', ['guides', 'agencies'], {}, rank_guides, guides_qs)
 
         if search_type in ('all', 'agencies'):
-            agency_q = Q(is_verified=True)
-            agency_text_q = Q()
-            if query:
-                agency_text_q |= Q(name__icontains=query)
-                agency_text_q |= Q(description__icontains=query)
-                agency_text_q |= Q(address__icontains=query)
-            agencies_qs = Agency.objects.filter(agency_q & (agency_text_q if query else agency_q))[:100]
-            ranked_agencies = []
-            for a in agencies_qs:
-                s = 0
-                s += score_text(a.name, {'phrase': 7, 'token': 3})
-                s += score_text(a.description, {'phrase': 4, 'token': 2})
-                # Metadata boosts
-                s += int(float(a.rating or 0)) * 2
-                s += min(max(a.total_ratings // 10, 0), 15)
-                s += min(a.packages.count(), 10)
-                ranked_agencies.append((s, a))
-            ranked_agencies.sort(key=lambda x: x[0], reverse=True)
-            results['agencies'] = [a for _, a in ranked_agencies[:30]]
+            def rank_agencies():
+                if use_sql:
+                    return list(sql_ranking.rank_agencies(query))
+                ids = get_search_index().search('agencies', query, limit=limit, where={'is_verified': True})
+                return search_cache.hydrate(agencies_qs, ids)
+
+            results['agencies'] = ranked('agencies', ['agencies', 'packages'], {}, rank_agencies, agencies_qs)
 
     context = {
         'form': form,
@@ -156,6 +145,15 @@ def search(request):
     }
     return render(request, 'core/search.html', context)
 
+def autocomplete(request):
+    """Typeahead suggestions for the search box, served from memory"""
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    suggestions = get_autocomplete().suggest(request.GET.get('q', ''), limit)
+    return JsonResponse(suggestions)
+
 def contact(request):
     if request.method == 'POST':
         form = ContactForm(request.POST)
@@ -169,33 +167,77 @@ def contact(request):
     return render(request, 'core/contact.html', {'form': form})
 
 # Public detail views
+def review_context(rating_type, target):
+    """Star histogram and first review page for a detail page, without aggregate queries"""
+    paginator = KeysetPaginator(ratings.reviews(rating_type, target.pk), REVIEWS_PAGE_SIZE)
+    return {
+        'rating_histogram': ratings.histogram(target),
+        'reviews_page': paginator.get_page(),
+        'reviews_url': reverse('core:reviews', args=[rating_type, target.pk]),
+    }
+
+def reviews(request, rating_type, target_id):
+    """Keyset-paginated reviews of a guide, agency or package as JSON"""
+    if rating_type not in ratings.RATED_MODELS:
+        raise Http404
+    paginator = KeysetPaginator(ratings.reviews(rating_type, target_id), REVIEWS_PAGE_SIZE)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return JsonResponse({
+        'reviews': [
+            {
+                'tourist': review.tourist.full_name,
+                'rating': review.rating,
+                'review': review.review,
+                'created_at': review.created_at.date().isoformat(),
+            }
+            for review in page
+        ],
+        'next_cursor': page.next_cursor,
+    })
+
+def count_cached_package_view(request, meta):
+    """Views served from the page cache still count towards popularity"""
+    from apps.packages.models import Package
+    from apps.packages.view_counter import record_view
+
+    record_view(request, Package(pk=meta['package_id']))
+
+@page_cache.cache_public_page('packages', 'agencies', on_hit=count_cached_package_view)
 def package_detail(request, slug):
     from apps.packages.models import Package
+    from apps.packages.view_counter import record_view
     from django.shortcuts import get_object_or_404
     
-    package = get_object_or_404(Package, slug=slug, is_active=True)
-    package.increment_views()  # Track views
+    package = get_object_or_404(Package.objects.select_related('agency'), slug=slug, is_active=True)
+    record_view(request, package)  # Buffered and deduplicated per visitor
     
     context = {
         'package': package,
         'is_authenticated': request.user.is_authenticated,
         'user_type': request.user.user_type if request.user.is_authenticated else None,
+        **review_context('package', package),
     }
-    return render(request, 'core/package_detail.html', context)
+    response = render(request, 'core/package_detail.html', context)
+    return page_cache.with_meta(response, package_id=package.pk)
 
+@page_cache.cache_public_page('guides', 'agencies')
 def guide_detail(request, guide_id):
     from apps.guides.models import Guide
     from django.shortcuts import get_object_or_404
     
-    guide = get_object_or_404(Guide, id=guide_id, is_available=True)
+    guide = get_object_or_404(
+        Guide.objects.select_related('agency').prefetch_related('places'), id=guide_id, is_available=True,
+    )
     
     context = {
         'guide': guide,
         'is_authenticated': request.user.is_authenticated,
         'user_type': request.user.user_type if request.user.is_authenticated else None,
+        **review_context('guide', guide),
     }
     return render(request, 'core/guide_detail.html', context)
 
+@page_cache.cache_public_page('agencies', 'packages', 'guides')
 def agency_detail(request, agency_id):
     from apps.accounts.models import Agency
     from django.shortcuts import get_object_or_404
@@ -206,5 +248,6 @@ def agency_detail(request, agency_id):
         'agency': agency,
         'is_authenticated': request.user.is_authenticated,
         'user_type': request.user.user_type if request.user.is_authenticated else None,
+        **review_context('agency', agency),
     }
     return render(request, 'core/agency_detail.html', context)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Guide
+from .models import Guide, Place
 
 @admin.register(Guide)
 class GuideAdmin(admin.ModelAdmin):
@@ -9,4 +9,10 @@ class GuideAdmin(admin.ModelAdmin):
     readonly_fields = ('rating', 'total_ratings', 'created_at', 'updated_at')
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('agency')
\ No newline at end of file
+        return super().get_queryset(request).select_related('agency')
+
+@admin.register(Place)
+class PlaceAdmin(admin.ModelAdmin):
+    list_display = ('name', 'normalized_name', 'aliases', 'created_at')
+    search_fields = ('name', 'normalized_name')
+    readonly_fields = ('normalized_name', 'created_at')
@@ -1,6 +1,6 @@
 # apps/guides/forms.py
 from django import forms
-from .models import Guide
+from .models import Guide, Place
 
 class GuideForm(forms.ModelForm):
     class Meta:
@@ -36,4 +36,13 @@ class GuideForm(forms.ModelForm):
             elif field_name == 'profile_picture':
                 field.widget.attrs.update({
                     'class': 'block w-full text-sm text-gray-500 file:mr-4 file:py-2 file:px-4 file:rounded-full file:border-0 file:text-sm file:font-semibold file:bg-nepal-green-50 file:text-nepal-green-700 hover:file:bg-nepal-green-100'
-                })
\ No newline at end of file
+                })
+
+    def clean_places_covered(self):
+        places_covered = self.cleaned_data.get('places_covered')
+        limit = Place.name_max_length()
+        if any(len(' '.join(name.split())) > limit for name in (places_covered or '').split(',')):
+            raise forms.ValidationError(
+                f"Each place can be at most {limit} characters long. Separate places with commas."
+            )
+        return places_covered
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from apps.guides.models import Guide
+
+class Command(BaseCommand):
+    help = 'Link every guide to the Place gazetteer from its places_covered text'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of guides loaded per query')
+        parser.add_argument('--missing-only', action='store_true',
+                            help='Only sync guides that have no places linked yet')
+
+    def handle(self, *args, **options):
+        guides = Guide.objects.order_by('pk').only('places_covered')
+        if options['missing_only']:
+            guides = guides.filter(places__isnull=True)
+
+        total = 0
+        for guide in guides.iterator(chunk_size=options['batch_size']):
+            guide.sync_places()
+            total += 1
+            if total % options['batch_size'] == 0:
+                self.stdout.write(f'Synced {total} guides...')
+
+        self.stdout.write(self.style.SUCCESS(f'Synced places for {total} guides.'))
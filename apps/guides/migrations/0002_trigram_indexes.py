@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:00
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_trigram_indexes'),
+        ('guides', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='guide',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='guide_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='guide',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['bio'], name='guide_bio_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='guide',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['places_covered'], name='guide_places_covered_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_keyset_indexes'),
+        ('guides', '0002_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='guide',
+            index=models.Index(fields=['-rating', '-total_ratings', '-id'], name='guide_rating_keyset'),
+        ),
+    ]
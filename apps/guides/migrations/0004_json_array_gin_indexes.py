@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:13
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_keyset_indexes'),
+        ('guides', '0003_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='guide',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['languages'], name='guide_languages_gin', opclasses=['jsonb_path_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='guide',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['specialties'], name='guide_specialties_gin', opclasses=['jsonb_path_ops']),
+        ),
+    ]
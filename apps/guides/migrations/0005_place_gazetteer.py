@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:14
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0004_json_array_gin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Place',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('normalized_name', models.CharField(editable=False, max_length=100, unique=True)),
+                ('aliases', models.JSONField(blank=True, default=list, help_text='Other spellings that mean this place, e.g. "Langtang Valley"')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['aliases'], name='place_aliases_gin', opclasses=['jsonb_path_ops'])],
+            },
+        ),
+        migrations.AddField(
+            model_name='guide',
+            name='places',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='guides', to='guides.place'),
+        ),
+    ]
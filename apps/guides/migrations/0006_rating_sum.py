@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0005_place_gazetteer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guide',
+            name='rating_sum',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
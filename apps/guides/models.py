@@ -1,5 +1,88 @@
+import re
+import unicodedata
+
 from django.db import models
+from django.db.models import Q
+from django.contrib.postgres.indexes import GinIndex
 from apps.accounts.models import Agency
+from apps.core import lookups  # noqa: F401  (registers contains_any)
+
+class PlaceQuerySet(models.QuerySet):
+    def matching(self, name):
+        """Places whose normalized name, or one of whose aliases, is ``name``"""
+        key = Place.normalize(name)
+        if not key:
+            return self.none()
+        return self.filter(Q(normalized_name=key) | Q(aliases__contains=[key]))
+
+class Place(models.Model):
+    """A gazetteer entry; guides link to these instead of repeating free text"""
+    name = models.CharField(max_length=100)
+    normalized_name = models.CharField(max_length=100, unique=True, editable=False)
+    aliases = models.JSONField(default=list, blank=True,
+                               help_text="Other spellings that mean this place, e.g. \"Langtang Valley\"")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = PlaceQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['name']
+        indexes = [
+            GinIndex(fields=['aliases'], name='place_aliases_gin', opclasses=['jsonb_path_ops']),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        self.normalized_name = self.normalize(self.name)
+        self.aliases = sorted({self.normalize(alias) for alias in self.aliases} - {'', self.normalized_name})
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def normalize(name):
+        """Case-, accent- and punctuation-insensitive key ("Everest B.C." becomes "everest b c")"""
+        name = unicodedata.normalize('NFKD', name or '')
+        name = ''.join(char for char in name if not unicodedata.combining(char))
+        return ' '.join(re.sub(r'[\W_]+', ' ', name.lower()).split())
+
+    @classmethod
+    def split(cls, text):
+        """
+        Place names from a comma-separated list, first spelling of each kept.
+        Pieces too long for a place name (a missing comma, usually) are skipped.
+        """
+        limit = cls.name_max_length()
+        names = {}
+        for name in (text or '').split(','):
+            name = ' '.join(name.split())
+            key = cls.normalize(name)
+            if key and len(name) <= limit and len(key) <= limit:
+                names.setdefault(key, name)
+        return names
+
+    @classmethod
+    def name_max_length(cls):
+        return min(cls._meta.get_field('name').max_length, cls._meta.get_field('normalized_name').max_length)
+
+    @classmethod
+    def resolve(cls, text):
+        """Places for a comma-separated list, creating any that are new"""
+        names = cls.split(text)
+        if not names:
+            return []
+        found = {}
+        for place in cls.objects.filter(Q(normalized_name__in=names) | Q(aliases__contains_any=list(names))):
+            for key in [place.normalized_name, *place.aliases]:
+                found.setdefault(key, place)
+        places = []
+        for key, name in names.items():
+            place = found.get(key)
+            if place is None:
+                place, _ = cls.objects.get_or_create(normalized_name=key, defaults={'name': name})
+            if place not in places:
+                places.append(place)
+        return places
 
 class Guide(models.Model):
     LANGUAGES = (
@@ -23,6 +106,13 @@ class Guide(models.Model):
         ('photography', 'Photography Tours'),
     )
 
+    # Listing filter bands as (value, label, low, high); both ends inclusive
+    EXPERIENCE_BANDS = (
+        ('1-5', '1-5 Years', 1, 5),
+        ('6-10', '6-10 Years', 6, 10),
+        ('11+', '11+ Years', 11, None),
+    )
+
     agency = models.ForeignKey(Agency, on_delete=models.CASCADE, related_name='guides')
     name = models.CharField(max_length=100)
     bio = models.TextField()
@@ -34,11 +124,31 @@ class Guide(models.Model):
     is_available = models.BooleanField(default=True)
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
     total_ratings = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0, editable=False)  # Running total, see apps.bookings.ratings
+    stars_5 = models.IntegerField(default=0, editable=False)
+    stars_4 = models.IntegerField(default=0, editable=False)
+    stars_3 = models.IntegerField(default=0, editable=False)
+    stars_2 = models.IntegerField(default=0, editable=False)
+    stars_1 = models.IntegerField(default=0, editable=False)
     places_covered = models.TextField(help_text="Comma-separated list of places")
+    places = models.ManyToManyField(Place, related_name='guides', blank=True, editable=False)
     certifications = models.TextField(blank=True, help_text="Guide certifications and training")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Trigram indexes back the fuzzy search in apps.core.fuzzy_search
+            GinIndex(fields=['name'], name='guide_name_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['bio'], name='guide_bio_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['places_covered'], name='guide_places_covered_trgm', opclasses=['gin_trgm_ops']),
+            # Containment filters on the JSON arrays (see apps.core.lookups)
+            GinIndex(fields=['languages'], name='guide_languages_gin', opclasses=['jsonb_path_ops']),
+            GinIndex(fields=['specialties'], name='guide_specialties_gin', opclasses=['jsonb_path_ops']),
+            # Keyset pagination (apps.core.pagination) walks these sort keys
+            models.Index(fields=['-rating', '-total_ratings', '-id'], name='guide_rating_keyset'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.agency.name}"
 
@@ -50,10 +160,13 @@ class Guide(models.Model):
         spec_dict = dict(self.SPECIALTIES)
         return [spec_dict.get(spec, spec) for spec in self.specialties]
 
+    def sync_places(self):
+        """Link the gazetteer entries for ``places_covered`` (see apps.guides.signals)"""
+        self.places.set(Place.resolve(self.places_covered))
+
     def update_rating(self):
-        from apps.bookings.models import Rating
-        ratings = Rating.objects.filter(guide=self, rating_type='guide')
-        if ratings.exists():
-            self.total_ratings = ratings.count()
-            self.rating = sum(r.rating for r in ratings) / self.total_ratings
-            self.save(update_fields=['rating', 'total_ratings'])
+        """Rebuild the running rating totals from the Rating table (see apps.bookings.ratings)"""
+        from apps.bookings import ratings
+        ratings.recompute('guide', [self.pk])
+        self.refresh_from_db(fields=['rating', 'total_ratings', 'rating_sum', *ratings.STAR_FIELDS.values()])
+        ratings.totals_changed.send(sender=type(self), pk=self.pk)
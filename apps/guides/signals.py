@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import Guide
+
+@receiver(post_save, sender=Guide)
+def sync_guide_places(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the guide's Place links in step with its places_covered text"""
+    if raw:
+        return
+    # Rating and availability updates don't touch the place list
+    if update_fields and 'places_covered' not in update_fields:
+        return
+    instance.sync_places()
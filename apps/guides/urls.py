@@ -5,5 +5,6 @@ app_name = 'guides'
 
 urlpatterns = [
     path('', views.guide_list, name='guide_list'),
+    path('availability/', views.guide_availability, name='guide_availability'),
     path('<int:id>/', views.guide_detail, name='guide_detail'),
 ]
@@ -1,32 +1,47 @@
+import datetime
+
 from django.shortcuts import render, get_object_or_404
-from django.core.paginator import Paginator
+from django.conf import settings
 from django.db.models import Q
-from .models import Guide
+from django.http import JsonResponse
+from apps.bookings import availability
+from apps.core.fuzzy_search import trigram_search
+from apps.core.lookups import array_match
+from apps.core.page_cache import cache_public_page
+from apps.core.pagination import KeysetPaginator
+from .models import Guide, Place
+
+# Most guides one availability calendar request may ask for
+MAX_CALENDAR_GUIDES = 50
 
+@cache_public_page('guides', 'agencies')
 def guide_list(request):
-    guides = Guide.objects.filter(is_available=True, agency__is_verified=True)
+    guides = Guide.objects.filter(is_available=True, agency__is_verified=True).select_related('agency')
 
     # Search
     search_query = request.GET.get('search', '').strip()
     if search_query:
-        guides = guides.filter(
-            Q(name__icontains=search_query)
-            | Q(bio__icontains=search_query)
-            | Q(places_covered__icontains=search_query)
-            | Q(agency__name__icontains=search_query)
-        )
+        guides = trigram_search(guides, search_query, ['name', 'places_covered', 'bio', 'agency__name'])
 
     # Filtering
-    specialty = request.GET.get('specialty')
-    language = request.GET.get('language')
+    # Multi-selects: specialties match any by default, languages match all
+    specialties = request.GET.getlist('specialty')
+    languages = request.GET.getlist('language')
+    specialty_match = request.GET.get('specialty_match', 'any')
+    language_match = request.GET.get('language_match', 'all')
     experience = request.GET.get('experience')  # e.g., "1-3", "3-5", "10+"
     min_rate = request.GET.get('min_rate')
     max_rate = request.GET.get('max_rate')
 
-    if specialty:
-        guides = guides.filter(specialties__contains=[specialty])
-    if language:
-        guides = guides.filter(languages__contains=[language])
+    guides = guides.filter(
+        array_match('specialties', specialties, match_all=specialty_match == 'all'),
+        array_match('languages', languages, match_all=language_match == 'all'),
+    )
+    # "Guides who cover Langtang": an indexed gazetteer lookup, aliases included
+    place = request.GET.get('place', '').strip()
+    if place:
+        covering = Guide.places.through.objects.filter(place__in=Place.objects.matching(place))
+        guides = guides.filter(pk__in=covering.values('guide_id'))
     if experience:
         if experience == '1-3':
             guides = guides.filter(experience_years__gte=1, experience_years__lte=3)
@@ -40,10 +55,16 @@ def guide_list(request):
         guides = guides.filter(daily_rate__gte=min_rate)
     if max_rate:
         guides = guides.filter(daily_rate__lte=max_rate)
+    # "Who is free from X to Y": NOT EXISTS an overlapping active booking
+    available_from, available_to = availability.requested_period(request.GET)
+    if available_from:
+        guides = guides.filter(availability.free_between(available_from, available_to))
 
     # Sorting
-    sort_by = request.GET.get('sort', 'rating')
-    if sort_by == 'price_low':
+    sort_by = request.GET.get('sort', 'relevance' if search_query else 'rating')
+    if sort_by == 'relevance' and search_query:
+        guides = guides.order_by('-relevance_score', '-rating')
+    elif sort_by == 'price_low':
         guides = guides.order_by('daily_rate')
     elif sort_by == 'price_high':
         guides = guides.order_by('-daily_rate')
@@ -52,18 +73,48 @@ def guide_list(request):
     else:
         guides = guides.order_by('-rating', '-total_ratings')
 
-    # Pagination
-    paginator = Paginator(guides, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination on the sort keys (see apps.core.pagination)
+    paginator = KeysetPaginator(guides, 12, count=settings.LISTING_SHOW_TOTALS)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
 
     context = {
         'guides': page_obj,
         'specialties': Guide.SPECIALTIES,
         'languages': Guide.LANGUAGES,
+        'selected_specialties': specialties,
+        'selected_languages': languages,
+        'specialty_match': specialty_match,
+        'language_match': language_match,
+        'place': place,
+        'available_from': available_from,
+        'available_to': available_to,
     }
     return render(request, 'guides/guide_list.html', context)
 
+def guide_availability(request):
+    """
+    Booked ranges for one month of up to MAX_CALENDAR_GUIDES listed guides
+    (``?month=2026-11&guide=1&guide=2``), from a single bookings query.
+    """
+    try:
+        month = datetime.datetime.strptime(request.GET.get('month', ''), '%Y-%m').date()
+    except ValueError:
+        month = datetime.date.today().replace(day=1)
+    month_end = (month + datetime.timedelta(days=31)).replace(day=1) - datetime.timedelta(days=1)
+
+    # isdigit() also takes superscripts int() rejects; the length keeps ids within bigint
+    ids = {int(value) for value in request.GET.getlist('guide') if value.isdecimal() and len(value) <= 18}
+    if len(ids) > MAX_CALENDAR_GUIDES:
+        return JsonResponse({'error': f'At most {MAX_CALENDAR_GUIDES} guides per request.'}, status=400)
+    listed = list(Guide.objects.filter(
+        pk__in=ids, is_available=True, agency__is_verified=True,
+    ).values_list('pk', flat=True))
+    booked = availability.booked_many('guide', listed, month, month_end)
+    return JsonResponse({
+        'month': month.strftime('%Y-%m'),
+        'guides': {str(pk): booked[pk].ranges(month, month_end) for pk in listed},
+    })
+
 def guide_detail(request, id):
     # Redirect to the core public detail view
     from django.shortcuts import redirect
@@ -1,10 +1,15 @@
 from django.contrib import admin
-from .models import Package, PackageImage
+from .models import Departure, Package, PackageImage
 
 class PackageImageInline(admin.TabularInline):
     model = PackageImage
     extra = 1
 
+class DepartureInline(admin.TabularInline):
+    model = Departure
+    extra = 0
+    readonly_fields = ('seats_taken',)
+
 @admin.register(Package)
 class PackageAdmin(admin.ModelAdmin):
     list_display = ('title', 'agency', 'package_type', 'duration_days', 'price_per_person', 'is_active', 'featured')
@@ -12,7 +17,7 @@ class PackageAdmin(admin.ModelAdmin):
     search_fields = ('title', 'description', 'agency__name')
     prepopulated_fields = {'slug': ('title',)}
     readonly_fields = ('views_count', 'created_at', 'updated_at')
-    inlines = [PackageImageInline]
+    inlines = [PackageImageInline, DepartureInline]
     actions = ['make_featured', 'remove_featured']
     
     def make_featured(self, request, queryset):
@@ -32,4 +37,14 @@ class PackageAdmin(admin.ModelAdmin):
 class PackageImageAdmin(admin.ModelAdmin):
     list_display = ('package', 'caption', 'is_main', 'created_at')
     list_filter = ('is_main', 'created_at')
-    search_fields = ('package__title', 'caption')
\ No newline at end of file
+    search_fields = ('package__title', 'caption')
+@admin.register(Departure)
+class DepartureAdmin(admin.ModelAdmin):
+    list_display = ('package', 'start_date', 'seats_total', 'seats_taken', 'scheduled')
+    list_filter = ('scheduled', 'start_date')
+    search_fields = ('package__title',)
+    readonly_fields = ('seats_taken',)
+    date_hierarchy = 'start_date'
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('package')
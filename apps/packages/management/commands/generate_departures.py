@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.packages import departures
+from apps.packages.models import Package
+
+class Command(BaseCommand):
+    help = 'Schedule package departures for a season (existing departures are kept)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='first', type=date.fromisoformat, required=True,
+                            help='First departure date (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='last', type=date.fromisoformat, required=True,
+                            help='Last possible departure date (YYYY-MM-DD)')
+        parser.add_argument('--every', type=int, default=7,
+                            help='Days between departures')
+        parser.add_argument('--seats', type=int,
+                            help="Seats per departure (default: each package's max_people)")
+        parser.add_argument('--package', type=int, action='append', dest='packages',
+                            help='Package id; repeat for several (default: every active package)')
+
+    def handle(self, *args, **options):
+        if options['last'] < options['first']:
+            raise CommandError('--to must not be before --from.')
+        packages = Package.objects.filter(is_active=True).only('pk', 'max_people')
+        if options['packages']:
+            packages = packages.filter(pk__in=options['packages'])
+
+        created = departures.generate(
+            packages, options['first'], options['last'],
+            every_days=options['every'], seats=options['seats'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Scheduled {created} departures.'))
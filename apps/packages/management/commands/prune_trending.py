@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.packages import trending
+from apps.packages.models import PackageActivity
+
+class Command(BaseCommand):
+    help = 'Drop hourly trending buckets past the retention window, optionally rebuilding scores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.TRENDING_RETENTION_DAYS,
+                            help='Number of days of hourly buckets to keep')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recompute every trending score from the kept buckets')
+
+    def handle(self, *args, **options):
+        cutoff = trending.bucket_hour(timezone.now() - timedelta(days=options['days']))
+        deleted, _ = PackageActivity.objects.filter(hour__lt=cutoff).delete()
+        self.stdout.write(f'Removed {deleted} buckets older than {cutoff:%Y-%m-%d %H:00} UTC.')
+
+        if options['rebuild']:
+            scored = trending.rebuild_scores(since=cutoff)
+            self.stdout.write(f'Rebuilt trending scores for {scored} packages.')
+
+        self.stdout.write(self.style.SUCCESS('Trending buckets pruned.'))
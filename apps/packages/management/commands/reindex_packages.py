@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from apps.packages.models import Package
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored full-text search vector for packages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of packages updated per statement')
+        parser.add_argument('--missing-only', action='store_true',
+                            help='Only index packages that have no search vector yet')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        packages = Package.objects.order_by('pk')
+        if options['missing_only']:
+            packages = packages.filter(search_vector__isnull=True)
+
+        total = 0
+        last_pk = 0
+        while True:
+            # Walk the primary key so each batch is a short indexed range update
+            batch = list(packages.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                break
+            total += Package.objects.filter(pk__in=batch).update_search_vector()
+            last_pk = batch[-1]
+            self.stdout.write(f'Indexed {total} packages...')
+
+        self.stdout.write(self.style.SUCCESS(f'Reindexed {total} packages.'))
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:58
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+
+
+def populate_search_vector(apps, schema_editor):
+    Agency = apps.get_model('accounts', 'Agency')
+    Package = apps.get_model('packages', 'Package')
+    agency_name = models.Subquery(
+        Agency.objects.filter(pk=models.OuterRef('agency_id')).values('name')[:1]
+    )
+    Package.objects.update(search_vector=(
+        SearchVector('title', weight='A')
+        + SearchVector('description', weight='B')
+        + SearchVector('package_type', weight='C')
+        + SearchVector('best_season', weight='C')
+        + SearchVector(agency_name, weight='D')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_verificationrequest'),
+        ('packages', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='package',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='package',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='package_search_vector_gin'),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:00
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_trigram_indexes'),
+        ('packages', '0002_package_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='package',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='package_title_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='package',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['description'], name='package_description_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_keyset_indexes'),
+        ('packages', '0003_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='package',
+            index=models.Index(fields=['-created_at', '-id'], name='package_created_keyset'),
+        ),
+        migrations.AddIndex(
+            model_name='package',
+            index=models.Index(fields=['price_per_person', 'id'], name='package_price_keyset'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_keyset_indexes'),
+        ('packages', '0004_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackageActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('bookings', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='package',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='package',
+            index=models.Index(fields=['-trending_score', '-id'], name='package_trending_keyset'),
+        ),
+        migrations.AddField(
+            model_name='packageactivity',
+            name='package',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='packages.package'),
+        ),
+        migrations.AddIndex(
+            model_name='packageactivity',
+            index=models.Index(fields=['hour'], name='package_activity_hour'),
+        ),
+        migrations.AddConstraint(
+            model_name='packageactivity',
+            constraint=models.UniqueConstraint(fields=('package', 'hour'), name='package_activity_hour_unique'),
+        ),
+    ]
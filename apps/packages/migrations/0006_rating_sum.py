@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0005_trending_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='package',
+            name='rating',
+            field=models.DecimalField(decimal_places=2, default=0.0, editable=False, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='package',
+            name='rating_sum',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='package',
+            name='total_ratings',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
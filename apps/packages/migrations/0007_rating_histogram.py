@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0006_rating_sum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='package',
+            name='stars_1',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='package',
+            name='stars_2',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='package',
+            name='stars_3',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='package',
+            name='stars_4',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='package',
+            name='stars_5',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
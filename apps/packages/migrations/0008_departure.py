@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0007_rating_histogram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Departure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('seats_total', models.PositiveIntegerField()),
+                ('seats_taken', models.PositiveIntegerField(default=0)),
+                ('package', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='departures', to='packages.package')),
+            ],
+            options={
+                'ordering': ['start_date'],
+                'constraints': [models.UniqueConstraint(fields=('package', 'start_date'), name='departure_package_date_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0008_departure'),
+    ]
+
+    operations = [
+        # Departures that already exist can't be told apart; treat them as
+        # opened on demand so no package is pinned to its booked dates
+        migrations.AddField(
+            model_name='departure',
+            name='scheduled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='departure',
+            name='scheduled',
+            field=models.BooleanField(default=True),
+        ),
+    ]
@@ -1,6 +1,26 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from apps.accounts.models import Agency
 
+# Fields that feed Package.search_vector; saving any of them needs a reindex
+SEARCH_VECTOR_FIELDS = {'title', 'description', 'package_type', 'best_season', 'agency'}
+
+class PackageQuerySet(models.QuerySet):
+    def update_search_vector(self):
+        """Recompute the stored weighted tsvector for every package in the queryset."""
+        # UPDATE can't follow joins, so the agency name comes in through a subquery
+        agency_name = models.Subquery(
+            Agency.objects.filter(pk=models.OuterRef('agency_id')).values('name')[:1]
+        )
+        return self.update(search_vector=(
+            SearchVector('title', weight='A')
+            + SearchVector('description', weight='B')
+            + SearchVector('package_type', weight='C')
+            + SearchVector('best_season', weight='C')
+            + SearchVector(agency_name, weight='D')
+        ))
+
 class Package(models.Model):
     PACKAGE_TYPES = (
         ('trekking', 'Trekking'),
@@ -20,6 +40,24 @@ class Package(models.Model):
         ('extreme', 'Extreme')
     )
 
+    # Listing filter buckets as (value, label, low, high); both ends inclusive
+    DURATION_BUCKETS = (
+        ('1-3', '1-3 Days', 1, 3),
+        ('4-7', '4-7 Days', 4, 7),
+        ('8-14', '8-14 Days', 8, 14),
+        ('15+', '15+ Days', 15, None),
+    )
+
+    # Price histogram as (value, label, low, high); low inclusive, high exclusive
+    PRICE_BUCKETS = (
+        ('0-500', 'Under 500', None, 500),
+        ('500-1000', '500 - 1,000', 500, 1000),
+        ('1000-2500', '1,000 - 2,500', 1000, 2500),
+        ('2500-5000', '2,500 - 5,000', 2500, 5000),
+        ('5000-10000', '5,000 - 10,000', 5000, 10000),
+        ('10000+', '10,000+', 10000, None),
+    )
+
     agency = models.ForeignKey(Agency, on_delete=models.CASCADE, related_name='packages')
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
@@ -39,11 +77,34 @@ class Package(models.Model):
     is_active = models.BooleanField(default=True)
     featured = models.BooleanField(default=False)
     views_count = models.IntegerField(default=0)
+    rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0, editable=False)
+    total_ratings = models.IntegerField(default=0, editable=False)
+    rating_sum = models.IntegerField(default=0, editable=False)  # Running total, see apps.bookings.ratings
+    stars_5 = models.IntegerField(default=0, editable=False)
+    stars_4 = models.IntegerField(default=0, editable=False)
+    stars_3 = models.IntegerField(default=0, editable=False)
+    stars_2 = models.IntegerField(default=0, editable=False)
+    stars_1 = models.IntegerField(default=0, editable=False)
+    # Log-space forward-decayed activity score, see apps.packages.trending
+    trending_score = models.FloatField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = PackageQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='package_search_vector_gin'),
+            # Trigram indexes back the fuzzy tourist search in apps.core.fuzzy_search
+            GinIndex(fields=['title'], name='package_title_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['description'], name='package_description_trgm', opclasses=['gin_trgm_ops']),
+            # Keyset pagination (apps.core.pagination) walks these sort keys
+            models.Index(fields=['-created_at', '-id'], name='package_created_keyset'),
+            models.Index(fields=['price_per_person', 'id'], name='package_price_keyset'),
+            models.Index(fields=['-trending_score', '-id'], name='package_trending_keyset'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.agency.name}"
@@ -51,9 +112,17 @@ class Package(models.Model):
     def get_main_image(self):
         return self.images.first()
 
-    def increment_views(self):
-        self.views_count += 1
-        self.save(update_fields=['views_count'])
+    def increment_views(self, by=1):
+        """Atomic bump; detail views go through view_counter.record_view instead"""
+        Package.objects.filter(pk=self.pk).update(views_count=models.F('views_count') + by)
+        self.views_count += by
+
+    def update_rating(self):
+        """Rebuild the running rating totals from the Rating table (see apps.bookings.ratings)"""
+        from apps.bookings import ratings
+        ratings.recompute('package', [self.pk])
+        self.refresh_from_db(fields=['rating', 'total_ratings', 'rating_sum', *ratings.STAR_FIELDS.values()])
+        ratings.totals_changed.send(sender=type(self), pk=self.pk)
 
 class PackageImage(models.Model):
     package = models.ForeignKey(Package, on_delete=models.CASCADE, related_name='images')
@@ -67,3 +136,44 @@ class PackageImage(models.Model):
 
     def __str__(self):
         return f"{self.package.title} - Image"
+
+class PackageActivity(models.Model):
+    """Views and bookings of a package in one UTC hour; feeds the trending score"""
+    package = models.ForeignKey(Package, on_delete=models.CASCADE, related_name='activity')
+    hour = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+    bookings = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['package', 'hour'], name='package_activity_hour_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['hour'], name='package_activity_hour'),
+        ]
+
+    def __str__(self):
+        return f"{self.package_id} @ {self.hour:%Y-%m-%d %H:00}"
+
+class Departure(models.Model):
+    """A group departure of a package; bookings take seats on it (see apps.packages.departures)"""
+    package = models.ForeignKey(Package, on_delete=models.CASCADE, related_name='departures')
+    start_date = models.DateField()
+    seats_total = models.PositiveIntegerField()
+    seats_taken = models.PositiveIntegerField(default=0)
+    # False for departures a booking opened on a date the agency never scheduled
+    scheduled = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ['start_date']
+        constraints = [
+            # Also the index behind every seat update and calendar lookup
+            models.UniqueConstraint(fields=['package', 'start_date'], name='departure_package_date_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.package.title} - {self.start_date}"
+
+    @property
+    def seats_left(self):
+        return max(self.seats_total - self.seats_taken, 0)
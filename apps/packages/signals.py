@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from apps.accounts.models import Agency
+from apps.bookings.models import Booking
+from apps.core import caching
+from . import trending
+from .models import Package, PackageImage, SEARCH_VECTOR_FIELDS
+
+@receiver(post_save, sender=Package)
+def reindex_package(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the stored search vector in step with the package text"""
+    if raw:
+        return
+    # Saves such as increment_views() don't touch any indexed text
+    if update_fields and not SEARCH_VECTOR_FIELDS.intersection(update_fields):
+        return
+    Package.objects.filter(pk=instance.pk).update_search_vector()
+
+@receiver(post_save, sender=Agency)
+def reindex_agency_packages(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """The agency name is part of every package vector, so renames fan out"""
+    if raw or created:
+        return
+    if update_fields and 'name' not in update_fields:
+        return
+    Package.objects.filter(agency=instance).update_search_vector()
+
+@receiver(post_save, sender=Booking)
+def count_trending_booking(sender, instance, created=False, raw=False, **kwargs):
+    """New package bookings weigh into the package's trending score"""
+    if raw or not created or not instance.package_id:
+        return
+    package_id = instance.package_id
+    transaction.on_commit(lambda: trending.record_activity(bookings={package_id: 1}))
+
+@receiver(post_save, sender=PackageImage)
+@receiver(post_delete, sender=PackageImage)
+def touch_package_for_image(sender, instance, raw=False, **kwargs):
+    """Package cards show the main image and are cached on the package's updated_at"""
+    if raw:
+        return
+    Package.objects.filter(pk=instance.package_id).update(updated_at=timezone.now())
+    transaction.on_commit(lambda: caching.invalidate('packages'))
@@ -0,0 +1,116 @@
+# apps/packages/trending.py
+"""
+Time-decayed trending score for packages.
+
+Activity (views and bookings) is added to hourly ``PackageActivity`` buckets,
+and every addition also folds into ``Package.trending_score`` using forward
+decay: an event at hour ``t`` is worth ``weight * 2 ** ((t - EPOCH) / half_life)``,
+so newer events count for more and the ordering of the stored scores is the
+ordering of the decayed scores at any moment. Nothing has to be rescanned or
+re-decayed as time passes, and the top N is an index range scan on
+``-trending_score``.
+
+The score is kept as the natural log of that sum (``logaddexp`` in SQL) so it
+grows linearly with time instead of overflowing. ``current_score`` converts
+it back into "weighted events as of now".
+"""
+import datetime
+import math
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+EPOCH = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def bucket_hour(moment=None):
+    # UTC hours, since Asia/Kathmandu is not a whole-hour offset
+    moment = (moment or timezone.now()).astimezone(datetime.timezone.utc)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def growth(moment):
+    """Log of the forward-decay multiplier for an event at ``moment``"""
+    hours = (moment - EPOCH).total_seconds() / 3600
+    return hours * math.log(2) / settings.TRENDING_HALF_LIFE_HOURS
+
+
+def event_log_weight(views, bookings, moment):
+    weight = views + bookings * settings.TRENDING_BOOKING_WEIGHT
+    return math.log(weight) + growth(moment)
+
+
+def current_score(trending_score, now=None):
+    """Decayed weighted event count behind a stored score"""
+    if not trending_score:
+        return 0.0
+    return math.exp(trending_score - growth(now or timezone.now()))
+
+
+def logaddexp(score, value):
+    """SQL ``ln(exp(score) + exp(value))`` without overflowing either term"""
+    # Postgres raises on exp() underflow; below e**-50 the term is noise anyway
+    gap = Greatest(-Abs(score - value), Value(-50.0))
+    return Greatest(score, value) + Ln(Value(1.0) + Exp(gap))
+
+
+def record_activity(views=None, bookings=None, moment=None):
+    """
+    Add activity for the current hour. ``views`` and ``bookings`` map package
+    pks to counts. Costs one upsert per package plus one UPDATE for all scores.
+    """
+    from .models import Package, PackageActivity
+
+    views = views or {}
+    bookings = bookings or {}
+    pks = set(views) | set(bookings)
+    if not pks:
+        return 0
+    hour = bucket_hour(moment)
+
+    with transaction.atomic():
+        for pk in pks:
+            added = {'views': views.get(pk, 0), 'bookings': bookings.get(pk, 0)}
+            increments = {field: F(field) + count for field, count in added.items()}
+            if PackageActivity.objects.filter(package_id=pk, hour=hour).update(**increments):
+                continue
+            try:
+                with transaction.atomic():
+                    PackageActivity.objects.create(package_id=pk, hour=hour, **added)
+            except IntegrityError:
+                # Another worker created the bucket first
+                PackageActivity.objects.filter(package_id=pk, hour=hour).update(**increments)
+
+        event = Case(
+            *[When(pk=pk, then=Value(event_log_weight(views.get(pk, 0), bookings.get(pk, 0), hour)))
+              for pk in pks],
+            output_field=FloatField(),
+        )
+        return Package.objects.filter(pk__in=pks).update(
+            trending_score=logaddexp(F('trending_score'), event)
+        )
+
+
+def rebuild_scores(since=None):
+    """Recompute every score from the buckets kept since ``since``"""
+    from .models import Package, PackageActivity
+
+    buckets = PackageActivity.objects.order_by()
+    if since is not None:
+        buckets = buckets.filter(hour__gte=since)
+    scores = {}
+    for package_id, hour, views, bookings in buckets.values_list('package_id', 'hour', 'views', 'bookings').iterator():
+        if not views and not bookings:
+            continue
+        value = event_log_weight(views, bookings, hour)
+        current = scores.get(package_id)
+        scores[package_id] = value if current is None else max(current, value) + math.log1p(math.exp(-abs(current - value)))
+
+    with transaction.atomic():
+        Package.objects.exclude(pk__in=scores).update(trending_score=0)
+        for package_id, score in scores.items():
+            Package.objects.filter(pk=package_id).update(trending_score=score)
+    return len(scores)
@@ -0,0 +1,131 @@
+# apps/packages/view_counter.py
+"""
+Buffered, deduplicated package view counting.
+
+A detail page view only touches the ``views`` cache (to drop repeat views from
+the same visitor within PACKAGE_VIEW_DEDUPE_SECONDS) and an in-process
+counter. Without Redis that cache is per process, so a visitor whose views
+land on different workers can be counted once by each. A
+background thread flushes the counter every PACKAGE_VIEW_FLUSH_SECONDS with
+one ``UPDATE ... SET views_count = views_count + CASE ...`` for every package
+viewed since the last flush, so requests never write to the packages table
+and concurrent views are never lost to a read-modify-write. The same counts
+feed the hourly trending buckets (apps.packages.trending).
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Value, When
+
+from . import trending
+
+logger = logging.getLogger(__name__)
+
+DEDUPE_KEY = 'package_view:{}:{}'
+
+_pending = Counter()
+_pending_lock = threading.Lock()
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def visitor_id(request):
+    """Who a view counts for: the user, else the session, else the client address"""
+    if getattr(request, 'user', None) is not None and request.user.is_authenticated:
+        return f'u{request.user.pk}'
+    session_key = getattr(request, 'session', None) and request.session.session_key
+    if session_key:
+        return f's{session_key}'
+    return f"a{request.META.get('REMOTE_ADDR', '')}"
+
+
+def record_view(request, package):
+    """Count a view of ``package`` unless this visitor was counted recently"""
+    key = DEDUPE_KEY.format(package.pk, visitor_id(request))
+    if not caches['views'].add(key, 1, settings.PACKAGE_VIEW_DEDUPE_SECONDS):
+        return False
+    with _pending_lock:
+        _pending[package.pk] += 1
+    _ensure_flusher()
+    return True
+
+
+def pending_views():
+    with _pending_lock:
+        return dict(_pending)
+
+
+def flush():
+    """Write the buffered counts in one statement; returns the number of packages updated"""
+    from .models import Package
+
+    with _pending_lock:
+        counts = dict(_pending)
+        _pending.clear()
+    if not counts:
+        return 0
+
+    increment = Case(
+        *[When(pk=pk, then=Value(count)) for pk, count in counts.items()],
+        default=Value(0), output_field=IntegerField(),
+    )
+    try:
+        updated = Package.objects.filter(pk__in=counts).update(views_count=F('views_count') + increment)
+    except Exception:
+        # Put the counts back so the next flush retries them
+        with _pending_lock:
+            _pending.update(counts)
+        raise
+    try:
+        trending.record_activity(views=counts)
+    except Exception:
+        logger.exception('Could not record trending activity')
+    _refresh_search_index(counts)
+    return updated
+
+
+def _refresh_search_index(counts):
+    """Keep the popularity boost of this worker's search index in step, and have the others catch up"""
+    from apps.core import search_index
+    from .models import Package
+
+    search_index.boosts_changed('packages')
+    if not search_index.index_loaded():
+        return
+    index = search_index.get_search_index()
+    for pk, views_count in Package.objects.filter(pk__in=counts).values_list('pk', 'views_count'):
+        index.update_meta('packages', pk, views_count=views_count)
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_forever, name='package-view-flusher', daemon=True)
+            _flusher.start()
+
+
+def _flush_forever():
+    stop = threading.Event()
+    while not stop.wait(settings.PACKAGE_VIEW_FLUSH_SECONDS):
+        try:
+            flush()
+        except Exception:
+            logger.exception('Could not flush package view counts')
+        finally:
+            connection.close()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Could not flush package view counts at exit')
@@ -1,27 +1,28 @@
 from django.shortcuts import render, get_object_or_404
-from django.core.paginator import Paginator
-from django.db.models import Q
-from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
+from django.conf import settings
+from django.db.models import Q, F, FloatField
+from django.db.models.functions import Cast
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from apps.core import search_cache
+from apps.core.facets import package_facets
+from apps.core.page_cache import cache_public_page
+from apps.core.pagination import KeysetPage, KeysetPaginator
 from .models import Package
 
+@cache_public_page('packages', 'agencies')
 def package_list(request):
-    packages = Package.objects.filter(is_active=True, agency__is_verified=True)
+    packages = Package.objects.filter(is_active=True, agency__is_verified=True).select_related('agency')
 
     # Search with PostgreSQL full-text search
     search_query = request.GET.get('search', '').strip()
     if search_query:
-        # Use PostgreSQL full-text search with ranking for better relevance
-        search_vector = SearchVector('title', weight='A') + \
-                        SearchVector('description', weight='B') + \
-                        SearchVector('package_type', weight='C') + \
-                        SearchVector('best_season', weight='C') + \
-                        SearchVector('agency__name', weight='D')
+        # Rank against the stored, GIN-indexed vector (see Package.search_vector).
+        # ts_rank returns real; as double precision the keyset cursor's value
+        # compares equal to the row it came from
         search_q = SearchQuery(search_query)
-        
-        packages = packages.annotate(
-            search=search_vector,
-            rank=SearchRank(search_vector, search_q)
-        ).filter(search=search_q)
+        packages = packages.filter(search_vector=search_q).annotate(
+            rank=Cast(SearchRank(F('search_vector'), search_q), FloatField())
+        )
 
     # Filtering
     package_type = request.GET.get('type')
@@ -46,6 +47,8 @@ def package_list(request):
         packages = packages.order_by('-price_per_person')
     elif sort_by == 'rating':
         packages = packages.order_by('-agency__rating', '-agency__total_ratings', '-created_at')
+    elif sort_by == 'trending':
+        packages = packages.order_by('-trending_score')
     elif sort_by == 'relevance' and search_query:
         # Sort by search relevance if search query is present
         packages = packages.order_by('-rank', '-created_at')
@@ -56,15 +59,32 @@ def package_list(request):
         else:
             packages = packages.order_by('-created_at')
 
-    # Pagination
-    paginator = Paginator(packages, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination on the sort keys (see apps.core.pagination)
+    cursor = request.GET.get('cursor')
+    paginator = KeysetPaginator(packages, 12, count=settings.LISTING_SHOW_TOTALS)
+    if search_query:
+        # Full-text searches are cached as the page's IDs and cursors, so a
+        # repeat only costs one primary-key lookup (see apps.core.search_cache)
+        def compute():
+            return dict(paginator.get_page(cursor).state(), count=paginator.count)
+
+        filters = {
+            'type': package_type, 'difficulty': difficulty, 'min_price': min_price,
+            'max_price': max_price, 'sort': sort_by, 'cursor': cursor,
+        }
+        cached = search_cache.get_or_compute(
+            'packages.package_list', ['packages', 'agencies'], search_query, filters, compute
+        )
+        paginator.count = cached['count']
+        page_obj = KeysetPage.restore(cached, search_cache.hydrate(
+            Package.objects.select_related('agency'), cached['ids']
+        ), paginator)
+    else:
+        page_obj = paginator.get_page(cursor)
 
     context = {
         'page_obj': page_obj,
-        'package_types': Package.PACKAGE_TYPES,
-        'difficulty_levels': Package.DIFFICULTY_LEVELS,
+        'facets': package_facets(packages),
         'current_filters': {
             'type': package_type,
             'difficulty': difficulty,
@@ -23,6 +23,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites',
+    'django.contrib.postgres',
     
     # Third party apps
     'crispy_forms',
@@ -85,6 +86,45 @@ DATABASES = {
     }
 }
 
+# Cache: a bounded per-process LRU (apps.core.cache_backends.TwoTierCache) in
+# front of a cache shared by every worker and node, Redis when
+# CACHE_REDIS_URL is set and fcntl-locked files under var/cache otherwise
+# (one host only; deployments with several nodes need Redis). Local copies
+# live at most CACHE_LOCAL_TIMEOUT seconds, which bounds cross-worker
+# staleness. Package view dedupe keys are written on every view, so without
+# Redis they stay in each process ('views').
+CACHE_REDIS_URL = config('CACHE_REDIS_URL', default='')
+CACHES = {
+    'default': {
+        'BACKEND': 'apps.core.cache_backends.TwoTierCache',
+        'TIMEOUT': config('CACHE_DEFAULT_TIMEOUT', default=300, cast=int),
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': config('CACHE_LOCAL_MAX_ENTRIES', default=2000, cast=int),
+            'LOCAL_TIMEOUT': config('CACHE_LOCAL_TIMEOUT', default=10, cast=int),
+            'STATS_FLUSH_SECONDS': 60,
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_REDIS_URL,
+        'KEY_PREFIX': 'ngh',
+    } if CACHE_REDIS_URL else {
+        'BACKEND': 'apps.core.cache_backends.LockingFileBasedCache',
+        'LOCATION': config('CACHE_DIR', default=str(BASE_DIR / 'var' / 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': 20000, 'CULL_INTERVAL': 60},
+    },
+    'views': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_REDIS_URL,
+        'KEY_PREFIX': 'ngh',
+    } if CACHE_REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'package-views',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
+
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.User'
 
@@ -121,6 +161,58 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Search
+# How core.views.search ranks results: 'index' (in-process BM25 index) or
+# 'sql' (boosts computed as SQL annotations, one query per entity type)
+SEARCH_RANKING = config('SEARCH_RANKING', default='index')
+
+# In-process search index (apps.core.search_index): where workers snapshot it
+# so they start warm, and how often they pick up writes made by other workers.
+# Each catch-up looks back the margin further, to cover the longest
+# transaction plus clock skew between nodes
+SEARCH_INDEX_SNAPSHOT = config('SEARCH_INDEX_SNAPSHOT', default=str(BASE_DIR / 'var' / 'search_index.pickle'))
+SEARCH_INDEX_REFRESH_SECONDS = config('SEARCH_INDEX_REFRESH_SECONDS', default=60, cast=int)
+SEARCH_INDEX_CATCH_UP_MARGIN_SECONDS = config('SEARCH_INDEX_CATCH_UP_MARGIN_SECONDS', default=300, cast=int)
+
+# Search result cache (apps.core.search_cache): seconds an ID list is kept;
+# writes invalidate entries earlier through per-entity-type version bumps
+SEARCH_CACHE_TIMEOUT = config('SEARCH_CACHE_TIMEOUT', default=300, cast=int)
+
+# Anonymous full-page cache of the public detail and listing pages
+# (apps.core.page_cache): model saves drop pages early; this bounds how long
+# writes that skip save() (view counts, seat counts) can go unseen
+PAGE_CACHE_TIMEOUT = config('PAGE_CACHE_TIMEOUT', default=300, cast=int)
+
+# ORM result cache (apps.core.query_cache): committed writes to a table
+# invalidate every result read from it, so the timeout only bounds memory use.
+# Workers re-read table versions every QUERY_CACHE_VERSION_TTL seconds, which
+# is how long another worker's write can go unseen
+QUERY_CACHE_TIMEOUT = config('QUERY_CACHE_TIMEOUT', default=600, cast=int)
+QUERY_CACHE_VERSION_TTL = config('QUERY_CACHE_VERSION_TTL', default=2, cast=int)
+
+# Public listings use keyset pagination (apps.core.pagination); set to False
+# to skip the COUNT(*) for "N results" so every page is a single range scan
+LISTING_SHOW_TOTALS = config('LISTING_SHOW_TOTALS', default=True, cast=bool)
+
+# Package view counting (apps.packages.view_counter): a visitor counts once per
+# package per dedupe window, and each worker writes its buffered counts in one
+# UPDATE every flush interval
+PACKAGE_VIEW_DEDUPE_SECONDS = config('PACKAGE_VIEW_DEDUPE_SECONDS', default=1800, cast=int)
+PACKAGE_VIEW_FLUSH_SECONDS = config('PACKAGE_VIEW_FLUSH_SECONDS', default=30, cast=int)
+
+# Trending packages (apps.packages.trending): activity halves in weight every
+# half-life, a booking counts as this many views, and hourly buckets older than
+# the retention window are pruned by `manage.py prune_trending`
+TRENDING_HALF_LIFE_HOURS = config('TRENDING_HALF_LIFE_HOURS', default=48, cast=float)
+TRENDING_BOOKING_WEIGHT = config('TRENDING_BOOKING_WEIGHT', default=10, cast=int)
+TRENDING_RETENTION_DAYS = config('TRENDING_RETENTION_DAYS', default=30, cast=int)
+
+# Booking lifecycle (apps.bookings.lifecycle, `manage.py sweep_bookings`):
+# pending bookings without a completed payment are cancelled after the TTL,
+# and the sweep repeats every interval when run with --loop
+BOOKING_PENDING_TTL_HOURS = config('BOOKING_PENDING_TTL_HOURS', default=24, cast=float)
+BOOKING_SWEEP_INTERVAL_SECONDS = config('BOOKING_SWEEP_INTERVAL_SECONDS', default=300, cast=int)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 